@@ -0,0 +1,313 @@
+"""
+Replays the dashboard's workload on the local backend over a filter matrix.
+
+For every sidebar filter combination in the matrix and every `--top-n`
+value, each page's queries are built exactly as the app builds them
+(same SQL builders, same bind variables) and run on the local DuckDB
+backend, then the page's cards are derived from the results the way the
+page derives them. Latency is reported as p50 / p95 / max per query, per
+card and per page; runs can be saved and compared:
+
+    python benchmarks/dashboard_benchmark.py --repeat 5 --save before.json
+    python benchmarks/dashboard_benchmark.py --repeat 5 --compare before.json
+
+Every replay is cold: no app-level cache sits between the benchmark and
+the engine. The Portal Summary page (Cortex only) is not replayed, and
+the AI Analyst page replays the tab's example questions that compile from
+templates. `--branches` also times each fused Restaurant Deep Dive card
+as a standalone statement, to find the card that dominates the fused one.
+Ranked cards are queried at the slider maximum, so `--top-n` only changes
+how the cards slice the same results.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bounded_query as bq  # noqa: E402
+import customer_features  # noqa: E402
+import customer_sketches  # noqa: E402
+import order_cube as oc  # noqa: E402
+import rollups  # noqa: E402
+from dashboard_queries import (  # noqa: E402
+    TOP_N_MAX, commission_correlation_specs, executive_dashboard_specs, restaurant_deep_dive_specs,
+)
+from local_backend import LocalBackend  # noqa: E402
+from nl_templates import template_query  # noqa: E402
+from query_compiler import compile_fused_query, split_fused_result  # noqa: E402
+from query_filters import (  # noqa: E402
+    FILTER_METADATA_QUERY, JOINED_COLUMNS, VIEW_COLUMNS, DashboardFilters, FilterMetadata,
+)
+from question_index import EntityCanonicalizer  # noqa: E402
+from result_schema import compact_frame  # noqa: E402
+
+
+# Example questions shown on the AI Analyst page
+AI_EXAMPLE_QUESTIONS = [
+    "What is the total GMV for Ahmedabad city in 2024?",
+    "Which cuisine has the highest net profit?",
+    "Show me average rating by restaurant.",
+    "Compare profit across cities.",
+]
+
+
+@dataclass
+class PageWorkload:
+    """One page's statements {name: (sql, params, post)} and cards {name: derive(results)}."""
+    queries: dict = field(default_factory=dict)
+    cards: dict = field(default_factory=dict)
+
+
+def filter_matrix(metadata_df):
+    """{label: DashboardFilters} covering the sidebar states worth measuring."""
+    meta = FilterMetadata.from_frame(metadata_df)
+    full = (meta.min_date, meta.max_date)
+    narrow = (max(meta.min_date, meta.max_date - datetime.timedelta(days=30)), meta.max_date)
+    first_restaurant = metadata_df.rename(columns=str.upper).dropna(subset=["RESTAURANT_NAME"]).iloc[0]
+    return {
+        "no_filter": DashboardFilters.from_selection(),
+        "wide_dates": DashboardFilters.from_selection(start_date=full[0], end_date=full[1]),
+        "narrow_dates": DashboardFilters.from_selection(start_date=narrow[0], end_date=narrow[1]),
+        "single_city": DashboardFilters.from_selection(meta.cities[:1], (), (), *full),
+        "multi_city": DashboardFilters.from_selection(meta.cities[:3], (), (), *full),
+        "cuisine_restaurant": DashboardFilters.from_selection(
+            (), [first_restaurant["RESTAURANT_NAME"]], [first_restaurant["CUISINE_TYPE"]], *full
+        ),
+    }
+
+
+def comparison_dimension(filters):
+    """Same priority as the app's get_comparison_dimension: City > Cuisine > Restaurant."""
+    if len(filters.cities) > 1:
+        return "CITY"
+    if len(filters.cuisines) > 1:
+        return "CUISINE_TYPE"
+    if len(filters.restaurants) > 1:
+        return "RESTAURANT_NAME"
+    return None
+
+
+def dashboard_workload(filters, top_n, canonicalize, describe, router=None, branches=False, data_range=None,
+                       sketches=False, features=False):
+    """
+    {page: PageWorkload} for one sidebar state, mirroring the app's render queries.
+    `describe(sql, params)` returns a statement's output columns (the AI Analyst pages are
+    ordered by them); `sketches` / `features` serve the customer cards from the HLL sketches /
+    the customer feature table; `data_range` is the first / last order date.
+    """
+    where_joined, params_joined = filters.where(JOINED_COLUMNS)
+    # Results are compacted as the app caches them (run_query's result cache, load_order_cube)
+    dim = comparison_dimension(filters)
+    cube_cards = [c for c in oc.CARD_COLUMNS if not (features and c in customer_features.FEATURE_CARDS)]
+    cube_sql = oc.order_cube_query(where_joined, oc.cube_columns(cube_cards, dim))
+    cube = (cube_sql, params_joined, lambda df: compact_frame(oc.prepare_order_cube(df)))
+
+    # Ranked cards are fetched at TOP_N_MAX (the SQL does not depend on top_n) and sliced per card
+    exec_specs = executive_dashboard_specs(TOP_N_MAX, dim)
+    executive = PageWorkload(
+        queries={"executive": (*compile_fused_query(exec_specs, where_joined, params_joined, router=router), compact_frame)},
+        cards={spec.name: (lambda r, s=spec: split_fused_result(r["executive"], [s], top_n)[s.name])
+               for spec in exec_specs},
+    )
+
+    deep_dive_specs = restaurant_deep_dive_specs(TOP_N_MAX)
+    comm_specs = commission_correlation_specs()
+    deep_dive = PageWorkload(
+        queries={"deep_dive": (*compile_fused_query(deep_dive_specs, where_joined, params_joined, router=router), compact_frame)},
+        cards={spec.name: (lambda r, s=spec: split_fused_result(r["deep_dive"], [s], top_n)[s.name])
+               for spec in deep_dive_specs},
+    )
+    if branches:
+        for spec in deep_dive_specs:
+            deep_dive.queries[f"branch:{spec.name}"] = (
+                *compile_fused_query([spec], where_joined, params_joined, router=router), None
+            )
+
+    ai_analyst = PageWorkload()
+    for i, question in enumerate(AI_EXAMPLE_QUESTIONS, 1):
+        templated = template_query(question, canonicalize, filters.predicates(VIEW_COLUMNS))
+        if templated:
+            sql, params = templated
+            ai_analyst.queries[f"q{i}:count"] = (bq.count_query(sql), params, None)
+            ai_analyst.queries[f"q{i}:columns"] = (bq.columns_query(sql), params, None)
+            ai_analyst.queries[f"q{i}:page"] = (bq.page_query(sql, 1, describe(sql, params)), params, None)
+
+    customer_insights = PageWorkload(queries={"cube": cube}, cards={
+        "customer_kpis": lambda r: oc.customer_kpis(r["cube"]),
+        "monthly_active": lambda r: oc.monthly_series(
+            r["cube"], "CUSTOMER_ID", "ACTIVE_CUSTOMERS", how="nunique",
+            color_col=dim if dim and r["cube"][dim].nunique() > 1 else None,
+        ),
+        "loyal_customers": lambda r: oc.loyal_customers(r["cube"], top_n),
+        "rating_distribution": lambda r: oc.rating_distribution(r["cube"]),
+    })
+    conclusion = PageWorkload(
+        queries={"cube": cube, "commission": (*compile_fused_query(comm_specs, router=router), compact_frame)},
+        cards={
+            "platform_kpis": lambda r: oc.platform_kpis(r["cube"]),
+            "top_city": lambda r: oc.top_groups(r["cube"], "CITY", "NET_PROFIT", "PROFIT", 1),
+            "top_cuisine": lambda r: oc.top_groups(r["cube"], "CUISINE_TYPE", "GMV", "GMV", 1),
+            "top_restaurant": lambda r: oc.top_groups(r["cube"], "RESTAURANT_NAME", "GMV", "GMV", 1),
+            "top_customer": lambda r: oc.top_groups(r["cube"], "CUSTOMER_NAME", "ORDER_ID", "ORDERS", 1, how="count"),
+            "commission_profit": lambda r: split_fused_result(r["commission"], comm_specs)["COMMISSION_PROFIT"],
+        },
+    )
+    if sketches:
+        customers = (*customer_sketches.customer_count_query(filters, data_range=data_range), None)
+        customer_insights.queries["customers"] = conclusion.queries["customers"] = customers
+        customer_insights.queries["monthly_customers"] = (*customer_sketches.customer_count_query(
+            filters, ["MONTH"] + ([dim] if dim else []), data_range=data_range, name="ACTIVE_CUSTOMERS"
+        ), None)
+    if features:
+        customer_insights.queries["customer_kpis"] = (
+            *customer_features.customer_kpis_query(filters, data_range=data_range), None
+        )
+        customer_insights.queries["loyal_customers"] = (
+            *customer_features.loyal_customers_query(filters, TOP_N_MAX, data_range=data_range), None
+        )
+        conclusion.queries["top_customer"] = (
+            *customer_features.loyal_customers_query(filters, 1, data_range=data_range), None
+        )
+        customer_insights.cards["customer_kpis"] = lambda r: r["customer_kpis"]
+        customer_insights.cards["loyal_customers"] = lambda r: r["loyal_customers"].head(top_n)
+        conclusion.cards["top_customer"] = lambda r: r["top_customer"]
+
+    return {
+        "Sidebar": PageWorkload(queries={"filter_options": (FILTER_METADATA_QUERY, (), FilterMetadata.from_frame)}),
+        "Executive Dashboard": executive,
+        "Restaurant Deep Dive": deep_dive,
+        "AI Analyst": ai_analyst,
+        "Customer Insights": customer_insights,
+        "Conclusion": conclusion,
+    }
+
+
+def replay_page(backend, page, workload, labels):
+    """Runs one page's statements, then its cards; returns one sample dict per query / card / page."""
+    samples, results = [], {}
+    page_start = time.perf_counter()
+    for name, (sql, params, post) in workload.queries.items():
+        start = time.perf_counter()
+        df = backend.query(sql, params)
+        result = post(df) if post else df
+        seconds = time.perf_counter() - start
+        if not name.startswith("branch:"):
+            results[name] = result
+        samples.append({"level": "query", "page": page, "name": name, "seconds": seconds, "rows": len(df), **labels})
+    for name, derive in workload.cards.items():
+        start = time.perf_counter()
+        derive(results)
+        samples.append({"level": "card", "page": page, "name": name,
+                        "seconds": time.perf_counter() - start, "rows": None, **labels})
+    branch_seconds = sum(s["seconds"] for s in samples if s["name"].startswith("branch:"))
+    samples.append({"level": "page", "page": page, "name": "", "rows": None,
+                    "seconds": time.perf_counter() - page_start - branch_seconds, **labels})
+    return samples
+
+
+def summarize(samples):
+    """p50 / p95 / max (ms) per (level, page, name)."""
+    df = pd.DataFrame(samples)
+    ms = df.assign(ms=df["seconds"] * 1000).groupby(["level", "page", "name"], sort=False)["ms"]
+    return pd.DataFrame({
+        "runs": ms.size(),
+        "p50_ms": ms.median(),
+        "p95_ms": ms.quantile(0.95),
+        "max_ms": ms.max(),
+    }).round(2).reset_index()
+
+
+def compare(current, baseline):
+    """Current vs baseline summary, with p50 / p95 ratios (< 1 is faster)."""
+    merged = current.merge(baseline, on=["level", "page", "name"], how="left", suffixes=("", "_base"))
+    merged["p50_ratio"] = (merged["p50_ms"] / merged["p50_ms_base"]).round(2)
+    merged["p95_ratio"] = (merged["p95_ms"] / merged["p95_ms_base"]).round(2)
+    return merged[["level", "page", "name", "p50_ms_base", "p50_ms", "p50_ratio", "p95_ms_base", "p95_ms", "p95_ratio"]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--repeat", type=int, default=3, help="replays per (filter, top_n) combination")
+    parser.add_argument("--top-n", type=int, nargs="+", default=[3, 10, 20], help="Top N slider values to replay")
+    parser.add_argument("--filters", nargs="+", help="only these filter combinations (default: all)")
+    parser.add_argument("--pages", nargs="+", help="only these pages (default: all)")
+    parser.add_argument("--no-rollup", action="store_true",
+                        help="serve every aggregate from FACT_ORDERS (no daily rollup or customer feature table)")
+    parser.add_argument("--exact-customers", action="store_true",
+                        help="count customers from the order cube instead of the HLL sketches")
+    parser.add_argument("--branches", action="store_true", help="also time each fused deep-dive card alone")
+    parser.add_argument("--save", help="write raw samples and the summary to this JSON file")
+    parser.add_argument("--compare", help="JSON file from an earlier --save to compare against")
+    args = parser.parse_args()
+
+    backend = LocalBackend()
+    router = None
+    if not args.no_rollup:
+        rollups.refresh_daily_rollup(backend.query)
+        customer_features.refresh_customer_features(backend.query)
+        router = rollups.route_to_daily_rollup
+
+    metadata_df = backend.query(FILTER_METADATA_QUERY)
+    meta = FilterMetadata.from_frame(metadata_df)
+    if not args.exact_customers:
+        customer_sketches.refresh_customer_sketches(backend.query)
+    canonicalize = EntityCanonicalizer(meta.cities, meta.cuisines, meta.restaurants)
+    matrix = filter_matrix(metadata_df)
+
+    def describe(sql, params):
+        return backend.query(bq.columns_query(sql), params).columns
+
+    if args.filters:
+        matrix = {label: matrix[label] for label in args.filters}
+
+    samples = []
+    for label, filters in matrix.items():
+        for top_n in args.top_n:
+            workload = dashboard_workload(
+                filters, top_n, canonicalize, describe, router=router, branches=args.branches,
+                data_range=(meta.min_date, meta.max_date),
+                sketches=not args.exact_customers, features=not args.no_rollup,
+            )
+            pages = {p: w for p, w in workload.items() if not args.pages or p in args.pages}
+            for page_workload in pages.values():   # untimed warm-up pass
+                for sql, params, _ in page_workload.queries.values():
+                    backend.query(sql, params)
+            for run in range(args.repeat):
+                for page, page_workload in pages.items():
+                    samples.extend(replay_page(backend, page, page_workload,
+                                               {"filters": label, "top_n": top_n, "run": run}))
+
+    summary = summarize(samples)
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        for level in ("page", "card", "query"):
+            print(f"\n== per {level} ==")
+            print(summary[summary["level"] == level].drop(columns="level").to_string(index=False))
+
+        if args.compare:
+            with open(args.compare, encoding="utf-8") as fh:
+                baseline = pd.DataFrame(json.load(fh)["summary"])
+            print(f"\n== vs {args.compare} ==")
+            print(compare(summary, baseline).to_string(index=False))
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as fh:
+            json.dump({
+                "created_at": datetime.datetime.now().isoformat(timespec="seconds"),
+                "args": vars(args),
+                "samples": samples,
+                "summary": summary.replace({np.nan: None}).to_dict(orient="records"),
+            }, fh, indent=1)
+        print(f"\nsaved {len(samples)} samples to {args.save}")
+
+
+if __name__ == "__main__":
+    main()
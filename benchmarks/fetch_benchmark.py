@@ -0,0 +1,72 @@
+"""
+Rows/sec of the old row-based fetch vs the Arrow fetch used by run_query.
+
+Runs Tab 2's `SELECT * FROM V_PLATFORM_PROFITABILITY` on the local DuckDB
+backend, optionally repeated `--copies` times to get a larger result.
+
+    python benchmarks/fetch_benchmark.py --copies 50 --repeat 5
+
+"row" reproduces the previous path: fetch tuples, build a DataFrame, then
+apply the pd.to_numeric / pd.to_datetime fixups. "arrow" fetches record
+batches and converts them with result_fetch.frame_from_arrow_batches.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_backend import LocalBackend  # noqa: E402
+from result_fetch import frame_from_arrow_batches  # noqa: E402
+
+NUMERIC_COLUMNS = ["GMV", "DELIVERY_FEE", "COMMISSION_REVENUE", "DISCOUNT_AMOUNT",
+                   "PAYMENT_PROCESSING_FEE", "NET_PROFIT", "ORDER_RATING"]
+
+
+def row_fetch(cur, q):
+    cur.execute(q)
+    rows, cols = cur.fetchall(), [d[0] for d in cur.description]
+    df = pd.DataFrame([list(r) for r in rows], columns=cols)
+    for col in NUMERIC_COLUMNS:
+        df[col] = pd.to_numeric(df[col], errors="coerce")
+    df["ORDER_TIMESTAMP"] = pd.to_datetime(df["ORDER_TIMESTAMP"], errors="coerce")
+    return df
+
+
+def arrow_fetch(cur, q):
+    cur.execute(q)
+    reader = cur.to_arrow_reader() if hasattr(cur, "to_arrow_reader") else cur.fetch_record_batch()
+    return frame_from_arrow_batches(reader)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--copies", type=int, default=20, help="repeat the view this many times")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per method (best is reported)")
+    args = parser.parse_args()
+
+    backend = LocalBackend()
+    q = ("SELECT V.* FROM V_PLATFORM_PROFITABILITY V "
+         f"CROSS JOIN range({args.copies}) AS COPIES(N)")
+    cur = backend._con.cursor()
+
+    results = {}
+    for name, fetch in (("row", row_fetch), ("arrow", arrow_fetch)):
+        best, rows = float("inf"), 0
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            df = fetch(cur, q)
+            best = min(best, time.perf_counter() - start)
+            rows = len(df)
+        results[name] = rows / best
+        print(f"{name:>5}: {rows:>9,} rows  {best:7.3f}s  {rows / best:>12,.0f} rows/sec")
+
+    print(f"speed-up: {results['arrow'] / results['row']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
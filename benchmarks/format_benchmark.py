@@ -0,0 +1,99 @@
+"""
+Labels/sec of the old scalar formatters vs the vectorized number_format ones.
+
+Formats `--rows` synthetic amounts (log-normal, spanning every K / M / B
+scale, with some negatives and missing values) and commission rates the
+way the charts label their bars:
+
+    python benchmarks/format_benchmark.py --rows 100000 --repeat 5
+
+"scalar" reproduces the previous helpers applied with `Series.apply`;
+"vectorized" formats the whole Series with number_format. Outputs are
+compared element-wise on the finite values (the scalar helpers print
+missing values as "nan").
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import number_format as nf  # noqa: E402
+
+
+def fmt_number(x):
+    try:
+        x = float(x)
+        if abs(x) >= 1_000_000_000:
+            return f"{x/1_000_000_000:.2f}B"
+        elif abs(x) >= 1_000_000:
+            return f"{x/1_000_000:.2f}M"
+        elif abs(x) >= 1_000:
+            return f"{x/1_000:.2f}K"
+        else:
+            return f"{x:.2f}"
+    except Exception:
+        return "0.00"
+
+
+def fmt_money(x):
+    try:
+        x = float(x)
+        if abs(x) >= 1_000_000_000:
+            return f"₹{x/1_000_000_000:.2f}B"
+        elif abs(x) >= 1_000_000:
+            return f"₹{x/1_000_000:.2f}M"
+        elif abs(x) >= 1_000:
+            return f"₹{x/1_000:.2f}K"
+        else:
+            return f"₹{x:.2f}"
+    except Exception:
+        return "₹0.00"
+
+
+def sample(rows, seed=0):
+    """(amounts, rates) Series of `rows` values each."""
+    rng = np.random.default_rng(seed)
+    values = rng.lognormal(mean=8, sigma=4, size=rows)
+    values[rng.random(rows) < 0.05] *= -1
+    values[rng.random(rows) < 0.01] = np.nan
+    return pd.Series(values), pd.Series(rng.uniform(0.05, 0.3, size=rows).round(4))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=100_000, help="values to format")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per method (best is reported)")
+    args = parser.parse_args()
+
+    amounts, rates = sample(args.rows)
+    nf.format_money(0.0)   # builds the lookup table outside the timed runs
+    cases = {
+        "money": (amounts, lambda s: s.apply(fmt_money), nf.format_money),
+        "number": (amounts, lambda s: s.apply(fmt_number), nf.format_number),
+        "percent": (rates, lambda s: s.apply(lambda x: f"{float(x):.2%}"), nf.format_percent),
+    }
+
+    for name, (values, *methods) in cases.items():
+        finite = values.notna().to_numpy()
+        outputs, best = [], []
+        for method in methods:
+            elapsed = float("inf")
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                out = np.asarray(method(values), dtype=str)
+                elapsed = min(elapsed, time.perf_counter() - start)
+            outputs.append(out)
+            best.append(elapsed)
+        mismatches = int((outputs[0][finite] != outputs[1][finite]).sum())
+        print(f"{name:>8}: scalar {args.rows / best[0]:>12,.0f}/s  vectorized {args.rows / best[1]:>12,.0f}/s  "
+              f"speed-up {best[0] / best[1]:5.1f}x  mismatches {mismatches:,}")
+
+
+if __name__ == "__main__":
+    main()
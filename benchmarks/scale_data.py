@@ -0,0 +1,318 @@
+"""
+Scales the bundled star schema up to 1M-100M orders for load tests.
+
+Every generated value is resampled from the bundled CSVs, so the
+empirical distributions carry over: restaurants keep their joint
+(city, cuisine, rating, commission) rows, customers their (name, city,
+join date) rows, and each order draws its date, delivery fee, rating,
+coupon usage and item count from the bundled orders, and its lines
+(menu item, quantity, price) from the bundled order items. Orders pick
+customers and restaurants uniformly, as the bundled data does. Menu
+items and coupons are catalogs and are copied unchanged.
+
+The money columns are recomputed with the bundled arithmetic.
+SUB_TOTAL_AMOUNT is the sum of the order's lines, and the discount is the
+coupon's percentage of the subtotal. COMMISSION_REVENUE is the subtotal
+times the restaurant's rate. TOTAL_AMOUNT is subtotal - discount +
+delivery fee, and the payment fee is the bundled share of the total.
+
+Output uses the bundled file names, so the local backend and the
+benchmarks can load it directly:
+
+    python benchmarks/scale_data.py --orders 10000000 --out /data/fd_10m --seed 7
+    FOOD_DELIVERY_DATA_DIR=/data/fd_10m python benchmarks/dashboard_benchmark.py
+
+Rows are generated in chunks across worker processes and appended in
+order. Each chunk has its own seed derived from `--seed`, so the output
+is identical for any `--workers` value.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from local_backend import BASE_DIR, TABLE_FILES  # noqa: E402
+
+
+# Salts for the stateless dimension -> bundled-row mapping and the per-chunk order streams
+RESTAURANT_SALT, CUSTOMER_SALT, ORDER_STREAM = 1, 2, 3
+
+_PROFILE = None   # set in every worker by _init_worker
+
+
+@dataclass
+class SourceProfile:
+    """Everything the generators resample from, read once from the bundled CSVs."""
+    seed: int
+    n_orders: int
+    n_customers: int
+    n_restaurants: int
+    restaurants: pd.DataFrame
+    customers: pd.DataFrame
+    coupon_ids: np.ndarray
+    coupon_pct: np.ndarray
+    order_dates: np.ndarray
+    delivery_fees: np.ndarray
+    ratings: np.ndarray
+    coupon_draws: np.ndarray        # index into coupon_ids, -1 for orders without a coupon
+    items_per_order: np.ndarray
+    item_menu_ids: np.ndarray
+    item_quantities: np.ndarray
+    item_prices: np.ndarray
+    payment_fee_rate: float
+
+    @classmethod
+    def load(cls, data_dir, seed, n_orders, n_customers=None, n_restaurants=None):
+        def read(table, **kwargs):
+            return pd.read_csv(os.path.join(data_dir, TABLE_FILES[table]), keep_default_na=False, na_values=[""], **kwargs)
+
+        orders, items = read("FACT_ORDERS"), read("FACT_ORDER_ITEMS")
+        customers, restaurants, coupons = read("DIM_CUSTOMER", dtype=str), read("DIM_RESTAURANT"), read("DIM_COUPON")
+
+        coupon_index = pd.Series(np.arange(len(coupons)), index=coupons["COUPON_ID"])
+        scale = n_orders / len(orders)
+        return cls(
+            seed=seed,
+            n_orders=n_orders,
+            n_customers=n_customers or max(len(customers), round(len(customers) * scale)),
+            n_restaurants=n_restaurants or max(len(restaurants), round(len(restaurants) * scale)),
+            restaurants=restaurants,
+            customers=customers,
+            coupon_ids=coupons["COUPON_ID"].to_numpy(str),
+            coupon_pct=coupons["DISCOUNT_PERCENT"].to_numpy(float),
+            order_dates=orders["ORDER_TIMESTAMP"].to_numpy(str),
+            delivery_fees=orders["DELIVERY_FEE"].to_numpy(float),
+            ratings=orders["ORDER_RATING"].to_numpy(float),
+            coupon_draws=orders["COUPON_ID"].map(coupon_index).fillna(-1).to_numpy(int),
+            items_per_order=items.groupby("ORDER_ID").size().to_numpy(int),
+            item_menu_ids=items["MENU_ITEM_ID"].to_numpy(str),
+            item_quantities=items["QUANTITY"].to_numpy(int),
+            item_prices=items["ITEM_PRICE_AT_ORDER"].to_numpy(float),
+            payment_fee_rate=float((orders["PAYMENT_PROCESSING_FEE"] / orders["TOTAL_AMOUNT"]).median().round(4)),
+        )
+
+
+def _mix(x):
+    """splitmix64 finalizer: a cheap, well-spread hash of uint64 arrays."""
+    x = np.asarray(x, dtype=np.uint64)
+    with np.errstate(over="ignore"):
+        x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def source_rows(index, n_source, salt, seed):
+    """Bundled row each generated dimension row copies; bundled rows map to themselves.
+
+    Stateless, so an order chunk can look up any restaurant's commission rate
+    without the restaurant table being shared between processes.
+    """
+    index = np.asarray(index, dtype=np.int64)
+    key = index.astype(np.uint64) ^ _mix(np.uint64(seed) * np.uint64(4) + np.uint64(salt))
+    drawn = (_mix(key) % np.uint64(n_source)).astype(np.int64)
+    return np.where(index < n_source, index, drawn)
+
+
+def make_ids(prefix, numbers, width):
+    """["O0000001", ...] for 1-based row numbers."""
+    return (prefix + pd.Series(numbers).astype(str).str.zfill(width)).to_numpy()
+
+
+def id_width(source_width, n):
+    return max(source_width, len(str(n)))
+
+
+def csv_rows(df, decimals=None):
+    """CSV bytes (no header) of `df`; `decimals` maps float columns to their NUMBER(p, s) scale."""
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for column, scale in (decimals or {}).items():
+        i = table.schema.get_field_index(column)
+        table = table.set_column(i, column, table.column(i).cast(pa.decimal128(18, scale)))
+    out = pa.BufferOutputStream()
+    pa_csv.write_csv(table, out, pa_csv.WriteOptions(include_header=False))
+    return out.getvalue().to_pybytes()
+
+
+#  CHUNK GENERATORS (run in worker processes; return {table: (CSV bytes without a header, rows)})
+
+def restaurant_chunk(start, stop):
+    p = _PROFILE
+    src = p.restaurants.iloc[source_rows(np.arange(start, stop), len(p.restaurants), RESTAURANT_SALT, p.seed)]
+    copy_no = np.arange(start, stop) // len(p.restaurants)
+    df = pd.DataFrame({
+        "RESTAURANT_ID": make_ids("R", np.arange(start, stop) + 1, id_width(4, p.n_restaurants)),
+        "RESTAURANT_NAME": np.where(copy_no == 0, src["RESTAURANT_NAME"],
+                                    src["RESTAURANT_NAME"].to_numpy(str) + " #" + (copy_no + 1).astype(str)),
+        "CITY": src["CITY"].to_numpy(),
+        "CUISINE_TYPE": src["CUISINE_TYPE"].to_numpy(),
+        "AVERAGE_RATING": src["AVERAGE_RATING"].to_numpy(),
+        "COMMISSION_RATE": src["COMMISSION_RATE"].to_numpy(),
+    })
+    return {"DIM_RESTAURANT": (csv_rows(df, {"AVERAGE_RATING": 2, "COMMISSION_RATE": 3}), len(df))}
+
+
+def customer_chunk(start, stop):
+    p = _PROFILE
+    index = np.arange(start, stop)
+    src = p.customers.iloc[source_rows(index, len(p.customers), CUSTOMER_SALT, p.seed)]
+    bundled = index < len(p.customers)
+    suffix = pd.Series(index.astype(str))
+    local, domain = (part.reset_index(drop=True) for _, part in src["EMAIL"].str.split("@", n=1, expand=True).items())
+    df = pd.DataFrame({
+        "CUSTOMER_ID": make_ids("C", index + 1, id_width(5, p.n_customers)),
+        "CUSTOMER_NAME": src["CUSTOMER_NAME"].to_numpy(),
+        "CITY": src["CITY"].to_numpy(),
+        "JOIN_DATE": src["JOIN_DATE"].to_numpy(),
+        # EMAIL and PHONE are UNIQUE in the DDL
+        "EMAIL": np.where(bundled, src["EMAIL"], local + "." + suffix + "@" + domain),
+        "PHONE": np.where(bundled, src["PHONE"], "+91" + pd.Series(7_000_000_000 + index).astype(str)),
+    })
+    return {"DIM_CUSTOMER": (csv_rows(df), len(df))}
+
+
+def order_chunk(start, stop):
+    p = _PROFILE
+    rng = np.random.default_rng([p.seed, ORDER_STREAM, start])
+    n = stop - start
+
+    def draw(values, size=n):
+        return values[rng.integers(0, len(values), size)]
+
+    order_ids = make_ids("O", np.arange(start, stop) + 1, id_width(7, p.n_orders))
+    customer = rng.integers(0, p.n_customers, n)
+    restaurant = rng.integers(0, p.n_restaurants, n)
+    coupon = draw(p.coupon_draws)
+    fee = draw(p.delivery_fees)
+
+    # Order lines: (menu item, quantity, price) rows resampled together
+    n_items = draw(p.items_per_order)
+    line = rng.integers(0, len(p.item_menu_ids), n_items.sum())
+    owner = np.repeat(np.arange(n), n_items)
+    line_no = np.arange(len(line)) - np.repeat(np.cumsum(n_items) - n_items, n_items) + 1
+    quantity, price = p.item_quantities[line], p.item_prices[line]
+
+    subtotal = np.bincount(owner, weights=quantity * price, minlength=n).round(2)
+    discount = np.where(coupon >= 0, subtotal * p.coupon_pct[coupon] / 100, 0.0).round(2)
+    rate = p.restaurants["COMMISSION_RATE"].to_numpy(float)[
+        source_rows(restaurant, len(p.restaurants), RESTAURANT_SALT, p.seed)
+    ]
+    total = (subtotal - discount + fee).round(2)
+
+    orders = pd.DataFrame({"ORDER_ID": order_ids})
+    orders["CUSTOMER_ID"] = make_ids("C", customer + 1, id_width(5, p.n_customers))
+    orders["RESTAURANT_ID"] = make_ids("R", restaurant + 1, id_width(4, p.n_restaurants))
+    orders["COUPON_ID"] = pd.Series(p.coupon_ids[np.maximum(coupon, 0)]).where(coupon >= 0)
+    orders["ORDER_TIMESTAMP"] = draw(p.order_dates)
+    orders["DELIVERY_FEE"] = fee
+    orders["SUB_TOTAL_AMOUNT"] = subtotal
+    orders["DISCOUNT_AMOUNT"] = discount
+    orders["COMMISSION_REVENUE"] = (subtotal * rate).round(2)
+    orders["PAYMENT_PROCESSING_FEE"] = (total * p.payment_fee_rate).round(2)
+    orders["TOTAL_AMOUNT"] = total
+    orders["ORDER_RATING"] = draw(p.ratings)
+
+    items = pd.DataFrame({
+        "ORDER_ITEM_ID": order_ids[owner] + "_" + line_no.astype(str),
+        "ORDER_ID": order_ids[owner],
+        "MENU_ITEM_ID": p.item_menu_ids[line],
+        "QUANTITY": quantity,
+        "ITEM_PRICE_AT_ORDER": price,
+    })
+    money = ["DELIVERY_FEE", "SUB_TOTAL_AMOUNT", "DISCOUNT_AMOUNT", "COMMISSION_REVENUE",
+             "PAYMENT_PROCESSING_FEE", "TOTAL_AMOUNT", "ORDER_RATING"]
+    return {
+        "FACT_ORDERS": (csv_rows(orders, dict.fromkeys(money, 2)), n),
+        "FACT_ORDER_ITEMS": (csv_rows(items, {"ITEM_PRICE_AT_ORDER": 2}), len(items)),
+    }
+
+
+#  DRIVER
+
+def _init_worker(profile):
+    global _PROFILE
+    _PROFILE = profile
+
+
+def _chunks(n, chunk_size):
+    return [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+
+
+def _ordered_results(executor, fn, ranges, window):
+    """fn(start, stop) over `ranges`, yielded in order, with at most `window` chunks in flight."""
+    pending = deque()
+    for start, stop in ranges:
+        pending.append(executor.submit(fn, start, stop))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def generate(profile, out_dir, source_dir, chunk_size=250_000, workers=None):
+    """Writes the scaled CSVs to `out_dir`; returns {table: rows written}."""
+    os.makedirs(out_dir, exist_ok=True)
+    for table in ("DIM_MENU_ITEM", "DIM_COUPON"):
+        shutil.copyfile(os.path.join(source_dir, TABLE_FILES[table]), os.path.join(out_dir, TABLE_FILES[table]))
+
+    columns = {
+        "DIM_RESTAURANT": profile.restaurants.columns,
+        "DIM_CUSTOMER": profile.customers.columns,
+        "FACT_ORDERS": pd.read_csv(os.path.join(source_dir, TABLE_FILES["FACT_ORDERS"]), nrows=0).columns,
+        "FACT_ORDER_ITEMS": pd.read_csv(os.path.join(source_dir, TABLE_FILES["FACT_ORDER_ITEMS"]), nrows=0).columns,
+    }
+    files = {table: open(os.path.join(out_dir, TABLE_FILES[table]), "wb") for table in columns}
+    rows = dict.fromkeys(columns, 0)
+    workers = workers or os.cpu_count() or 1
+    try:
+        for table, fh in files.items():
+            fh.write((",".join(columns[table]) + "\n").encode("utf-8"))
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(profile,)) as executor:
+            for fn, n in ((restaurant_chunk, profile.n_restaurants),
+                          (customer_chunk, profile.n_customers),
+                          (order_chunk, profile.n_orders)):
+                for result in _ordered_results(executor, fn, _chunks(n, chunk_size), window=2 * workers):
+                    for table, (data, n_rows) in result.items():
+                        files[table].write(data)
+                        rows[table] += n_rows
+    finally:
+        for fh in files.values():
+            fh.close()
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--orders", type=int, required=True, help="number of orders to generate")
+    parser.add_argument("--out", required=True, help="output directory (bundled file names)")
+    parser.add_argument("--customers", type=int, help="default: scaled with orders from the bundled ratio")
+    parser.add_argument("--restaurants", type=int, help="default: scaled with orders from the bundled ratio")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--chunk-size", type=int, default=250_000, help="rows per chunk")
+    parser.add_argument("--workers", type=int, help="worker processes (default: all cores)")
+    parser.add_argument("--source", default=os.environ.get("FOOD_DELIVERY_DATA_DIR", BASE_DIR),
+                        help="directory with the bundled CSVs")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    profile = SourceProfile.load(args.source, args.seed, args.orders, args.customers, args.restaurants)
+    rows = generate(profile, args.out, args.source, args.chunk_size, args.workers)
+    for table, n in rows.items():
+        print(f"{table:>18}: {n:>13,} rows")
+    print(f"wrote {args.out} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Bounded execution of AI-generated SQL (Tab 4).
+
+Generated SELECT / WITH statements are never run as-is: they are wrapped
+as a subquery so the warehouse returns one page (`LIMIT / OFFSET`) at a
+time, plus a `COUNT(*)` for the total. A subquery's ORDER BY does not
+order the outer query, so each page carries the statement's own top-level
+ORDER BY keys out (where they name output columns) and breaks ties on
+every output column, so pages neither overlap nor skip rows. A full result is only ever
+streamed batch-by-batch into a local Parquet file, never held in the
+session. Statements that cannot be wrapped (SHOW / CALL) run as-is and
+are paged locally.
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+
+
+PAGE_SIZE = 500
+EXPORT_DIR = os.path.join(tempfile.gettempdir(), "food_delivery_exports")
+
+_WRAPPABLE = re.compile(r"^\s*(SELECT|WITH)\b", re.IGNORECASE)
+_QUOTED = re.compile(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"")
+_ORDER_BY = re.compile(r"\bORDER\s+BY\b", re.IGNORECASE)
+_ROW_LIMIT = re.compile(r"\b(LIMIT|OFFSET|FETCH)\b", re.IGNORECASE)
+_ORDER_KEY = re.compile(
+    r"^(?P<expr>\"(?:[^\"]|\"\")*\"|[A-Za-z_][\w$]*(?:\.[A-Za-z_][\w$]*)*|\d+)"
+    r"(?P<direction>(?:\s+(?:ASC|DESC))?(?:\s+NULLS\s+(?:FIRST|LAST))?)$",
+    re.IGNORECASE,
+)
+
+
+def strip_terminator(sql):
+    return sql.strip().rstrip(";").strip()
+
+
+def is_wrappable(sql):
+    return bool(_WRAPPABLE.match(sql))
+
+
+def count_query(sql):
+    return f"SELECT COUNT(*) AS TOTAL_ROWS FROM ({strip_terminator(sql)}) AS AI_RESULT"
+
+
+def columns_query(sql):
+    """`sql` with no rows, for its output column names."""
+    return f"SELECT * FROM ({strip_terminator(sql)}) AS AI_RESULT LIMIT 0"
+
+
+def _top_level(sql):
+    """`sql` with quoted text and everything inside parentheses blanked out, same length."""
+    masked = _QUOTED.sub(lambda m: "_" * len(m.group()), sql)
+    chars, depth = [], 0
+    for ch in masked:
+        if ch == "(":
+            depth += 1
+        chars.append(ch if depth == 0 else " ")
+        if ch == ")":
+            depth = max(0, depth - 1)
+    return "".join(chars)
+
+
+def order_by_keys(sql):
+    """The statement's own trailing ORDER BY keys (not a subquery's or window's), as written."""
+    sql = strip_terminator(sql)
+    masked = _top_level(sql)
+    matches = list(_ORDER_BY.finditer(masked))
+    if not matches:
+        return []
+    start = matches[-1].end()
+    limit = _ROW_LIMIT.search(masked, start)
+    end = limit.start() if limit else len(sql)
+
+    keys, key_start = [], start
+    for i in range(start, end + 1):
+        if i == end or masked[i] == ",":
+            keys.append(sql[key_start:i].strip())
+            key_start = i + 1
+    return keys
+
+
+def _outer_order_key(key, columns):
+    """`key` rewritten to name an output column of the wrapped query, or None if it cannot."""
+    m = _ORDER_KEY.match(key)
+    if not m:
+        return None
+    expr, direction = m.group("expr"), m.group("direction")
+    if expr.isdigit():
+        return key if 1 <= int(expr) <= len(columns) else None
+    if expr.startswith('"'):
+        return key if expr[1:-1].replace('""', '"') in columns else None
+    name = expr.rsplit(".", 1)[-1]
+    return name + direction if name.upper() in {str(c).upper() for c in columns} else None
+
+
+def page_query(sql, page, columns, page_size=PAGE_SIZE):
+    """One page (1-based) of `sql`, whose output `columns` come from `columns_query`.
+
+    The statement's ORDER BY keys are carried out up to the first one that
+    does not name an output column, then every column (by position) breaks
+    ties, so the row order is total. LIMIT/OFFSET are integers we generate,
+    so they are inlined.
+    """
+    order = []
+    for key in order_by_keys(sql):
+        outer = _outer_order_key(key, list(columns))
+        if outer is None:
+            break
+        order.append(outer)
+    order += [str(i) for i in range(1, len(columns) + 1)]
+
+    offset = (int(page) - 1) * int(page_size)
+    return (
+        f"SELECT * FROM ({strip_terminator(sql)}) AS AI_RESULT ORDER BY {', '.join(order)} "
+        f"LIMIT {int(page_size)} OFFSET {offset}"
+    )
+
+
+def page_count(total_rows, page_size=PAGE_SIZE):
+    return max(1, -(-int(total_rows) // int(page_size)))
+
+
+def export_path(sql, params=()):
+    """Stable Parquet path per (sql, params), so repeated exports reuse one file name."""
+    digest = hashlib.sha1((strip_terminator(sql) + "\x00" + repr(tuple(params))).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(EXPORT_DIR, f"ai_result_{digest}.parquet")
+
+
+def spill_to_parquet(batches, path):
+    """Streams DataFrame batches into one Parquet file; returns the number of rows written."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + ".part"
+    writer, rows = None, 0
+    try:
+        for batch in batches:
+            table = pa.Table.from_pandas(batch, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(tmp_path, table.schema)
+            elif table.schema != writer.schema:
+                table = table.cast(writer.schema)
+            writer.write_table(table)
+            rows += table.num_rows
+        if writer is None:
+            return 0
+        writer.close()
+        os.replace(tmp_path, path)
+        return rows
+    finally:
+        # a failed or interrupted write leaves no partial file behind
+        if writer is not None:
+            writer.close()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
@@ -0,0 +1,140 @@
+"""
+Customer feature table behind the Tab 5 / Tab 6 customer metrics.
+
+AGG_CUSTOMER_FEATURES holds one row per (customer, restaurant, month)
+with the customer's order count, GMV, first / last order date and rating
+sum / count there. The restaurant key lets every city / cuisine /
+restaurant filter roll up exactly, and the month key lets the whole
+months of a date filter come from the table; the days of partially
+covered months are read from FACT_ORDERS (see `rollups.month_grain_predicates`).
+
+Refreshes recompute every key touched by orders past the watermark, as
+for AGG_DAILY_RESTAURANT, so re-running one is idempotent. The customer
+KPIs, the loyal-customer ranking and the top customer are then
+per-customer sums over these rows instead of a regrouping of the
+filtered orders.
+"""
+
+from dashboard_queries import ORDERS_SOURCE
+from rollups import MONTH_SQL, WATERMARK_DDL, month_grain_predicates, pending_orders, save_watermark, where_sql
+
+
+FEATURE_TABLE = "AGG_CUSTOMER_FEATURES"
+
+# Cards served from the table instead of the order cube (see order_cube.CARD_COLUMNS)
+FEATURE_CARDS = ("customer_kpis", "loyal_customers", "top_customer")
+
+FEATURE_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {FEATURE_TABLE} (
+        CUSTOMER_ID VARCHAR(10) NOT NULL,
+        RESTAURANT_ID VARCHAR(10) NOT NULL,
+        MONTH DATE NOT NULL,
+        ORDER_COUNT BIGINT NOT NULL,
+        GMV DECIMAL(18, 2),
+        FIRST_ORDER_DATE DATE,
+        LAST_ORDER_DATE DATE,
+        RATING_SUM DECIMAL(18, 2),
+        RATING_COUNT BIGINT
+    )
+"""
+
+# Feature column -> aggregate over the fact rows of one (customer, restaurant, month) key
+FEATURE_MEASURES = {
+    "ORDER_COUNT": "COUNT(O.ORDER_ID)",
+    "GMV": "SUM(O.TOTAL_AMOUNT)",
+    "FIRST_ORDER_DATE": "MIN(O.ORDER_TIMESTAMP)",
+    "LAST_ORDER_DATE": "MAX(O.ORDER_TIMESTAMP)",
+    "RATING_SUM": "SUM(O.ORDER_RATING)",
+    "RATING_COUNT": "COUNT(O.ORDER_RATING)",
+}
+
+
+def _merge_sql(new_orders_predicate):
+    """Recomputes every (customer, restaurant, month) key touched by the new orders and upserts it."""
+    cols = list(FEATURE_MEASURES)
+    aggs = ",\n            ".join(f"{expr} AS {col}" for col, expr in FEATURE_MEASURES.items())
+    return f"""
+    MERGE INTO {FEATURE_TABLE} T
+    USING (
+        SELECT O.CUSTOMER_ID, O.RESTAURANT_ID, {MONTH_SQL} AS MONTH,
+            {aggs}
+        FROM FACT_ORDERS O
+        JOIN (
+            SELECT DISTINCT O.CUSTOMER_ID, O.RESTAURANT_ID, {MONTH_SQL} AS MONTH
+            FROM FACT_ORDERS O
+            WHERE {new_orders_predicate}
+        ) K ON O.CUSTOMER_ID = K.CUSTOMER_ID AND O.RESTAURANT_ID = K.RESTAURANT_ID AND {MONTH_SQL} = K.MONTH
+        GROUP BY O.CUSTOMER_ID, O.RESTAURANT_ID, {MONTH_SQL}
+    ) S
+    ON T.CUSTOMER_ID = S.CUSTOMER_ID AND T.RESTAURANT_ID = S.RESTAURANT_ID AND T.MONTH = S.MONTH
+    WHEN MATCHED THEN UPDATE SET {", ".join(f"{c} = S.{c}" for c in cols)}
+    WHEN NOT MATCHED THEN INSERT (CUSTOMER_ID, RESTAURANT_ID, MONTH, {", ".join(cols)})
+        VALUES (S.CUSTOMER_ID, S.RESTAURANT_ID, S.MONTH, {", ".join(f"S.{c}" for c in cols)})
+    """
+
+
+def refresh_customer_features(execute, full=False):
+    """
+    Brings AGG_CUSTOMER_FEATURES up to date through `execute(sql) -> DataFrame`.
+    Returns the new watermark and whether anything changed.
+    """
+    for ddl in (FEATURE_DDL, WATERMARK_DDL):
+        execute(ddl)
+
+    predicate, watermark = pending_orders(execute, FEATURE_TABLE, full)
+    if predicate is None:
+        return {"watermark": watermark, "refreshed": False}
+    if full:
+        execute(f"DELETE FROM {FEATURE_TABLE}")
+
+    execute(_merge_sql(predicate))
+    save_watermark(execute, FEATURE_TABLE, watermark)
+    return {"watermark": watermark, "refreshed": True}
+
+
+#  QUERIES
+
+def per_customer_sql(filters, data_range=None):
+    """(sql, params): CUSTOMER_ID, ORDER_COUNT, GMV per customer under the sidebar `filters`."""
+    table_preds, fact_preds = month_grain_predicates(filters, "F.MONTH", data_range)
+    branches, params = [], []
+    if table_preds is not None:
+        where, where_params = where_sql(table_preds)
+        branches.append(f"SELECT F.CUSTOMER_ID, F.ORDER_COUNT, F.GMV FROM {FEATURE_TABLE} F "
+                        f"JOIN DIM_RESTAURANT R ON F.RESTAURANT_ID = R.RESTAURANT_ID{where}")
+        params.extend(where_params)
+    if fact_preds is not None:
+        where, where_params = where_sql(fact_preds)
+        branches.append(f"SELECT O.CUSTOMER_ID, 1 AS ORDER_COUNT, O.TOTAL_AMOUNT AS GMV FROM {ORDERS_SOURCE}{where}")
+        params.extend(where_params)
+    sql = (f"SELECT CUSTOMER_ID, SUM(ORDER_COUNT) AS ORDER_COUNT, SUM(GMV) AS GMV "
+           f"FROM ({' UNION ALL '.join(branches)}) U GROUP BY CUSTOMER_ID")
+    return sql, tuple(params)
+
+
+def customer_kpis_query(filters, data_range=None):
+    """(sql, params) with the columns of `order_cube.customer_kpis`; no row when no customer ordered."""
+    per_customer, params = per_customer_sql(filters, data_range)
+    return f"""
+        SELECT
+            COUNT(*) AS TOTAL_CUSTOMERS,
+            CAST(COUNT_IF(P.ORDER_COUNT > 1) AS BIGINT) AS REPEAT_CUSTOMERS,
+            ROUND(COUNT_IF(P.ORDER_COUNT > 1) * 100.0 / COUNT(*), 2) AS REPEAT_RATE,
+            ROUND(AVG(P.ORDER_COUNT), 2) AS AVG_ORDERS_PER_CUSTOMER,
+            ROUND(AVG(P.GMV), 2) AS AVG_GMV_PER_CUSTOMER
+        FROM ({per_customer}) P
+        HAVING COUNT(*) > 0
+    """, params
+
+
+def loyal_customers_query(filters, n=None, data_range=None):
+    """(sql, params) with the columns of `order_cube.loyal_customers`: most orders first, ties by name."""
+    per_customer, params = per_customer_sql(filters, data_range)
+    limit = f" LIMIT {int(n)}" if n else ""
+    return f"""
+        SELECT C.CUSTOMER_NAME, CAST(SUM(P.ORDER_COUNT) AS BIGINT) AS TOTAL_ORDERS, ROUND(SUM(P.GMV), 2) AS TOTAL_SPENT
+        FROM ({per_customer}) P
+        JOIN DIM_CUSTOMER C ON P.CUSTOMER_ID = C.CUSTOMER_ID
+        GROUP BY C.CUSTOMER_NAME
+        ORDER BY TOTAL_ORDERS DESC, C.CUSTOMER_NAME{limit}
+    """, params
@@ -0,0 +1,155 @@
+"""
+Mergeable distinct-customer counts (HyperLogLog) for the customer metrics.
+
+COUNT(DISTINCT CUSTOMER_ID) does not roll up, so Monthly Active Customers
+and the total / unique customer KPIs cannot be served from the daily
+rollup. AGG_MONTHLY_CUSTOMER_HLL keeps, per (month, restaurant), the
+HyperLogLog registers of the customers who ordered: one row per non-empty
+register with the highest rank (leading zeros + 1) of any customer hash
+that fell into it. Registers of any set of keys merge with MAX, so every
+city / cuisine / restaurant / date filter is answered from the sketch rows
+in plain SQL that runs on Snowflake and DuckDB alike.
+
+Register ranks only grow, so refreshes fold new orders in with a
+conditional MERGE from the same (ORDER_TIMESTAMP, ORDER_ID) watermark
+table as the daily rollup, and re-running one is idempotent. Date ranges
+that cut through a month read the sketches of the whole months and hash
+the orders of the partial months directly.
+
+With 2^12 registers the relative standard error is 1.04 / sqrt(4096),
+about 1.6 %. `exact=True` returns COUNT(DISTINCT ...) over the same
+filters, with the same output columns.
+"""
+
+import math
+
+from dashboard_queries import DIMENSION_SQL, ORDERS_SOURCE
+from rollups import MONTH_SQL, WATERMARK_DDL, month_grain_predicates, pending_orders, save_watermark, where_sql
+
+
+SKETCH_TABLE = "AGG_MONTHLY_CUSTOMER_HLL"
+
+PRECISION = 12
+REGISTERS = 1 << PRECISION
+STANDARD_ERROR = 1.04 / math.sqrt(REGISTERS)
+
+SKETCH_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {SKETCH_TABLE} (
+        MONTH DATE NOT NULL,
+        RESTAURANT_ID VARCHAR(10) NOT NULL,
+        REGISTER_ID SMALLINT NOT NULL,
+        MAX_RANK SMALLINT NOT NULL
+    )
+"""
+
+# 32 hash bits (HASH differs between engines, but each engine is
+# consistent with itself): the low PRECISION bits pick the register, the
+# rank is the position of the first set bit in the remaining ones.
+_HASH_BITS = 32
+_HASH = f"ABS(MOD(HASH(O.CUSTOMER_ID), {1 << _HASH_BITS}))"
+_REST = f"FLOOR({_HASH} / {REGISTERS})"
+_REST_BITS = _HASH_BITS - PRECISION
+
+REGISTER_SQL = f"MOD({_HASH}, {REGISTERS})"
+# The epsilon keeps exact powers of two from rounding down in floating point
+RANK_SQL = f"CASE WHEN {_REST} = 0 THEN {_REST_BITS + 1} ELSE {_REST_BITS} - FLOOR(LN({_REST}) / LN(2) + 1e-9) END"
+
+# Bias constant for m >= 128 registers (Flajolet et al.)
+_ALPHA = 0.7213 / (1 + 1.079 / REGISTERS)
+
+
+def _merge_sql(new_orders_predicate):
+    """Raises each touched register to the highest rank among the new orders."""
+    return f"""
+    MERGE INTO {SKETCH_TABLE} T
+    USING (
+        SELECT MONTH, RESTAURANT_ID, REGISTER_ID, MAX(MAX_RANK) AS MAX_RANK
+        FROM (
+            SELECT {MONTH_SQL} AS MONTH, O.RESTAURANT_ID,
+                {REGISTER_SQL} AS REGISTER_ID,
+                {RANK_SQL} AS MAX_RANK
+            FROM FACT_ORDERS O
+            WHERE {new_orders_predicate}
+        ) N
+        GROUP BY MONTH, RESTAURANT_ID, REGISTER_ID
+    ) S
+    ON T.MONTH = S.MONTH AND T.RESTAURANT_ID = S.RESTAURANT_ID AND T.REGISTER_ID = S.REGISTER_ID
+    WHEN MATCHED AND S.MAX_RANK > T.MAX_RANK THEN UPDATE SET MAX_RANK = S.MAX_RANK
+    WHEN NOT MATCHED THEN INSERT (MONTH, RESTAURANT_ID, REGISTER_ID, MAX_RANK)
+        VALUES (S.MONTH, S.RESTAURANT_ID, S.REGISTER_ID, S.MAX_RANK)
+    """
+
+
+def refresh_customer_sketches(execute, full=False):
+    """
+    Brings AGG_MONTHLY_CUSTOMER_HLL up to date through `execute(sql) -> DataFrame`.
+    Returns the new watermark and whether anything changed.
+    """
+    for ddl in (SKETCH_DDL, WATERMARK_DDL):
+        execute(ddl)
+
+    predicate, watermark = pending_orders(execute, SKETCH_TABLE, full)
+    if predicate is None:
+        return {"watermark": watermark, "refreshed": False}
+    if full:
+        execute(f"DELETE FROM {SKETCH_TABLE}")
+
+    execute(_merge_sql(predicate))
+    save_watermark(execute, SKETCH_TABLE, watermark)
+    return {"watermark": watermark, "refreshed": True}
+
+
+#  QUERIES
+
+_MONTH_LABEL = {"O": "TO_CHAR(O.ORDER_TIMESTAMP, 'YYYY-MM')", "S": "TO_CHAR(S.MONTH, 'YYYY-MM')"}
+
+
+def _dimensions(by, alias):
+    """Group expressions for `by` over the fact (O) or sketch (S) rows."""
+    return [_MONTH_LABEL[alias] if d == "MONTH" else DIMENSION_SQL[d] for d in by]
+
+
+def customer_count_query(filters, by=(), exact=False, data_range=None, name="CUSTOMERS"):
+    """
+    (sql, params) counting distinct customers per `by` group ("MONTH",
+    "CITY", "CUISINE_TYPE", "RESTAURANT_NAME") under the sidebar `filters`.
+    Approximate (from the sketches) unless `exact`; MONTH is 'YYYY-MM'.
+    """
+    by = list(by)
+    order = f" ORDER BY {', '.join(by)}" if by else ""
+
+    if exact:
+        where, params = filters.where()
+        exprs = _dimensions(by, "O")
+        select = ", ".join([f"{e} AS {d}" for e, d in zip(exprs, by)] + [f"COUNT(DISTINCT O.CUSTOMER_ID) AS {name}"])
+        group = f" GROUP BY {', '.join(exprs)}" if by else ""
+        return f"SELECT {select} FROM {ORDERS_SOURCE}{where}{group}{order}", params
+
+    sketch_preds, fact_preds = month_grain_predicates(filters, "S.MONTH", data_range)
+    branches, params = [], []
+    if sketch_preds is not None:
+        where, where_params = where_sql(sketch_preds)
+        dims = [f"{e} AS {d}" for e, d in zip(_dimensions(by, "S"), by)]
+        branches.append(f"SELECT {', '.join(dims + ['S.REGISTER_ID', 'S.MAX_RANK'])} "
+                        f"FROM {SKETCH_TABLE} S JOIN DIM_RESTAURANT R ON S.RESTAURANT_ID = R.RESTAURANT_ID{where}")
+        params.extend(where_params)
+    if fact_preds is not None:
+        where, where_params = where_sql(fact_preds)
+        dims = [f"{e} AS {d}" for e, d in zip(_dimensions(by, "O"), by)]
+        columns = dims + [f"{REGISTER_SQL} AS REGISTER_ID", f"{RANK_SQL} AS MAX_RANK"]
+        branches.append(f"SELECT {', '.join(columns)} FROM {ORDERS_SOURCE}{where}")
+        params.extend(where_params)
+
+    # Standard HLL estimate, with linear counting while registers are still empty
+    raw = f"{_ALPHA * REGISTERS * REGISTERS!r} / (SUM(POWER(2, -MAX_RANK)) + {REGISTERS} - COUNT(*))"
+    empty = f"({REGISTERS} - COUNT(*))"
+    estimate = (f"CAST(ROUND(CASE WHEN {raw} <= {2.5 * REGISTERS} AND {empty} > 0 "
+                f"THEN {REGISTERS} * LN({REGISTERS} / {empty}) ELSE {raw} END) AS BIGINT)")
+    keys = ", ".join(by + ["REGISTER_ID"])
+    group = f" GROUP BY {', '.join(by)}" if by else ""
+    sql = (
+        f"SELECT {', '.join(by + [f'{estimate} AS {name}'])} FROM ("
+        f"SELECT {keys}, MAX(MAX_RANK) AS MAX_RANK FROM ({' UNION ALL '.join(branches)}) U GROUP BY {keys}"
+        f") M{group}{order}"
+    )
+    return sql, tuple(params)
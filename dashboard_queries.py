@@ -0,0 +1,168 @@
+"""
+SQL building blocks for the dashboard tabs.
+
+Shared join sources and metric expressions, the column projection used
+for order-level reads, plus the per-tab aggregate specs that
+`query_compiler` fuses into one statement per render.
+"""
+
+import re
+
+from query_compiler import AggregateSpec
+
+
+NET_PROFIT_SQL = "(O.DELIVERY_FEE + O.COMMISSION_REVENUE) - (O.DISCOUNT_AMOUNT + O.PAYMENT_PROCESSING_FEE)"
+
+ORDERS_SOURCE = "FACT_ORDERS O JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID"
+
+ORDERS_CUSTOMERS_SOURCE = (
+    "FACT_ORDERS O JOIN DIM_CUSTOMER C ON O.CUSTOMER_ID = C.CUSTOMER_ID "
+    "JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID"
+)
+
+ORDER_ITEMS_SOURCE = (
+    "FACT_ORDER_ITEMS I JOIN DIM_MENU_ITEM M ON I.MENU_ITEM_ID = M.MENU_ITEM_ID "
+    "JOIN FACT_ORDERS O ON I.ORDER_ID = O.ORDER_ID "
+    "JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID"
+)
+
+
+#  COLUMN PROJECTION (order-level reads select only the columns their cards use)
+
+# V_PLATFORM_PROFITABILITY column (plus the restaurant attributes the order
+# cube carries) -> expression over FACT_ORDERS O / DIM_CUSTOMER C / DIM_RESTAURANT R
+ORDER_COLUMN_SQL = {
+    "ORDER_ID": "O.ORDER_ID",
+    "ORDER_TIMESTAMP": "O.ORDER_TIMESTAMP",
+    "CUSTOMER_ID": "O.CUSTOMER_ID",
+    "CUSTOMER_NAME": "C.CUSTOMER_NAME",
+    "RESTAURANT_ID": "O.RESTAURANT_ID",
+    "RESTAURANT_NAME": "R.RESTAURANT_NAME",
+    "CITY": "R.CITY",
+    "CUISINE_TYPE": "R.CUISINE_TYPE",
+    "AVERAGE_RATING": "R.AVERAGE_RATING",
+    "COMMISSION_RATE": "R.COMMISSION_RATE",
+    "GMV": "O.TOTAL_AMOUNT",
+    "DELIVERY_FEE": "O.DELIVERY_FEE",
+    "COMMISSION_REVENUE": "O.COMMISSION_REVENUE",
+    "DISCOUNT_AMOUNT": "O.DISCOUNT_AMOUNT",
+    "PAYMENT_PROCESSING_FEE": "O.PAYMENT_PROCESSING_FEE",
+    "NET_PROFIT": NET_PROFIT_SQL,
+    "ORDER_RATING": "O.ORDER_RATING",
+}
+
+# The view's own columns (ORDER_COLUMN_SQL minus the cube-only restaurant attributes)
+VIEW_OUTPUT_COLUMNS = [c for c in ORDER_COLUMN_SQL if c not in ("AVERAGE_RATING", "COMMISSION_RATE")]
+
+_JOINS = {
+    "C": "JOIN DIM_CUSTOMER C ON O.CUSTOMER_ID = C.CUSTOMER_ID",
+    "R": "JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID",
+}
+
+
+def referenced_columns(*sql_parts):
+    """ORDER_COLUMN_SQL names that appear as identifiers in any of `sql_parts`."""
+    text = " ".join(sql_parts)
+    return [c for c in ORDER_COLUMN_SQL if re.search(rf"(?<![\w.]){c}\b", text)]
+
+
+def orders_source(columns, where_clause=""):
+    """FACT_ORDERS plus only the joins the columns (and a qualified WHERE clause) need."""
+    used = " ".join(ORDER_COLUMN_SQL[c] for c in columns) + " " + (where_clause or "")
+    joins = [join for alias, join in _JOINS.items() if re.search(rf"\b{alias}\.", used)]
+    return " ".join(["FACT_ORDERS O"] + joins)
+
+
+def projected_select(columns, where_clause=""):
+    """`SELECT <columns> FROM <narrowest source> <where_clause>`; the WHERE uses O. / C. / R. names."""
+    select = ", ".join(f"{ORDER_COLUMN_SQL[c]} AS {c}" for c in columns)
+    return f"SELECT {select} FROM {orders_source(columns, where_clause)}{where_clause or ''}"
+
+
+def projected_view(columns):
+    """Drop-in replacement for `V_PLATFORM_PROFITABILITY` exposing only `columns` (no customer
+    join unless CUSTOMER_NAME is among them); unqualified view column names keep working."""
+    return f"({projected_select(columns)}) AS V"
+
+
+# Largest Top N slider value: ranked cards are fetched at this depth and sliced locally
+TOP_N_MAX = 20
+
+# Comparison dimension (see get_comparison_dimension) -> joined-source column
+DIMENSION_SQL = {"CITY": "R.CITY", "CUISINE_TYPE": "R.CUISINE_TYPE", "RESTAURANT_NAME": "R.RESTAURANT_NAME"}
+
+
+def executive_dashboard_specs(top_n=TOP_N_MAX, comparison_dim=None):
+    """
+    Tab 2 as server-side aggregates: one KPI row, the monthly GMV series
+    (per comparison dimension when one is active) and the top-N order / GMV /
+    profit totals per group. Every branch is eligible for the daily rollup.
+    """
+    group_col = comparison_dim or "CITY"
+    group = {group_col: DIMENSION_SQL[group_col]}
+    month = {"MONTH": "TO_CHAR(O.ORDER_TIMESTAMP, 'YYYY-MM')"}
+    if comparison_dim:
+        month[comparison_dim] = DIMENSION_SQL[comparison_dim]
+    gmv, orders, profit = "SUM(O.TOTAL_AMOUNT)", "COUNT(DISTINCT O.ORDER_ID)", f"SUM({NET_PROFIT_SQL})"
+    return [
+        AggregateSpec("EXEC_KPIS", ORDERS_SOURCE, measures={
+            "TOTAL_GMV": gmv,
+            "TOTAL_ORDERS": orders,
+            "TOTAL_NET_PROFIT": profit,
+        }),
+        AggregateSpec("MONTHLY_GMV", ORDERS_SOURCE, dims=month, measures={"GMV": gmv}),
+        AggregateSpec("ORDER_SHARE", ORDERS_SOURCE, dims=group, measures={"ORDERS": orders},
+                      order_by="ORDERS", limit=top_n),
+        AggregateSpec("GROUP_GMV", ORDERS_SOURCE, dims=group, measures={"GMV": gmv}, order_by="GMV", limit=top_n),
+        AggregateSpec("GROUP_PROFIT", ORDERS_SOURCE, dims=group, measures={"NET_PROFIT": profit},
+                      order_by="NET_PROFIT", limit=top_n),
+    ]
+
+
+def restaurant_deep_dive_specs(top_n=TOP_N_MAX):
+    """Every Tab 3 card as one fusable aggregate spec."""
+    rated = ["O.ORDER_RATING IS NOT NULL"]
+    avg_rating = "ROUND(AVG(O.ORDER_RATING), 2)"
+    return [
+        AggregateSpec("RATING_KPIS", ORDERS_SOURCE, measures={
+            "AVG_RATING": avg_rating,
+            "MAX_RATING": "MAX(O.ORDER_RATING)",
+            "MIN_RATING": "MIN(O.ORDER_RATING)",
+        }, where=rated),
+        AggregateSpec("HIGHEST_RATED", ORDERS_SOURCE, dims={"RESTAURANT_NAME": "R.RESTAURANT_NAME"},
+                      measures={"AVG_RATING": avg_rating}, where=rated, order_by="AVG_RATING", limit=1),
+        AggregateSpec("LOWEST_RATED", ORDERS_SOURCE, dims={"RESTAURANT_NAME": "R.RESTAURANT_NAME"},
+                      measures={"AVG_RATING": avg_rating}, where=rated, order_by="AVG_RATING",
+                      descending=False, limit=1),
+        AggregateSpec("TOP_PROFIT", ORDERS_SOURCE, dims={"RESTAURANT_NAME": "R.RESTAURANT_NAME"},
+                      measures={"TOTAL_PROFIT": f"SUM({NET_PROFIT_SQL})"}, order_by="TOTAL_PROFIT", limit=top_n),
+        AggregateSpec("TOP_GMV", ORDERS_SOURCE, dims={"RESTAURANT_NAME": "R.RESTAURANT_NAME"},
+                      measures={"TOTAL_GMV": "SUM(O.TOTAL_AMOUNT)"}, order_by="TOTAL_GMV", limit=top_n),
+        AggregateSpec("CUISINE_PROFIT", ORDERS_SOURCE, dims={"CUISINE_TYPE": "R.CUISINE_TYPE"},
+                      measures={"TOTAL_NET_PROFIT": f"SUM({NET_PROFIT_SQL})"}, order_by="TOTAL_NET_PROFIT",
+                      limit=top_n),
+        AggregateSpec("CUISINE_GMV", ORDERS_SOURCE, dims={"CUISINE_TYPE": "R.CUISINE_TYPE"},
+                      measures={"TOTAL_GMV": "SUM(O.TOTAL_AMOUNT)"}, order_by="TOTAL_GMV", limit=top_n),
+        AggregateSpec("TOP_CUSTOMERS", ORDERS_CUSTOMERS_SOURCE, dims={"CUSTOMER_NAME": "C.CUSTOMER_NAME"},
+                      measures={"TOTAL_GMV": "SUM(O.TOTAL_AMOUNT)"}, order_by="TOTAL_GMV", limit=top_n),
+        AggregateSpec("COMMISSION_PROFIT", ORDERS_SOURCE, dims={"COMMISSION_RATE": "R.COMMISSION_RATE"},
+                      measures={"TOTAL_NET_PROFIT": f"SUM({NET_PROFIT_SQL})"},
+                      where=["R.COMMISSION_RATE IS NOT NULL"], having="COUNT(O.ORDER_ID) > 10"),
+        AggregateSpec("COMMISSION_BY_CUISINE", ORDERS_SOURCE, dims={"CUISINE_TYPE": "R.CUISINE_TYPE"},
+                      measures={"AVG_COMMISSION": "ROUND(AVG(R.COMMISSION_RATE), 3)"}, order_by="AVG_COMMISSION",
+                      limit=top_n),
+        AggregateSpec("MENU_CATEGORIES", ORDER_ITEMS_SOURCE, dims={"CATEGORY": "M.CATEGORY"},
+                      measures={"TOTAL_REVENUE": "SUM(I.ITEM_PRICE_AT_ORDER * I.QUANTITY)"},
+                      order_by="TOTAL_REVENUE", limit=top_n),
+        AggregateSpec("RATING_VOLUME", ORDERS_SOURCE,
+                      dims={"RESTAURANT_NAME": "R.RESTAURANT_NAME", "AVERAGE_RATING": "R.AVERAGE_RATING"},
+                      measures={"ORDER_VOLUME": "COUNT(O.ORDER_ID)"}, having="COUNT(O.ORDER_ID) > 3"),
+    ]
+
+
+def commission_correlation_specs():
+    """Tab 6 commission-vs-profit input (platform-wide, ignores sidebar filters)."""
+    return [
+        AggregateSpec("COMMISSION_PROFIT", ORDERS_SOURCE, dims={"COMMISSION_RATE": "R.COMMISSION_RATE"},
+                      measures={"PROFIT": f"SUM({NET_PROFIT_SQL})"}, where=["R.COMMISSION_RATE IS NOT NULL"]),
+    ]
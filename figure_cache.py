@@ -0,0 +1,80 @@
+"""
+LRU cache of built Plotly figures.
+
+Building a figure with plotly.express (trace construction, template merge,
+validation) costs tens of milliseconds per chart and is paid again on
+every rerun, even when only a widget on another card changed. Figures are
+keyed by a fingerprint of their input frame (values, index, column names
+and dtypes), the chart spec and the Plotly template, and stored as
+serialized figure JSON with least-recently-used eviction and hit/miss
+counters. A hit skips figure construction: the stored JSON was validated
+when it was built, so it is loaded back without validating it again.
+"""
+
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+
+
+def frame_fingerprint(df):
+    """Stable digest of a DataFrame's values, index, column names and dtypes."""
+    digest = hashlib.sha1(repr([(str(c), str(t)) for c, t in df.dtypes.items()]).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(df, index=True).values.tobytes())
+    return digest.hexdigest()
+
+
+def figure_key(df, spec, template):
+    spec_text = json.dumps(spec, sort_keys=True, default=str)
+    return hashlib.sha1(f"{frame_fingerprint(df)}\x00{spec_text}\x00{template}".encode("utf-8")).hexdigest()
+
+
+class FigureCache:
+    """Thread-safe LRU cache of figure JSON keyed by (frame, chart spec, template), with hit/miss counters."""
+
+    def __init__(self, max_entries=256):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()   # key -> figure JSON
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, df, spec, template, build):
+        """The figure for (df, spec, template): from the cache, or `build()` and stored."""
+        key = figure_key(df, spec, template)
+        with self._lock:
+            figure_json = self._entries.get(key)
+            if figure_json is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        if figure_json is not None:
+            return go.Figure(json.loads(figure_json), _validate=False)
+
+        fig = build()
+        figure_json = pio.to_json(fig, validate=False)
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = figure_json
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return fig
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "entries": len(self._entries),
+                "bytes": sum(len(s) for s in self._entries.values()),
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
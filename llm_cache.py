@@ -0,0 +1,136 @@
+"""
+Durable cache for Snowflake Cortex completions.
+
+Completions are stored in a local SQLite file keyed by (model, prompt hash,
+schema version), so they survive reruns, sessions and process restarts and
+are shared by every process pointing at the same file. The store is
+size-bounded with least-recently-used eviction and keeps hit/miss counters,
+per entry and per process.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+
+DEFAULT_PATH = os.path.join(os.path.expanduser("~"), ".cache", "food_delivery_app", "cortex_completions.sqlite")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS COMPLETIONS (
+    CACHE_KEY       TEXT PRIMARY KEY,
+    MODEL           TEXT NOT NULL,
+    PROMPT_HASH     TEXT NOT NULL,
+    SCHEMA_VERSION  TEXT NOT NULL,
+    COMPLETION      TEXT NOT NULL,
+    COMPUTE_SECONDS REAL NOT NULL,
+    CREATED_AT      REAL NOT NULL,
+    LAST_USED_AT    REAL NOT NULL,
+    HITS            INTEGER NOT NULL DEFAULT 0
+)
+"""
+
+
+def prompt_hash(prompt):
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+
+
+def schema_version(*parts):
+    """Short, stable version tag for the schema text a prompt depends on."""
+    return hashlib.sha1("\x00".join(parts).encode("utf-8")).hexdigest()[:12]
+
+
+class CompletionCache:
+    """
+    SQLite-backed LRU of LLM completions. `get_or_complete` returns the stored
+    completion or calls `complete(model, prompt)` and stores its result.
+    Failed completions are never stored.
+    """
+
+    def __init__(self, path=None, max_entries=2000):
+        self.path = path or os.environ.get("FOOD_DELIVERY_LLM_CACHE", DEFAULT_PATH)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self._lock = threading.Lock()
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+        except (OSError, sqlite3.Error):
+            # Read-only or missing home directory: keep the cache for this process only
+            self.path = ":memory:"
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(_SCHEMA)
+        self._db.commit()
+
+    @staticmethod
+    def key(model, prompt, version):
+        return hashlib.sha256(f"{model}\x00{version}\x00{prompt_hash(prompt)}".encode("utf-8")).hexdigest()
+
+    def get(self, model, prompt, version):
+        key = self.key(model, prompt, version)
+        with self._lock:
+            row = self._db.execute(
+                "SELECT COMPLETION, COMPUTE_SECONDS FROM COMPLETIONS WHERE CACHE_KEY = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._db.execute(
+                "UPDATE COMPLETIONS SET LAST_USED_AT = ?, HITS = HITS + 1 WHERE CACHE_KEY = ?", (time.time(), key)
+            )
+            self._db.commit()
+            self.hits += 1
+            self.saved_seconds += row[1]
+            return row[0]
+
+    def put(self, model, prompt, version, completion, compute_seconds=0.0):
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO COMPLETIONS VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)",
+                (self.key(model, prompt, version), model, prompt_hash(prompt), version,
+                 completion, compute_seconds, now, now),
+            )
+            # LRU eviction down to max_entries
+            self._db.execute(
+                "DELETE FROM COMPLETIONS WHERE CACHE_KEY IN ("
+                "  SELECT CACHE_KEY FROM COMPLETIONS ORDER BY LAST_USED_AT DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self._db.commit()
+
+    def get_or_complete(self, model, prompt, version, complete):
+        cached = self.get(model, prompt, version)
+        if cached is not None:
+            return cached
+        with self._lock:
+            self.misses += 1
+        start = time.perf_counter()
+        completion = complete(model, prompt)
+        if completion:
+            self.put(model, prompt, version, completion, time.perf_counter() - start)
+        return completion
+
+    def stats(self):
+        with self._lock:
+            entries, stored_hits = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(HITS), 0) FROM COMPLETIONS"
+            ).fetchone()
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "saved_seconds": round(self.saved_seconds, 2),
+                "entries": entries,
+                "lifetime_hits": stored_hits,
+                "path": self.path,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM COMPLETIONS")
+            self._db.commit()
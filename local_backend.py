@@ -0,0 +1,141 @@
+"""
+Local, in-process query backend for the Food Delivery Analytics Portal.
+
+Loads the six bundled *_STREAMLIT.csv files into an in-memory DuckDB
+database and defines the tables and views exactly as written in
+`create table_DDL.txt`, so every dashboard query can run without a
+Snowflake session (dev, CI and load tests).
+"""
+
+import os
+import re
+
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DDL_PATH = os.path.join(BASE_DIR, "create table_DDL.txt")
+
+# Table name (as in the DDL) -> bundled CSV file. Dimensions are listed
+# before facts so the load order matches the foreign-key direction.
+TABLE_FILES = {
+    "DIM_CUSTOMER": "DIM_CUSTOMERS_STREAMLIT.csv",
+    "DIM_RESTAURANT": "DIM_RESTAURANT_RESTAURANT_STREAMLIT.csv",
+    "DIM_MENU_ITEM": "DIM_MENU_ITEM_STREAMLIT.csv",
+    "DIM_COUPON": "DIM_COUPON_STREAMLIT.csv",
+    "FACT_ORDERS": "FACT_ORDER_STREAMLIT.csv",
+    "FACT_ORDER_ITEMS": "DIM_FACT_ORDER_ITEMS_STREAMLIT.csv",
+}
+
+# Snowflake functions used by the dashboard that DuckDB does not ship.
+SNOWFLAKE_MACROS = [
+    """
+    CREATE OR REPLACE MACRO TO_CHAR(d, fmt) AS
+        strftime(d, replace(replace(replace(fmt, 'YYYY', '%Y'), 'MM', '%m'), 'DD', '%d'))
+    """,
+]
+
+
+def _split_statements(sql_text):
+    """Strip `--` comments and split a script into individual statements."""
+    no_comments = re.sub(r"--[^\n]*", "", sql_text)
+    return [s.strip() for s in no_comments.split(";") if s.strip()]
+
+
+def translate_ddl(statement):
+    """
+    Rewrites one Snowflake DDL statement into DuckDB syntax.
+    Returns None for statements that have no local equivalent.
+    """
+    upper = statement.upper()
+    if upper.startswith("CREATE DATABASE") or upper.startswith("CREATE SCHEMA"):
+        return None
+
+    stmt = re.sub(r"FOOD_DELIVERY_APP\.FOOD_DELIVERY_APP\.", "", statement, flags=re.IGNORECASE)
+    stmt = re.sub(r"\bNUMBER\s*\(", "DECIMAL(", stmt, flags=re.IGNORECASE)
+
+    if re.match(r"CREATE\s+(OR\s+REPLACE\s+)?TABLE", stmt, re.IGNORECASE):
+        # Snowflake only enforces NOT NULL, so PK/FK/UNIQUE are dropped here too.
+        lines = []
+        for line in stmt.splitlines():
+            if re.match(r"\s*(constraint\b|primary\s+key\s*\()", line, re.IGNORECASE):
+                continue
+            line = re.sub(r"\s+PRIMARY\s+KEY\b|\s+UNIQUE\b", "", line, flags=re.IGNORECASE)
+            lines.append(line)
+        stmt = "\n".join(lines)
+        stmt = re.sub(r",\s*\)\s*$", "\n)", stmt)
+
+    return stmt
+
+
+class LocalBackend:
+    """
+    DuckDB-backed stand-in for the Snowflake connection.
+    `query(sql)` returns a pandas DataFrame, like `run_query` does.
+    """
+
+    def __init__(self, data_dir=None, ddl_path=DDL_PATH):
+        try:
+            import duckdb
+        except ImportError as e:
+            raise ImportError("The local backend requires the 'duckdb' package (pip install duckdb).") from e
+
+        self.data_dir = data_dir or os.environ.get("FOOD_DELIVERY_DATA_DIR", BASE_DIR)
+        self._con = duckdb.connect(database=":memory:")
+
+        with open(ddl_path, encoding="utf-8") as fh:
+            ddl_text = fh.read()
+
+        for statement in _split_statements(ddl_text):
+            stmt = translate_ddl(statement)
+            if not stmt:
+                continue
+            self._con.execute(stmt)
+            match = re.match(r"CREATE\s+(?:OR\s+REPLACE\s+)?TABLE\s+(\w+)", stmt, re.IGNORECASE)
+            if match:
+                self._load_table(match.group(1).upper())
+
+        for macro in SNOWFLAKE_MACROS:
+            self._con.execute(macro)
+
+    def _load_table(self, table):
+        """Bulk-loads the bundled CSV for a freshly created table."""
+        path = os.path.join(self.data_dir, TABLE_FILES[table])
+        self._con.execute(
+            f"INSERT INTO {table} BY NAME SELECT * FROM read_csv(?, header = true)",
+            [path],
+        )
+
+    def query(self, q, params=None):
+        """Executes one SQL statement (`?` bind variables) and returns the result as a DataFrame."""
+        if "SNOWFLAKE.CORTEX" in q.upper():
+            raise NotImplementedError("Snowflake Cortex functions are not available on the local backend.")
+        # A cursor is a separate connection to the same database, so callers
+        # on different threads never share DuckDB connection state.
+        cur = self._con.cursor()
+        try:
+            return cur.execute(q, list(params) if params else None).df()
+        finally:
+            cur.close()
+
+    def query_batches(self, q, params=None, batch_size=100_000):
+        """Like `query`, but yields the result as DataFrames of at most `batch_size` rows."""
+        if "SNOWFLAKE.CORTEX" in q.upper():
+            raise NotImplementedError("Snowflake Cortex functions are not available on the local backend.")
+        cur = self._con.cursor()
+        try:
+            cur.execute(q, list(params) if params else None)
+            while True:
+                batch = cur.fetch_df_chunk(max(1, batch_size // 2048))   # chunks are counted in 2048-row vectors
+                if batch.empty:
+                    break
+                yield batch
+        finally:
+            cur.close()
+
+    def data_version(self):
+        """Changes when any bundled CSV is replaced (the local stand-in for LAST_ALTERED)."""
+        paths = [os.path.join(self.data_dir, f) for f in TABLE_FILES.values()]
+        return f"{self.data_dir}@{max(os.path.getmtime(p) for p in paths):.0f}"
+
+    def table_names(self):
+        """Lists the tables and views defined from the DDL."""
+        return self.query("SELECT table_name FROM information_schema.tables ORDER BY table_name")["table_name"].tolist()
@@ -0,0 +1,175 @@
+"""
+Rule-based fast path for common AI Analyst (Tab 4) questions.
+
+Questions shaped like the tab's own examples — a metric (GMV, profit,
+profit margin, orders, rating, customers), optionally by a dimension
+(city, cuisine, restaurant, month, year), optionally ranked (top / bottom N) and filtered by
+named cities / cuisines / restaurants and years — are parsed into an
+`Intent` and compiled from a fixed template into parameterized SQL over
+the columns of V_PLATFORM_PROFITABILITY it reads (`projected_view`, so
+no customer join is paid for). Any word the parser does not understand makes
+it return None, and the question goes to Cortex as before.
+"""
+
+import re
+from dataclasses import dataclass, field
+
+from dashboard_queries import projected_view, referenced_columns
+from question_index import normalize_question
+
+
+# metric word -> {aggregation: (SQL expression, output column)}
+METRICS = {
+    "gmv": {"total": ("SUM(GMV)", "TOTAL_GMV"), "average": ("ROUND(AVG(GMV), 2)", "AVG_GMV")},
+    "profit": {"total": ("SUM(NET_PROFIT)", "TOTAL_PROFIT"), "average": ("ROUND(AVG(NET_PROFIT), 2)", "AVG_PROFIT")},
+    # Net profit as a percentage of GMV, like the Executive Dashboard's Profit Margin KPI
+    "margin": {"total": ("ROUND(SUM(NET_PROFIT) * 100 / NULLIF(SUM(GMV), 0), 2)", "PROFIT_MARGIN")},
+    "order": {"total": ("COUNT(ORDER_ID)", "TOTAL_ORDERS")},
+    "rating": {"average": ("ROUND(AVG(ORDER_RATING), 2)", "AVG_RATING")},
+    "customer": {"total": ("COUNT(DISTINCT CUSTOMER_ID)", "UNIQUE_CUSTOMERS")},
+}
+DEFAULT_AGGREGATION = {
+    "gmv": "total", "profit": "total", "margin": "total", "order": "total", "rating": "average", "customer": "total",
+}
+
+# dimension word -> (SQL expression, output column)
+DIMENSIONS = {
+    "city": ("CITY", "CITY"),
+    "cuisine": ("CUISINE_TYPE", "CUISINE_TYPE"),
+    "restaurant": ("RESTAURANT_NAME", "RESTAURANT_NAME"),
+    "month": ("TO_CHAR(ORDER_TIMESTAMP, 'YYYY-MM')", "MONTH"),
+    "monthly": ("TO_CHAR(ORDER_TIMESTAMP, 'YYYY-MM')", "MONTH"),
+    "trend": ("TO_CHAR(ORDER_TIMESTAMP, 'YYYY-MM')", "MONTH"),
+    "year": ("YEAR(ORDER_TIMESTAMP)", "YEAR"),
+    "yearly": ("YEAR(ORDER_TIMESTAMP)", "YEAR"),
+    "annual": ("YEAR(ORDER_TIMESTAMP)", "YEAR"),
+}
+
+# Time dimensions are listed in calendar order rather than by the metric
+TIME_DIMENSIONS = ("MONTH", "YEAR")
+
+# entity kind -> filtered column
+ENTITY_COLUMNS = {"city": "CITY", "cuisine": "CUISINE_TYPE", "restaurant": "RESTAURANT_NAME"}
+
+AGGREGATIONS = {"total": "total", "count": "total", "average": "average"}
+RANKING = {"top": True, "bottom": False}
+FILLER = frozenset("""
+net compare across each per wise breakdown split grouped group type name during platform
+data dataset rank ranking ranked performance performing generated made number
+""".split())
+
+
+@dataclass
+class Intent:
+    metric: str
+    aggregation: str
+    dimensions: list = field(default_factory=list)
+    filters: dict = field(default_factory=dict)     # column -> [values]
+    years: list = field(default_factory=list)
+    descending: bool = None                          # None: no ranking asked for
+    limit: int = None
+
+
+def parse_intent(question, canonicalize):
+    """Intent for `question`, or None if any part of it is not understood."""
+    words, entities = normalize_question(question, canonicalize)
+    metrics, aggregations, dimensions, ranking = [], [], [], []
+    for word in words:
+        if word in METRICS:
+            metrics.append(word)
+        elif word in AGGREGATIONS:
+            aggregations.append(AGGREGATIONS[word])
+        elif word in DIMENSIONS:
+            dimensions.append(word)
+        elif word in RANKING:
+            ranking.append(RANKING[word])
+        elif word not in FILLER:
+            return None
+    if "margin" in metrics:
+        # "profit margin" names one metric
+        metrics = [m for m in metrics if m != "profit"]
+    if len(set(metrics)) != 1 or len(set(aggregations)) > 1 or len(set(ranking)) > 1:
+        return None
+
+    metric = metrics[0]
+    aggregation = aggregations[0] if aggregations else DEFAULT_AGGREGATION[metric]
+    if aggregation not in METRICS[metric]:
+        return None
+
+    intent = Intent(metric, aggregation)
+    for word in dict.fromkeys(dimensions):
+        if DIMENSIONS[word] not in [DIMENSIONS[d] for d in intent.dimensions]:
+            intent.dimensions.append(word)
+    if len(intent.dimensions) > 2:
+        return None
+
+    numbers = []
+    for token in entities:
+        kind, _, value = token.partition("=")
+        if kind == "num":
+            numbers.append(value)
+        else:
+            intent.filters.setdefault(ENTITY_COLUMNS[kind], []).append(canonicalize.values[token])
+
+    for value in numbers:
+        if re.fullmatch(r"(19|20)\d\d", value):
+            intent.years.append(int(value))
+        elif value.isdigit() and ranking and intent.limit is None and 0 < int(value) <= 100:
+            intent.limit = int(value)
+        else:
+            return None
+
+    if ranking:
+        if not intent.dimensions:
+            return None
+        intent.descending = ranking[0]
+        # "Which cuisine has the highest ..." asks for one row; "top cuisines ..." for a list
+        if intent.limit is None:
+            intent.limit = 10 if _plural_dimension(question, intent.dimensions) else 1
+    return intent
+
+
+def _plural_dimension(question, dimensions):
+    text = question.lower()
+    plurals = {"city": "cities", "cuisine": "cuisines", "restaurant": "restaurants"}
+    return any(plurals.get(d, "") in text for d in dimensions)
+
+
+def compile_intent(intent, base_predicates=()):
+    """(sql, params) for an Intent; `base_predicates` are the dashboard filters as [(sql, params)]."""
+    expr, alias = METRICS[intent.metric][intent.aggregation]
+    dims = [DIMENSIONS[d] for d in intent.dimensions]
+
+    predicates = list(base_predicates)
+    for column, values in intent.filters.items():
+        predicates.append((f"{column} IN ({', '.join('?' for _ in values)})", tuple(values)))
+    if intent.years:
+        years = sorted(set(intent.years))
+        predicates.append((f"YEAR(ORDER_TIMESTAMP) IN ({', '.join('?' for _ in years)})", tuple(years)))
+
+    columns = [d_expr if d_expr == d_alias else f"{d_expr} AS {d_alias}" for d_expr, d_alias in dims]
+    select = ", ".join(columns + [f"{expr} AS {alias}"])
+    tail = ""
+    if predicates:
+        tail += " WHERE " + " AND ".join(p for p, _ in predicates)
+    if dims:
+        tail += " GROUP BY " + ", ".join(d_expr for d_expr, _ in dims)
+        if intent.descending is not None:
+            tail += f" ORDER BY {alias} {'DESC' if intent.descending else 'ASC'}"
+        elif any(d_alias in TIME_DIMENSIONS for _, d_alias in dims):
+            tail += " ORDER BY " + ", ".join(d_alias for _, d_alias in dims if d_alias in TIME_DIMENSIONS)
+        else:
+            tail += f" ORDER BY {alias} DESC"
+    if intent.limit:
+        tail += f" LIMIT {int(intent.limit)}"
+    sql = f"SELECT {select} FROM {projected_view(referenced_columns(select, tail))}{tail}"
+    params = tuple(v for _, values in predicates for v in values)
+    return sql, params
+
+
+def template_query(question, canonicalize, base_predicates=()):
+    """(sql, params) from a vetted template, or None when Cortex should handle the question."""
+    intent = parse_intent(question, canonicalize)
+    if intent is None:
+        return None
+    return compile_intent(intent, base_predicates)
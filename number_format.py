@@ -0,0 +1,123 @@
+"""
+Vectorized number formatting for chart labels and KPI tiles.
+
+Every function takes a scalar or any array-like (list, ndarray, Series)
+and formats it in bulk with NumPy: values are coerced to float once, the
+scale (K / M / B, or K / lakh / crore) is picked per element with a mask,
+and the digits come from integer arithmetic instead of one Python format
+call per value: every fixed-point string below 1000 (the range of any
+K / M / B scaled value) is looked up in a table built once per
+precision. None, NaN and unparseable values format as zero. A scalar
+returns a str; anything else returns an ndarray of str.
+
+The output matches the scalar helpers it replaces (`fmt_number`,
+`fmt_money`, `fmt_int`, `f"{x:.2%}"`) for every finite value, including
+the currency symbol before the sign ("₹-5.04K").
+"""
+
+import numpy as np
+import pandas as pd
+
+
+CURRENCY = "₹"
+
+# (threshold, suffix), largest first; values below the last threshold are not scaled
+SHORT_SCALE = ((1e9, "B"), (1e6, "M"), (1e3, "K"))
+INDIAN_SCALE = ((1e7, "Cr"), (1e5, "L"), (1e3, "K"))
+
+# Scaled values this close to a rounding tie are formatted with Python's
+# correctly rounded float formatting instead of the integer path
+_TIE_TOLERANCE = 1e-6
+
+_TABLE_LIMIT = 1000
+_TABLES = {}
+
+
+def _fixed_table(decimals):
+    """Every fixed-point string from 0 up to _TABLE_LIMIT with `decimals` places, indexed by value * 10^decimals."""
+    if decimals not in _TABLES:
+        wholes = np.arange(_TABLE_LIMIT).astype(str)
+        if decimals:
+            fractions = np.char.zfill(np.arange(10 ** decimals).astype(str), decimals)
+            wholes = np.char.add(np.char.add(np.repeat(wholes, 10 ** decimals), "."), np.tile(fractions, _TABLE_LIMIT))
+        _TABLES[decimals] = wholes
+    return _TABLES[decimals]
+
+
+def to_float_array(values):
+    """1-d float64 array of `values`; None and unparseable entries become NaN."""
+    series = values if isinstance(values, pd.Series) else pd.Series(np.atleast_1d(np.asarray(values, dtype=object)))
+    return pd.to_numeric(series, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+
+
+def _fixed(x, decimals):
+    """Fixed-point strings of |x| with `decimals` places (x must be finite)."""
+    magnitude = np.abs(x)
+    units = magnitude * 10 ** decimals
+    rounded = np.rint(units).astype(np.int64)
+    table = _fixed_table(decimals)
+    text = table[np.minimum(rounded, len(table) - 1)]
+
+    large = rounded >= len(table)
+    ties = np.abs(units - np.floor(units) - 0.5) < _TIE_TOLERANCE
+    if large.any() or ties.any():
+        text = text.astype(object)
+        if large.any():
+            whole, fraction = np.divmod(rounded[large], 10 ** decimals)
+            digits = whole.astype(str)
+            if decimals:
+                digits = np.char.add(np.char.add(digits, "."), np.char.zfill(fraction.astype(str), decimals))
+            text[large] = digits
+        text[ties] = [f"{v:.{decimals}f}" for v in magnitude[ties]]
+        text = text.astype(str)
+    return text
+
+
+def _output(values, text):
+    return str(text[0]) if np.ndim(values) == 0 else text
+
+
+def _join(prefix, x, digits, suffix):
+    # The sign goes after the prefix and, as in Python's formatting, -0.00 keeps it
+    sign = np.where(np.signbit(x), "-", "")
+    return np.char.add(np.char.add(np.char.add(prefix, sign), digits), suffix)
+
+
+def format_fixed(values, decimals=2, prefix="", suffix=""):
+    """`f"{prefix}{x:.{decimals}f}{suffix}"` for every value."""
+    x = to_float_array(values)
+    x = np.where(np.isfinite(x), x, 0.0)
+    return _output(values, _join(prefix, x, _fixed(x, decimals), suffix))
+
+
+def format_scaled(values, scale=SHORT_SCALE, prefix="", decimals=2):
+    """Each value divided by the largest `scale` threshold it reaches, with that suffix."""
+    x = to_float_array(values)
+    x = np.where(np.isfinite(x), x, 0.0)
+    magnitude = np.abs(x)
+    level = np.select([magnitude >= threshold for threshold, _ in scale], list(range(len(scale))), len(scale))
+    divisors = np.array([threshold for threshold, _ in scale] + [1.0])
+    suffixes = np.array([suffix for _, suffix in scale] + [""])
+
+    scaled = x / divisors[level]
+    return _output(values, _join(prefix, scaled, _fixed(scaled, decimals), suffixes[level]))
+
+
+def format_number(values, indian=False):
+    """Counts and plain amounts: 12.35K, 4.10M (or 4.10L / 1.25Cr when `indian`)."""
+    return format_scaled(values, INDIAN_SCALE if indian else SHORT_SCALE)
+
+
+def format_money(values, indian=False):
+    """Rupee amounts: ₹12.35K, ₹4.10M (or ₹4.10L / ₹1.25Cr when `indian`)."""
+    return format_scaled(values, INDIAN_SCALE if indian else SHORT_SCALE, prefix=CURRENCY)
+
+
+def format_percent(values, decimals=2):
+    """Fractions as percentages: 0.1234 -> 12.34%."""
+    return _output(values, format_fixed(to_float_array(values) * 100, decimals, suffix="%"))
+
+
+def format_rating(values):
+    """Ratings with two decimals: 4.25."""
+    return format_fixed(values, 2)
@@ -0,0 +1,166 @@
+"""
+Per-filter "order cube" for the Food Delivery Analytics Portal.
+
+One compact, order-level dataset is fetched per sidebar filter state,
+projected to the columns its cards read (CARD_COLUMNS), and every KPI,
+top-N list, rating bucket and monthly series on Tabs 5 and 6 is derived
+from it in memory. Each helper returns a DataFrame with
+the same columns the per-card SQL used to return, so the chart code does
+not change.
+"""
+
+import numpy as np
+import pandas as pd
+
+from dashboard_queries import projected_select
+
+
+NUMERIC_COLUMNS = ["GMV", "NET_PROFIT", "ORDER_RATING", "AVERAGE_RATING", "COMMISSION_RATE"]
+
+CUBE_COLUMNS = [
+    "ORDER_ID", "ORDER_TIMESTAMP", "CUSTOMER_ID", "CUSTOMER_NAME", "RESTAURANT_NAME", "CITY",
+    "CUISINE_TYPE", "AVERAGE_RATING", "COMMISSION_RATE", "GMV", "NET_PROFIT", "ORDER_RATING",
+]
+
+# Cube columns each card reads (MONTH is derived from ORDER_TIMESTAMP)
+CARD_COLUMNS = {
+    # Tab 5
+    "customer_kpis": ["ORDER_ID", "CUSTOMER_ID", "GMV"],
+    "monthly_active_customers": ["ORDER_TIMESTAMP", "CUSTOMER_ID"],
+    "loyal_customers": ["ORDER_ID", "CUSTOMER_NAME", "GMV"],
+    "rating_distribution": ["ORDER_RATING"],
+    # Tab 6
+    "platform_kpis": ["ORDER_ID", "CUSTOMER_ID", "GMV", "ORDER_RATING"],
+    "top_city": ["CITY", "NET_PROFIT"],
+    "top_cuisine": ["CUISINE_TYPE", "GMV"],
+    "top_restaurant": ["RESTAURANT_NAME", "GMV"],
+    "top_customer": ["CUSTOMER_NAME", "ORDER_ID"],
+}
+
+
+def cube_columns(cards, comparison_dim=None):
+    """Columns (in CUBE_COLUMNS order) needed by `cards`, plus the comparison dimension if any."""
+    needed = {c for card in cards for c in CARD_COLUMNS[card]}
+    if comparison_dim:
+        needed.add(comparison_dim)
+    return [c for c in CUBE_COLUMNS if c in needed]
+
+
+def order_cube_query(where_clause, columns=CUBE_COLUMNS):
+    """SQL for the filtered order-level cube (one row per order), projected to `columns`;
+    DIM_CUSTOMER is only joined when CUSTOMER_NAME is among them."""
+    return projected_select(columns, where_clause)
+
+
+def prepare_order_cube(df):
+    """Normalizes column names and dtypes and adds the MONTH bucket."""
+    df = df.copy()
+    df.columns = [c.upper() for c in df.columns]
+    # run_query already returns typed columns; these casts are no-ops except
+    # for all-NULL columns, which arrive as object
+    numeric = [c for c in NUMERIC_COLUMNS if c in df.columns]
+    df[numeric] = df[numeric].astype("float64")
+    if "ORDER_TIMESTAMP" in df.columns:
+        df["ORDER_TIMESTAMP"] = pd.to_datetime(df["ORDER_TIMESTAMP"])
+        df["MONTH"] = df["ORDER_TIMESTAMP"].dt.strftime("%Y-%m")
+    return df
+
+
+def empty_order_cube():
+    """A zero-row cube with the usual columns (stand-in when the cube query fails)."""
+    return prepare_order_cube(pd.DataFrame(columns=CUBE_COLUMNS))
+
+
+#  GENERIC AGGREGATES
+
+def top_groups(cube, by, metric, name, n=None, how="sum", ascending=False):
+    """`SELECT by, how(metric) AS name GROUP BY by ORDER BY name [LIMIT n]`."""
+    out = (
+        cube.groupby(by, as_index=False, observed=True)[metric]
+        .agg(how)
+        .rename(columns={metric: name})
+        .sort_values(name, ascending=ascending, kind="stable")
+    )
+    out = out.head(n) if n else out
+    return out.reset_index(drop=True)
+
+
+def monthly_series(cube, metric, name, how="sum", color_col=None):
+    """Metric per MONTH (optionally split by a comparison dimension), ordered by MONTH."""
+    grouping_cols = ["MONTH"] + ([color_col] if color_col else [])
+    return (
+        cube.groupby(grouping_cols, as_index=False, observed=True)[metric]
+        .agg(how)
+        .rename(columns={metric: name})
+        .sort_values(grouping_cols, kind="stable")
+        .reset_index(drop=True)
+    )
+
+
+#  TAB 5: CUSTOMER INSIGHTS
+
+def customer_kpis(cube):
+    """Total / repeat customers, repeat rate and per-customer averages."""
+    per_customer = cube.groupby("CUSTOMER_ID", observed=True).agg(
+        CUSTOMER_ORDER_COUNT=("ORDER_ID", "count"), CUSTOMER_GMV=("GMV", "sum")
+    )
+    total = len(per_customer)
+    if not total:
+        return pd.DataFrame([dict.fromkeys(
+            ["TOTAL_CUSTOMERS", "REPEAT_CUSTOMERS", "REPEAT_RATE", "AVG_ORDERS_PER_CUSTOMER", "AVG_GMV_PER_CUSTOMER"]
+        )])
+    repeat = int((per_customer["CUSTOMER_ORDER_COUNT"] > 1).sum())
+    return pd.DataFrame([{
+        "TOTAL_CUSTOMERS": total,
+        "REPEAT_CUSTOMERS": repeat,
+        "REPEAT_RATE": round(repeat / total * 100, 2),
+        "AVG_ORDERS_PER_CUSTOMER": round(per_customer["CUSTOMER_ORDER_COUNT"].mean(), 2),
+        "AVG_GMV_PER_CUSTOMER": round(per_customer["CUSTOMER_GMV"].mean(), 2),
+    }])
+
+
+def loyal_customers(cube, n=None):
+    """Customers with the most orders, with their total spend."""
+    out = (
+        cube.groupby("CUSTOMER_NAME", as_index=False, observed=True)
+        .agg(TOTAL_ORDERS=("ORDER_ID", "count"), TOTAL_SPENT=("GMV", "sum"))
+        .sort_values("TOTAL_ORDERS", ascending=False, kind="stable")
+    )
+    out["TOTAL_SPENT"] = out["TOTAL_SPENT"].round(2)
+    out = out.head(n) if n else out
+    return out.reset_index(drop=True)
+
+
+RATING_BUCKETS = [
+    ("Excellent (4.5–5)", 4.5, 5),
+    ("Good (3.5–4.49)", 3.5, 4.49),
+    ("Average (2.5–3.49)", 2.5, 3.49),
+]
+
+
+def rating_distribution(cube):
+    """Order count per rating bucket (unrated orders excluded), largest first."""
+    r = cube["ORDER_RATING"]
+    conditions = [r.between(lo, hi) for _, lo, hi in RATING_BUCKETS] + [r.notna()]
+    labels = [label for label, _, _ in RATING_BUCKETS] + ["Poor (<2.5)"]
+    category = np.select(conditions, labels, default="No Rating")
+    out = (
+        pd.Series(category[category != "No Rating"], name="RATING_CATEGORY")
+        .value_counts()
+        .rename("RATING_COUNT")
+        .rename_axis("RATING_CATEGORY")
+        .reset_index()
+    )
+    return out
+
+
+#  TAB 6: CONCLUSION & RECOMMENDATIONS
+
+def platform_kpis(cube):
+    """Headline GMV, orders, rating and unique customers."""
+    return pd.DataFrame([{
+        "TOTAL_GMV": cube["GMV"].sum(),
+        "TOTAL_ORDERS": cube["ORDER_ID"].nunique(),
+        "AVG_RATING": round(cube["ORDER_RATING"].mean(), 2) if cube["ORDER_RATING"].notna().any() else None,
+        "UNIQUE_CUSTOMERS": cube["CUSTOMER_ID"].nunique(),
+    }])
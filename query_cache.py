@@ -0,0 +1,184 @@
+"""
+Fingerprint-keyed result cache for run_query.
+
+Queries are normalized before they are used as cache keys: comments and
+whitespace are removed, keywords and unquoted identifiers are upper-cased,
+literal IN-lists are sorted and de-duplicated and a trailing top-level
+`LIMIT n` is split off. Logically identical queries from different tabs
+and sessions therefore share one entry, and a `LIMIT 5` request is served
+from a cached `LIMIT 10` (or unlimited) result of the same query.
+
+An optional `normalize(df) -> df` hook (e.g. result_schema.compact_frame)
+is applied before a result is stored; the bytes each entry holds and
+saved are reported by `stats()` and `entries()`.
+"""
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+
+
+# String literals, dollar-quoted strings and quoted identifiers are kept verbatim
+_TOKEN = re.compile(r"('(?:[^']|'')*'|\$\$.*?\$\$|\"(?:[^\"]|\"\")*\")", re.DOTALL)
+# While the code is canonicalized, quoted text is swapped for opaque placeholders
+# (\x00n\x00 for string literals, \x01n\x01 for the rest), so nothing inside it is rewritten
+_LITERAL = r"(?:\x00\d+\x00|-?\d+(?:\.\d+)?)"
+_IN_LIST = re.compile(rf"\bIN\(({_LITERAL}(?:, {_LITERAL})*)\)")
+_PLACEHOLDER = re.compile(r"([\x00\x01])(\d+)\1")
+_TRAILING_LIMIT = re.compile(r" LIMIT (\d+)$")
+
+
+def _normalize_code(code):
+    code = re.sub(r"--[^\n]*|/\*.*?\*/", " ", code, flags=re.DOTALL)
+    code = re.sub(r"\s+", " ", code).upper()
+    code = re.sub(r"\s*\(\s*", "(", code)
+    code = re.sub(r"\s*\)", ")", code)
+    code = re.sub(r"\s*,\s*", ", ", code)
+    return re.sub(r"\s*(<>|<=|>=|!=|=|<|>)\s*", r" \1 ", code)
+
+
+def _sort_in_lists(code, quoted):
+    def text(item):
+        return quoted[int(item[1:-1])] if item.startswith("\x00") else item
+
+    def repl(m):
+        items = {text(item): item for item in re.findall(_LITERAL, m.group(1))}
+        return "IN(" + ", ".join(items[t] for t in sorted(items)) + ")"
+    return _IN_LIST.sub(repl, code)
+
+
+def _placeholder(i, quoted_text):
+    mark = "\x00" if quoted_text.startswith("'") else "\x01"
+    return f"{mark}{i}{mark}"
+
+
+def normalize_sql(sql):
+    """Canonical text for `sql`: same logical query -> same string."""
+    parts = _TOKEN.split(sql.strip().rstrip(";").strip())
+    quoted = parts[1::2]
+    code = "".join(
+        _placeholder(i // 2, p) if i % 2 else _normalize_code(p) for i, p in enumerate(parts)
+    ).strip()
+    code = _sort_in_lists(code, quoted)
+    return _PLACEHOLDER.sub(lambda m: quoted[int(m.group(2))], code)
+
+
+def split_limit(normalized):
+    """(query without a top-level trailing LIMIT, limit or None)."""
+    m = _TRAILING_LIMIT.search(normalized)
+    if not m:
+        return normalized, None
+    head = normalized[:m.start()]
+    depth = 0
+    for part in _TOKEN.split(head)[::2]:
+        depth += part.count("(") - part.count(")")
+    if depth != 0:
+        return normalized, None
+    return head, int(m.group(1))
+
+
+def _frame_bytes(df):
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def fingerprint(normalized, params=()):
+    return hashlib.sha1((normalized + "\x00" + repr(tuple(params))).encode("utf-8")).hexdigest()
+
+
+class QueryCache:
+    """
+    Thread-safe TTL + LRU cache of query results keyed by fingerprint, with
+    hit/miss counters. Concurrent misses on the same key run the query once.
+    """
+
+    def __init__(self, ttl=600, max_entries=512, normalize=None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.normalize = normalize
+        self._entries = OrderedDict()   # key -> (stored_at, limit, DataFrame, bytes, bytes_saved)
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key, limit):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, cached_limit, df = entry[:3]
+            if time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            if cached_limit is not None and (limit is None or limit > cached_limit):
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return df if limit is None else df.head(limit)
+
+    def _store(self, key, limit, df):
+        size = _frame_bytes(df)
+        saved = 0
+        if self.normalize is not None:
+            df = self.normalize(df)
+            saved = size - _frame_bytes(df)
+            size -= saved
+        with self._lock:
+            entry = self._entries.get(key)
+            # Never replace a wider cached result with a narrower one
+            if entry is not None and (entry[1] is None or (limit is not None and limit < entry[1])):
+                if time.time() - entry[0] <= self.ttl:
+                    return df
+            self._entries[key] = (time.time(), limit, df, size, saved)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return df
+
+    def get_or_compute(self, sql, params, compute):
+        """Returns the cached result for (sql, params) or runs `compute(sql, params)`."""
+        base, limit = split_limit(normalize_sql(sql))
+        key = fingerprint(base, params)
+
+        df = self._lookup(key, limit)
+        if df is None:
+            with self._lock:
+                key_lock = self._key_locks.setdefault(key, threading.Lock())
+            with key_lock:
+                df = self._lookup(key, limit)
+                if df is None:
+                    with self._lock:
+                        self.misses += 1
+                    df = self._store(key, limit, compute(sql, params))
+            with self._lock:
+                self._key_locks.pop(key, None)
+        # Shallow copy so callers renaming/adding columns never touch the cached frame
+        return df.copy(deep=False)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "entries": len(self._entries),
+                "bytes": sum(e[3] for e in self._entries.values()),
+                "bytes_saved": sum(e[4] for e in self._entries.values()),
+            }
+
+    def entries(self):
+        """One dict per cached result (most recently used last): key, age, rows, bytes, bytes_saved."""
+        now = time.time()
+        with self._lock:
+            return [
+                {"key": key[:12], "age_s": round(now - stored_at), "rows": len(df), "limit": limit,
+                 "bytes": size, "bytes_saved": saved}
+                for key, (stored_at, limit, df, size, saved) in self._entries.items()
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
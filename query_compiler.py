@@ -0,0 +1,120 @@
+"""
+Multi-aggregate query compiler.
+
+Fuses several independent aggregate queries into a single statement so a
+tab pays one warehouse round-trip instead of one per card. Each card is
+described by an `AggregateSpec`; the compiler emits one UNION ALL branch
+per spec, tagged with a QUERY_NAME discriminator and a QUERY_RANK row
+order, and `split_fused_result` cuts the combined result back into one
+DataFrame per card.
+"""
+
+from dataclasses import dataclass, field
+
+
+@dataclass
+class AggregateSpec:
+    """
+    One card's aggregate: `SELECT dims, measures FROM source WHERE ...
+    GROUP BY dims HAVING ... ORDER BY order_by LIMIT limit`.
+    `dims` and `measures` map output alias -> SQL expression.
+    """
+    name: str
+    source: str
+    dims: dict = field(default_factory=dict)
+    measures: dict = field(default_factory=dict)
+    where: list = field(default_factory=list)
+    having: str = None
+    order_by: str = None
+    descending: bool = True
+    limit: int = None
+
+    @property
+    def columns(self):
+        return list(self.dims) + list(self.measures)
+
+
+def _where_sql(where_clause, extra):
+    """Appends per-card predicates to the shared ` WHERE ...` clause."""
+    preds = list(extra)
+    if not preds:
+        return where_clause or ""
+    if where_clause and where_clause.strip():
+        return where_clause + " AND " + " AND ".join(preds)
+    return " WHERE " + " AND ".join(preds)
+
+
+def compile_branch(spec, all_columns, where_clause=""):
+    """Compiles one spec into a SELECT that projects the full fused column list."""
+    exprs = {**spec.dims, **spec.measures}
+
+    if spec.order_by:
+        direction = "DESC" if spec.descending else "ASC"
+        rank_order = f"{exprs[spec.order_by]} {direction}"
+    else:
+        rank_order = ", ".join(spec.dims.values()) if spec.dims else "1"
+
+    select = [f"'{spec.name}' AS QUERY_NAME", f"ROW_NUMBER() OVER (ORDER BY {rank_order}) AS QUERY_RANK"]
+    select += [f"{exprs[c]} AS {c}" if c in exprs else f"NULL AS {c}" for c in all_columns]
+
+    sql = f"SELECT {', '.join(select)}\nFROM {spec.source}\n{_where_sql(where_clause, spec.where)}"
+    if spec.dims:
+        sql += f"\nGROUP BY {', '.join(spec.dims.values())}"
+    if spec.having:
+        sql += f"\nHAVING {spec.having}"
+    if spec.limit:
+        sql += f"\nQUALIFY QUERY_RANK <= {int(spec.limit)}"
+    return sql
+
+
+def fused_columns(specs):
+    """Ordered union of every spec's output columns."""
+    columns = []
+    for spec in specs:
+        columns += [c for c in spec.columns if c not in columns]
+    return columns
+
+
+def compile_fused_query(specs, where_clause="", params=(), router=None):
+    """
+    Compiles all specs into one UNION ALL statement with a QUERY_NAME discriminator.
+    `where_clause` may hold `?` bind variables for `params`; they are repeated
+    once per branch. Returns (sql, params).
+    `router(spec, where_clause) -> (spec, where_clause)` may redirect a branch
+    to a cheaper source (e.g. a rollup table) without changing its output.
+    """
+    names = [s.name for s in specs]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate aggregate names in fused query: {names}")
+    columns = fused_columns(specs)
+    branches, all_params = [], []
+    for spec in specs:
+        branch_where = where_clause
+        if router:
+            spec, branch_where = router(spec, where_clause)
+        branches.append(compile_branch(spec, columns, branch_where))
+        if branch_where:
+            all_params.extend(params)
+    return "\nUNION ALL\n".join(branches), tuple(all_params)
+
+
+def split_fused_result(df, specs, top_n=None):
+    """
+    Splits a fused result into {spec.name: DataFrame} with each card's own
+    columns and row order. `top_n` keeps the first `top_n` rows of every
+    limited spec, so a result fetched at the largest limit serves any
+    smaller one without a new query.
+    """
+    df = df.copy()
+    df.columns = [c.upper() for c in df.columns]
+    parts = {}
+    for spec in specs:
+        part = (
+            df[df["QUERY_NAME"] == spec.name]
+            .sort_values("QUERY_RANK", kind="stable")[spec.columns]
+            .reset_index(drop=True)
+        )
+        if top_n is not None and spec.limit is not None:
+            part = part.head(min(spec.limit, top_n))
+        parts[spec.name] = part
+    return parts
@@ -0,0 +1,124 @@
+"""
+Typed sidebar filters compiled to parameterized SQL.
+
+`DashboardFilters` stores the selections in canonical form (sorted,
+de-duplicated) and compiles them to a WHERE clause with `?` bind
+variables. Identical logical filters therefore always produce the same
+SQL text and the same parameter tuple, whatever order the user picked
+the values in, and names containing quotes need no escaping.
+
+`FilterMetadata` is the matching snapshot of the options the sidebar
+offers, loaded with one statement and cached per data version.
+"""
+
+from dataclasses import dataclass
+
+import pandas as pd
+
+
+# Filter field -> column, per query base
+VIEW_COLUMNS = {
+    "cities": "CITY",
+    "restaurants": "RESTAURANT_NAME",
+    "cuisines": "CUISINE_TYPE",
+    "date": "ORDER_TIMESTAMP",
+}
+
+JOINED_COLUMNS = {
+    "cities": "R.CITY",
+    "restaurants": "R.RESTAURANT_NAME",
+    "cuisines": "R.CUISINE_TYPE",
+    "date": "O.ORDER_TIMESTAMP",
+}
+
+
+def _canonical(values):
+    return tuple(sorted(set(values or ())))
+
+
+def inline_literals(sql, params):
+    """`sql` with each `?` replaced by its quoted value; for display only, never for execution."""
+    pieces = sql.split("?")
+    literals = ["'" + str(v).replace("'", "''") + "'" for v in params] + [""]
+    return "".join(piece + lit for piece, lit in zip(pieces, literals))
+
+
+@dataclass(frozen=True)
+class DashboardFilters:
+    """Canonical sidebar selection: city / restaurant / cuisine lists and a date range."""
+    cities: tuple = ()
+    restaurants: tuple = ()
+    cuisines: tuple = ()
+    start_date: object = None
+    end_date: object = None
+
+    @classmethod
+    def from_selection(cls, cities=(), restaurants=(), cuisines=(), start_date=None, end_date=None):
+        return cls(_canonical(cities), _canonical(restaurants), _canonical(cuisines), start_date, end_date)
+
+    def predicates(self, columns=JOINED_COLUMNS):
+        """[(sql, params)] for every active filter, in a fixed order."""
+        preds = []
+        for field in ("cities", "restaurants", "cuisines"):
+            values = getattr(self, field)
+            if values:
+                preds.append((f"{columns[field]} IN ({', '.join('?' for _ in values)})", values))
+        if self.start_date and self.end_date:
+            preds.append((f"{columns['date']} BETWEEN ? AND ?", (self.start_date, self.end_date)))
+        return preds
+
+    def where(self, columns=JOINED_COLUMNS):
+        """(` WHERE ...` with `?` placeholders, params tuple); ("", ()) when nothing is filtered."""
+        preds = self.predicates(columns)
+        if not preds:
+            return "", ()
+        sql = " WHERE " + " AND ".join(p for p, _ in preds)
+        params = tuple(v for _, values in preds for v in values)
+        return sql, params
+
+    def literal_where(self, columns=VIEW_COLUMNS):
+        """The same WHERE clause with values inlined; for display (e.g. LLM prompts), never for execution."""
+        return inline_literals(*self.where(columns))
+
+
+# SIDEBAR OPTIONS (one statement: restaurant dimension + fact date bounds)
+
+FILTER_METADATA_QUERY = """
+    SELECT R.CITY, R.RESTAURANT_NAME, R.CUISINE_TYPE, D.MIN_DATE, D.MAX_DATE
+    FROM (SELECT MIN(ORDER_TIMESTAMP) AS MIN_DATE, MAX(ORDER_TIMESTAMP) AS MAX_DATE FROM FACT_ORDERS) D
+    LEFT JOIN (SELECT DISTINCT CITY, RESTAURANT_NAME, CUISINE_TYPE FROM DIM_RESTAURANT) R ON 1 = 1
+"""
+
+# Changes whenever DIM_RESTAURANT or FACT_ORDERS is written to
+DATA_VERSION_QUERY = """
+    SELECT TO_CHAR(MAX(LAST_ALTERED), 'YYYY-MM-DD HH24:MI:SS.FF3') AS DATA_VERSION
+    FROM INFORMATION_SCHEMA.TABLES
+    WHERE TABLE_NAME IN ('DIM_RESTAURANT', 'FACT_ORDERS')
+"""
+
+
+@dataclass(frozen=True)
+class FilterMetadata:
+    """Sidebar options: sorted city / restaurant / cuisine lists and the order date range."""
+    cities: tuple = ()
+    restaurants: tuple = ()
+    cuisines: tuple = ()
+    min_date: object = None
+    max_date: object = None
+
+    @classmethod
+    def from_frame(cls, df):
+        """Builds the snapshot from the FILTER_METADATA_QUERY result."""
+        df = df.rename(columns=str.upper)
+        if df.empty:
+            return cls()
+
+        def options(col):
+            return _canonical(df[col].dropna().tolist())
+
+        def bound(col):
+            value = df[col].iloc[0]
+            return None if pd.isna(value) else pd.Timestamp(value).date()
+
+        return cls(options("CITY"), options("RESTAURANT_NAME"), options("CUISINE_TYPE"),
+                   bound("MIN_DATE"), bound("MAX_DATE"))
@@ -0,0 +1,132 @@
+"""
+Per-query instrumentation for run_query / execute_query.
+
+Every query served by the app is logged as a `QueryRecord`: timing, rows,
+result bytes, cache outcome, originating page and card, warehouse query
+id and the rerun it belonged to. The origin and rerun are carried in
+context variables, so they follow the work into QueryBatch threads.
+`QueryLog` keeps the most recent records in memory, summarizes them for
+the diagnostics panel and exports them as JSONL.
+"""
+
+import contextvars
+import json
+import threading
+import time
+import uuid
+from collections import deque
+from dataclasses import asdict, dataclass, field
+
+import pandas as pd
+
+from query_cache import normalize_sql
+
+
+_ORIGIN = contextvars.ContextVar("query_origin", default=("App", ""))
+_RUN_ID = contextvars.ContextVar("query_run_id", default="")
+
+
+def begin_run():
+    """Starts a new rerun id; records logged afterwards in this context carry it."""
+    run_id = uuid.uuid4().hex[:12]
+    _RUN_ID.set(run_id)
+    return run_id
+
+
+def set_query_origin(tab, card=""):
+    _ORIGIN.set((tab, card))
+
+
+def attributed(tab, card, fn):
+    """`fn` wrapped so the queries it runs are attributed to (tab, card)."""
+    def wrapper(*args, **kwargs):
+        token = _ORIGIN.set((tab, card))
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _ORIGIN.reset(token)
+    return wrapper
+
+
+@dataclass
+class QueryRecord:
+    sql: str
+    params: int
+    tab: str
+    card: str
+    run_id: str
+    cache: str                      # "hit", "miss" (ran on the warehouse) or "error"
+    started_at: float = field(default_factory=time.time)
+    seconds: float = 0.0
+    rows: int = 0
+    bytes: int = 0
+    query_id: str = ""
+    error: str = ""
+
+
+class QueryLog:
+    """Thread-safe ring buffer of QueryRecords."""
+
+    def __init__(self, max_records=5000):
+        self._records = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    def log(self, sql, params, cache, seconds, df=None, error=None):
+        tab, card = _ORIGIN.get()
+        record = QueryRecord(
+            sql=normalize_sql(sql)[:500],
+            params=len(params or ()),
+            tab=tab,
+            card=card,
+            run_id=_RUN_ID.get(),
+            cache="error" if error is not None else cache,
+            started_at=time.time() - seconds,
+            seconds=round(seconds, 4),
+        )
+        if df is not None:
+            record.rows = len(df)
+            record.bytes = int(df.memory_usage(deep=True, index=False).sum())
+            record.query_id = str(df.attrs.get("query_id", ""))
+        if error is not None:
+            record.error = f"{type(error).__name__}: {error}"[:500]
+        with self._lock:
+            self._records.append(record)
+        return record
+
+    def frame(self, run_id=None):
+        with self._lock:
+            records = [asdict(r) for r in self._records if run_id is None or r.run_id == run_id]
+        columns = list(QueryRecord.__dataclass_fields__)
+        return pd.DataFrame(records, columns=columns)
+
+    def summary(self, run_id=None, slowest=10):
+        """{"totals", "slowest", "per_tab", "cache_ratio"} for the diagnostics panel."""
+        df = self.frame(run_id)
+        lookups = df[df["cache"].isin(["hit", "miss"])]
+        per_tab = (
+            df.groupby("tab", as_index=False)
+            .agg(QUERIES=("sql", "size"), SECONDS=("seconds", "sum"), ROWS=("rows", "sum"), BYTES=("bytes", "sum"))
+            .sort_values("SECONDS", ascending=False)
+        )
+        return {
+            "totals": {
+                "queries": len(df),
+                "seconds": round(float(df["seconds"].sum()), 3),
+                "rows": int(df["rows"].sum()),
+                "bytes": int(df["bytes"].sum()),
+                "errors": int((df["cache"] == "error").sum()),
+            },
+            "slowest": df.sort_values("seconds", ascending=False).head(slowest)[
+                ["tab", "card", "seconds", "rows", "bytes", "cache", "query_id", "sql"]
+            ],
+            "per_tab": per_tab,
+            "cache_ratio": float((lookups["cache"] == "hit").mean()) if len(lookups) else 0.0,
+        }
+
+    def to_jsonl(self):
+        with self._lock:
+            return "\n".join(json.dumps(asdict(r), default=str) for r in self._records) + "\n"
+
+    def clear(self):
+        with self._lock:
+            self._records.clear()
@@ -0,0 +1,116 @@
+"""
+Concurrent dispatch of a render's independent queries.
+
+The queries a render needs are registered on a `QueryBatch` up front and
+run together on a bounded thread pool, so the render pays roughly the
+slowest query's latency instead of the sum. Every job has a time budget
+and its own error slot: a failed or timed-out card is reported through
+`QueryFailure` without aborting the other cards.
+
+`BackgroundPrefetcher` runs the queries of pages that are not on screen
+after the visible page has rendered, so switching pages hits warm caches.
+"""
+
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryFailure(Exception):
+    """A batched query that raised or exceeded its time budget."""
+
+    def __init__(self, name, cause):
+        self.name = name
+        self.cause = cause
+        super().__init__(f"{name}: {cause}")
+
+
+class QueryBatch:
+    """
+    Collects named jobs (`fn(*args, **kwargs)`, usually run_query) and runs
+    them concurrently. `run()` waits for all of them and returns
+    {name: result or QueryFailure}.
+    """
+
+    def __init__(self, max_workers=4, timeout=120, initializer=None):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.initializer = initializer   # runs once in every worker thread
+        self._jobs = {}
+
+    def add(self, name, fn, *args, timeout=None, **kwargs):
+        self._jobs[name] = (fn, args, kwargs, timeout or self.timeout)
+        return self
+
+    def run(self):
+        if not self._jobs:
+            return {}
+        results = {}
+        pool = ThreadPoolExecutor(
+            max_workers=min(self.max_workers, len(self._jobs)),
+            thread_name_prefix="query",
+            initializer=self.initializer,
+        )
+        try:
+            start = time.monotonic()
+            # Each job runs in a copy of the caller's context (context variables such as the query origin)
+            futures = {
+                name: (pool.submit(contextvars.copy_context().run, fn, *args, **kwargs), timeout)
+                for name, (fn, args, kwargs, timeout) in self._jobs.items()
+            }
+            for name, (future, timeout) in futures.items():
+                # Budgets count from dispatch, so waiting on one job never extends another's
+                remaining = max(0.0, start + timeout - time.monotonic())
+                try:
+                    results[name] = future.result(timeout=remaining)
+                except FutureTimeout:
+                    future.cancel()
+                    results[name] = QueryFailure(name, TimeoutError(f"no result after {timeout}s"))
+                except Exception as e:
+                    results[name] = QueryFailure(name, e)
+        finally:
+            # Do not block the render on stragglers that already timed out
+            pool.shutdown(wait=False, cancel_futures=True)
+        return results
+
+
+
+class BackgroundPrefetcher:
+    """
+    Long-lived pool that warms caches for queries the current page does not
+    need yet. Results are discarded (the callables cache them); a failure is
+    logged and counted but never raised, since the page that needs the result
+    reruns the query and reports it. A job already queued or running is not
+    submitted twice.
+    """
+
+    def __init__(self, max_workers=2):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        self._in_flight = set()
+        self._lock = threading.Lock()
+        self.failures = 0
+
+    def submit(self, key, fn, *args, **kwargs):
+        with self._lock:
+            if key in self._in_flight:
+                return False
+            self._in_flight.add(key)
+
+        def job():
+            try:
+                fn(*args, **kwargs)
+            except Exception:
+                with self._lock:
+                    self.failures += 1
+                logger.warning("Prefetch of %s failed", key, exc_info=True)
+            finally:
+                with self._lock:
+                    self._in_flight.discard(key)
+
+        self._pool.submit(contextvars.copy_context().run, job)
+        return True
@@ -0,0 +1,218 @@
+"""
+Near-duplicate matching for AI Analyst (Tab 4) questions.
+
+Questions whose generated SQL ran successfully are stored with that SQL.
+A new question is normalized (case, punctuation, stopwords, light
+stemming, synonyms) and every city / cuisine / restaurant name and number
+in it is replaced by a canonical entity token. A stored question is reused
+only when its entities and context (schema version + active filters) are
+identical, both questions use the same KEY_WORDS (metrics, dimensions,
+aggregations, directions, negations: the words that change what is
+asked), and the TF-IDF cosine similarity of their content words is at
+least the threshold. Other words may be added or dropped as long as they
+carry little weight (a low IDF, or one word among many), so "total GMV for
+Ahmedabad in 2024" and "Ahmedabad 2024 GMV total" share one SQL while
+"... for Pune in 2024" and "growing" vs "declining GMV" do not.
+"""
+
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass
+
+from llm_cache import DEFAULT_PATH
+
+
+STOPWORDS = frozenset("""
+a an and are as at be by can could did do does for from give how i in is it list me of on or our please
+show tell than that the their there this to us was we were what whats which who will with would you
+has have had get find see know much many all overall value amount figure number
+""".split())
+
+# Words that mean the same thing in this dashboard's vocabulary
+SYNONYMS = {
+    "sum": "total", "aggregate": "total",
+    "avg": "average", "mean": "average",
+    "highest": "top", "best": "top", "most": "top", "largest": "top", "maximum": "top", "max": "top",
+    "lowest": "bottom", "worst": "bottom", "least": "bottom", "smallest": "bottom", "minimum": "bottom", "min": "bottom",
+    "cuisines": "cuisine", "restaurants": "restaurant", "cities": "city", "customers": "customer",
+    "revenue": "gmv", "sales": "gmv", "earnings": "profit",
+    "vs": "compare", "versus": "compare", "comparison": "compare",
+}
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _stem(word):
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        return word[:-1]
+    return word
+
+
+def _normalize_word(word):
+    word = SYNONYMS.get(word, word)
+    return SYNONYMS.get(_stem(word), _stem(word))
+
+
+# Words that change what a question asks for; a stored question is only
+# reused when both questions use the same ones (normalized like any question word)
+_KEY_WORDS = """
+gmv profit margin order rating customer commission discount coupon delivery fee item price menu
+city cuisine restaurant month monthly trend year yearly annual quarter quarterly week weekly day daily date hour
+average median share percent percentage rate ratio distribution unique distinct repeat new compare
+top bottom first last rank growing growth grow increase increasing rising rise up declining decline decrease
+decreasing falling fall drop dropping down ascending descending above below before after since previous next
+not no without except excluding only
+"""
+
+KEY_WORDS = frozenset(_normalize_word(w) for w in _KEY_WORDS.split())
+
+
+class EntityCanonicalizer:
+    """Replaces dimension values (longest match first) and numbers by entity tokens."""
+
+    def __init__(self, cities=(), cuisines=(), restaurants=()):
+        names = {}
+        self.values = {}   # entity token -> dimension value as stored
+        for kind, values in (("restaurant", restaurants), ("cuisine", cuisines), ("city", cities)):
+            for value in values:
+                phrase = " ".join(_WORD.findall(str(value).lower()))
+                if phrase and phrase not in names:
+                    names[phrase] = f"{kind}={phrase.replace(' ', '_')}"
+                    self.values[names[phrase]] = value
+        self._tokens = names
+        alternation = "|".join(re.escape(p) for p in sorted(names, key=len, reverse=True))
+        self._pattern = re.compile(rf"\b(?:{alternation})\b") if alternation else None
+
+    def __call__(self, text):
+        """(text with entities removed, sorted entity tokens)."""
+        entities = []
+        if self._pattern:
+            def repl(m):
+                entities.append(self._tokens[m.group(0)])
+                return " "
+            text = self._pattern.sub(repl, text)
+        entities += [f"num={n}" for n in re.findall(r"\b\d+(?:\.\d+)?\b", text)]
+        text = re.sub(r"\b\d+(?:\.\d+)?\b", " ", text)
+        return text, tuple(sorted(set(entities)))
+
+
+def normalize_question(question, canonicalize=None):
+    """(content word tuple, entity tuple) for a question."""
+    text = " ".join(_WORD.findall(question.lower()))
+    entities = ()
+    if canonicalize is not None:
+        text, entities = canonicalize(text)
+    # "Ahmedabad city" and "Ahmedabad" ask the same thing
+    kinds = {e.split("=")[0] for e in entities}
+    words = []
+    for word in _WORD.findall(text):
+        if word in STOPWORDS:
+            continue
+        word = _normalize_word(word)
+        if word not in kinds:
+            words.append(word)
+    return tuple(words), entities
+
+
+@dataclass(frozen=True)
+class QuestionMatch:
+    question: str
+    sql: str
+    score: float
+
+
+class QuestionIndex:
+    """
+    Durable index of (question, context) -> validated SQL with TF-IDF lookup.
+    Stored in the same SQLite file as the Cortex completion cache.
+    """
+
+    def __init__(self, path=None, canonicalize=None, threshold=0.8, max_entries=500):
+        self.path = path or os.environ.get("FOOD_DELIVERY_LLM_CACHE", DEFAULT_PATH)
+        self.canonicalize = canonicalize
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._db = sqlite3.connect(self.path, timeout=10, check_same_thread=False)
+        except (OSError, sqlite3.Error):
+            self.path = ":memory:"
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS VALIDATED_QUESTIONS ("
+            " QUESTION TEXT NOT NULL, CONTEXT TEXT NOT NULL, SQL_TEXT TEXT NOT NULL,"
+            " CREATED_AT REAL NOT NULL, PRIMARY KEY (QUESTION, CONTEXT))"
+        )
+        self._db.commit()
+        self._load()
+
+    def _load(self):
+        rows = self._db.execute(
+            "SELECT QUESTION, CONTEXT, SQL_TEXT FROM VALIDATED_QUESTIONS ORDER BY CREATED_AT DESC LIMIT ?",
+            (self.max_entries,),
+        ).fetchall()
+        self._entries = []
+        for question, context, sql in rows:
+            words, entities = normalize_question(question, self.canonicalize)
+            self._entries.append((question, context, sql, words, entities))
+        docs = Counter(w for *_, words, _ in self._entries for w in set(words))
+        n = len(self._entries)
+        self._idf = {w: math.log((1 + n) / (1 + df)) + 1 for w, df in docs.items()}
+        self._default_idf = math.log(1 + n) + 1
+        self._vectors = [self._vector(e[3]) for e in self._entries]
+
+    def _vector(self, words):
+        tf = Counter(words)
+        vec = {w: c * self._idf.get(w, self._default_idf) for w, c in tf.items()}
+        norm = math.sqrt(sum(v * v for v in vec.values())) or 1.0
+        return {w: v / norm for w, v in vec.items()}
+
+    def lookup(self, question, context=""):
+        """Best stored match at or above the threshold, or None."""
+        words, entities = normalize_question(question, self.canonicalize)
+        with self._lock:
+            query = self._vector(words)
+            best = None
+            for (stored_q, stored_ctx, sql, stored_words, stored_entities), vec in zip(self._entries, self._vectors):
+                if stored_ctx != context or stored_entities != entities:
+                    continue
+                if (set(stored_words) ^ set(words)) & KEY_WORDS:
+                    continue
+                score = sum(v * vec.get(w, 0.0) for w, v in query.items())
+                if score >= self.threshold and (best is None or score > best.score):
+                    best = QuestionMatch(stored_q, sql, round(score, 3))
+            if best is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return best
+
+    def add(self, question, sql, context=""):
+        """Records SQL that executed successfully for `question`."""
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO VALIDATED_QUESTIONS VALUES (?, ?, ?, ?)",
+                (question.strip(), context, sql, time.time()),
+            )
+            self._db.commit()
+            self._load()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / total if total else 0.0,
+                "entries": len(self._entries),
+            }
@@ -0,0 +1,92 @@
+"""
+Arrow-native result fetching for run_query.
+
+Results come back as Arrow record batches and are converted to pandas
+column-by-column, so numbers arrive as int64/float64 and timestamps as
+datetime64 without a per-cell Python loop. The row-based fallback (old
+drivers, no pyarrow, non-SELECT statements) goes through
+`normalize_types`, which applies the same typing.
+"""
+
+import datetime
+import decimal
+
+import pandas as pd
+
+
+def frame_from_arrow_batches(batches, columns=None):
+    """Concatenates Arrow record batches (or tables) into one typed DataFrame."""
+    import pyarrow as pa
+
+    tables = [b if isinstance(b, pa.Table) else pa.Table.from_batches([b]) for b in batches]
+    if not tables:
+        return pd.DataFrame(columns=columns or [])
+    table = pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+    # Decimals -> float64 (the dashboard never needs exact decimals)
+    table = table.cast(pa.schema([
+        pa.field(f.name, pa.float64()) if pa.types.is_decimal(f.type) else f for f in table.schema
+    ]))
+    return table.to_pandas()
+
+
+def normalize_types(df):
+    """Types object columns from row fetches: Decimal -> float, date/datetime -> datetime64."""
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        sample = df[col].dropna()
+        if sample.empty:
+            continue
+        first = sample.iloc[0]
+        if isinstance(first, decimal.Decimal):
+            df[col] = pd.to_numeric(df[col], errors="coerce").astype("float64")
+        elif isinstance(first, (datetime.datetime, datetime.date)):
+            df[col] = pd.to_datetime(df[col], errors="coerce")
+    return df
+
+
+def rows_to_frame(rows, cols):
+    """Row-tuple fallback path."""
+    return normalize_types(pd.DataFrame([tuple(r) for r in rows], columns=cols))
+
+
+def fetch_snowpark(snowpark_df):
+    """Snowpark DataFrame -> pandas via Arrow batches (`to_pandas`); `attrs["query_id"]` is the id of the statement it ran."""
+    # The async job carries its own query id; the session's query history is
+    # shared with every other statement running on the connection at the time
+    try:
+        job = snowpark_df.to_pandas(block=False)
+        df = normalize_types(job.result())
+    except ImportError:
+        # Snowpark without the pandas extra installed
+        cols = [f.name for f in snowpark_df.schema.fields]
+        job = snowpark_df.collect_nowait()
+        df = rows_to_frame(job.result(), cols)
+    df.attrs["query_id"] = job.query_id or ""
+    return df
+
+
+def fetch_cursor(cur):
+    """Connector cursor (already executed) -> pandas via `fetch_arrow_batches`; `attrs["query_id"]` is its sfqid."""
+    from snowflake.connector.errors import NotSupportedError
+
+    cols = [d[0] for d in cur.description] if cur.description else []
+    try:
+        df = frame_from_arrow_batches(cur.fetch_arrow_batches(), cols)
+    except (NotSupportedError, ImportError):
+        # Non-SELECT statements return no Arrow result; pyarrow may be absent
+        df = rows_to_frame(cur.fetchall(), cols)
+    df.attrs["query_id"] = getattr(cur, "sfqid", "") or ""
+    return df
+
+
+def iter_snowpark_batches(snowpark_df):
+    """Snowpark DataFrame -> typed pandas batches (`to_pandas_batches`)."""
+    for batch in snowpark_df.to_pandas_batches():
+        yield normalize_types(batch)
+
+
+def iter_cursor_batches(cur):
+    """Connector cursor (already executed) -> typed pandas batches from its Arrow result chunks."""
+    for batch in cur.fetch_arrow_batches():
+        yield frame_from_arrow_batches([batch])
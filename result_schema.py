@@ -0,0 +1,76 @@
+"""
+Schema-driven compaction of query results before they are cached.
+
+Column names come from the star schema (`create table_DDL.txt`), so the
+target dtype of every result column is known up front:
+
+* names and labels (CITY, CUISINE_TYPE, RESTAURANT_NAME, CUSTOMER_NAME,
+  ...) repeat heavily and become categoricals;
+* NUMBER(10,2) money columns stay float64 (int64 cents would be the
+  same size and every chart expects floats), as do ratings, rates and
+  percentages;
+* dates become datetime64;
+* high-cardinality ids become Arrow-backed strings.
+
+Only frames of at least `min_rows` rows are touched; small chart-sized
+results are left as they are.
+"""
+
+import pandas as pd
+
+
+CATEGORY_COLUMNS = frozenset({
+    "CITY", "CUSTOMER_CITY", "RESTAURANT_CITY", "CUISINE_TYPE", "RESTAURANT_NAME",
+    "CUSTOMER_NAME", "ITEM_NAME", "CATEGORY", "COUPON_CODE", "MONTH",
+})
+
+MONEY_COLUMNS = frozenset({
+    "GMV", "TOTAL_AMOUNT", "SUB_TOTAL_AMOUNT", "DELIVERY_FEE", "DISCOUNT_AMOUNT", "COMMISSION_REVENUE",
+    "PAYMENT_PROCESSING_FEE", "NET_PROFIT", "ITEM_PRICE_AT_ORDER", "BASE_PRICE", "MIN_ORDER_VALUE",
+})
+
+RATIO_COLUMNS = frozenset({"ORDER_RATING", "AVERAGE_RATING", "COMMISSION_RATE", "DISCOUNT_PERCENT"})
+
+FLOAT_COLUMNS = MONEY_COLUMNS | RATIO_COLUMNS
+
+DATE_COLUMNS = frozenset({"ORDER_TIMESTAMP", "ORDER_DATE", "JOIN_DATE", "EXPIRY_DATE"})
+
+ID_COLUMNS = frozenset({
+    "ORDER_ID", "CUSTOMER_ID", "RESTAURANT_ID", "COUPON_ID", "MENU_ITEM_ID", "ORDER_ITEM_ID", "EMAIL", "PHONE",
+})
+
+
+def frame_bytes(df):
+    """Deep in-memory size of a DataFrame, index included."""
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def _id_dtype():
+    try:
+        import pyarrow  # noqa: F401
+        return pd.StringDtype("pyarrow")
+    except ImportError:
+        return None
+
+
+def compact_frame(df, min_rows=1000):
+    """`df` with schema dtypes applied (a new frame; `df` is not modified)."""
+    if len(df) < min_rows:
+        return df
+    out = df.copy(deep=False)
+    id_dtype = _id_dtype()
+    for col in out.columns:
+        name, series = str(col).upper(), out[col]
+        if name in CATEGORY_COLUMNS:
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                out[col] = series.astype("category")
+        elif name in FLOAT_COLUMNS:
+            if series.dtype != "float64":
+                out[col] = pd.to_numeric(series, errors="coerce").astype("float64")
+        elif name in DATE_COLUMNS:
+            if not pd.api.types.is_datetime64_any_dtype(series):
+                out[col] = pd.to_datetime(series, errors="coerce")
+        elif name in ID_COLUMNS and id_dtype is not None and series.dtype == object:
+            out[col] = series.astype(id_dtype)
+    out.attrs = dict(df.attrs)
+    return out
@@ -0,0 +1,327 @@
+"""
+Pre-aggregated rollups behind the dashboards.
+
+AGG_DAILY_RESTAURANT holds one row per (order date, restaurant) with the
+additive order metrics (GMV, net profit components, order count, rating
+sum/count/min/max, discount totals). It is refreshed incrementally from a
+(ORDER_TIMESTAMP, ORDER_ID) watermark, and `route_to_daily_rollup`
+rewrites eligible aggregate specs to read it instead of FACT_ORDERS.
+
+The watermark helpers and the month-split of date filters are shared
+with the month-grain tables in `customer_sketches` and `customer_features`.
+
+Incremental refresh assumes new orders arrive with a (date, id) pair at
+or after the watermark; backfilled orders for older dates need a full
+rebuild (`refresh_daily_rollup(execute, full=True)`).
+"""
+
+import datetime
+import re
+from dataclasses import replace
+
+import pandas as pd
+
+from dashboard_queries import NET_PROFIT_SQL, ORDERS_SOURCE
+
+
+DAILY_ROLLUP_TABLE = "AGG_DAILY_RESTAURANT"
+WATERMARK_TABLE = "AGG_REFRESH_WATERMARK"
+
+# One row per incrementally refreshed table (ROLLUP_NAME = table name)
+WATERMARK_DDL = f"""
+    CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+        ROLLUP_NAME VARCHAR(50) NOT NULL,
+        LAST_ORDER_TIMESTAMP DATE,
+        LAST_ORDER_ID VARCHAR(15),
+        REFRESHED_AT TIMESTAMP
+    )
+"""
+
+ROLLUP_DDL = [
+    f"""
+    CREATE TABLE IF NOT EXISTS {DAILY_ROLLUP_TABLE} (
+        ORDER_DATE DATE NOT NULL,
+        RESTAURANT_ID VARCHAR(10) NOT NULL,
+        ORDER_COUNT BIGINT NOT NULL,
+        GMV DECIMAL(18, 2),
+        SUB_TOTAL_AMOUNT DECIMAL(18, 2),
+        DELIVERY_FEE DECIMAL(18, 2),
+        COMMISSION_REVENUE DECIMAL(18, 2),
+        DISCOUNT_AMOUNT DECIMAL(18, 2),
+        PAYMENT_PROCESSING_FEE DECIMAL(18, 2),
+        NET_PROFIT DECIMAL(18, 2),
+        DISCOUNTED_ORDERS BIGINT,
+        RATING_SUM DECIMAL(18, 2),
+        RATING_COUNT BIGINT,
+        RATING_MIN DECIMAL(3, 2),
+        RATING_MAX DECIMAL(3, 2)
+    )
+    """,
+    WATERMARK_DDL,
+]
+
+# Rollup column -> aggregate over the fact rows of one (date, restaurant) key
+ROLLUP_MEASURES = {
+    "ORDER_COUNT": "COUNT(O.ORDER_ID)",
+    "GMV": "SUM(O.TOTAL_AMOUNT)",
+    "SUB_TOTAL_AMOUNT": "SUM(O.SUB_TOTAL_AMOUNT)",
+    "DELIVERY_FEE": "SUM(O.DELIVERY_FEE)",
+    "COMMISSION_REVENUE": "SUM(O.COMMISSION_REVENUE)",
+    "DISCOUNT_AMOUNT": "SUM(O.DISCOUNT_AMOUNT)",
+    "PAYMENT_PROCESSING_FEE": "SUM(O.PAYMENT_PROCESSING_FEE)",
+    "NET_PROFIT": f"SUM({NET_PROFIT_SQL})",
+    "DISCOUNTED_ORDERS": "COUNT_IF(O.DISCOUNT_AMOUNT > 0)",
+    "RATING_SUM": "SUM(O.ORDER_RATING)",
+    "RATING_COUNT": "COUNT(O.ORDER_RATING)",
+    "RATING_MIN": "MIN(O.ORDER_RATING)",
+    "RATING_MAX": "MAX(O.ORDER_RATING)",
+}
+
+
+def _quote(value):
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def _after(ts, order_id):
+    """Orders strictly after the (ORDER_TIMESTAMP, ORDER_ID) mark."""
+    return f"(O.ORDER_TIMESTAMP > {_quote(ts)} OR (O.ORDER_TIMESTAMP = {_quote(ts)} AND O.ORDER_ID > {_quote(order_id)}))"
+
+
+def _at_or_before(ts, order_id):
+    """Orders at or before the (ORDER_TIMESTAMP, ORDER_ID) mark."""
+    return f"(O.ORDER_TIMESTAMP < {_quote(ts)} OR (O.ORDER_TIMESTAMP = {_quote(ts)} AND O.ORDER_ID <= {_quote(order_id)}))"
+
+
+def _merge_sql(new_orders_predicate):
+    """
+    Recomputes every (date, restaurant) key touched by the new orders and
+    upserts it. Keys are recomputed from the fact table rather than
+    incremented, so re-running a refresh is idempotent.
+    """
+    cols = list(ROLLUP_MEASURES)
+    aggs = ",\n            ".join(f"{expr} AS {col}" for col, expr in ROLLUP_MEASURES.items())
+    return f"""
+    MERGE INTO {DAILY_ROLLUP_TABLE} T
+    USING (
+        SELECT O.ORDER_TIMESTAMP AS ORDER_DATE, O.RESTAURANT_ID,
+            {aggs}
+        FROM FACT_ORDERS O
+        JOIN (
+            SELECT DISTINCT O.ORDER_TIMESTAMP, O.RESTAURANT_ID
+            FROM FACT_ORDERS O
+            WHERE {new_orders_predicate}
+        ) K ON O.ORDER_TIMESTAMP = K.ORDER_TIMESTAMP AND O.RESTAURANT_ID = K.RESTAURANT_ID
+        GROUP BY O.ORDER_TIMESTAMP, O.RESTAURANT_ID
+    ) S
+    ON T.ORDER_DATE = S.ORDER_DATE AND T.RESTAURANT_ID = S.RESTAURANT_ID
+    WHEN MATCHED THEN UPDATE SET {", ".join(f"{c} = S.{c}" for c in cols)}
+    WHEN NOT MATCHED THEN INSERT (ORDER_DATE, RESTAURANT_ID, {", ".join(cols)})
+        VALUES (S.ORDER_DATE, S.RESTAURANT_ID, {", ".join(f"S.{c}" for c in cols)})
+    """
+
+
+def pending_orders(execute, rollup_name, full=False):
+    """
+    (predicate, watermark) for the orders `rollup_name` has not seen yet:
+    `predicate` filters FACT_ORDERS O down to them (None when the rollup is
+    up to date) and `watermark` is the (date, id) mark to store once they are
+    folded in. Both are None when FACT_ORDERS is empty.
+    """
+    high = execute(
+        "SELECT ORDER_TIMESTAMP, ORDER_ID FROM FACT_ORDERS ORDER BY ORDER_TIMESTAMP DESC, ORDER_ID DESC LIMIT 1"
+    )
+    if high.empty:
+        return None, None
+    high_ts = pd.to_datetime(high.iloc[0, 0]).date().isoformat()
+    high_id = high.iloc[0, 1]
+
+    mark = execute(
+        f"SELECT LAST_ORDER_TIMESTAMP, LAST_ORDER_ID FROM {WATERMARK_TABLE} "
+        f"WHERE ROLLUP_NAME = {_quote(rollup_name)}"
+    )
+    if full or mark.empty or pd.isna(mark.iloc[0, 0]):
+        return _at_or_before(high_ts, high_id), (high_ts, high_id)
+    last_ts = pd.to_datetime(mark.iloc[0, 0]).date().isoformat()
+    last_id = mark.iloc[0, 1]
+    if (last_ts, last_id) >= (high_ts, high_id):
+        return None, (high_ts, high_id)
+    return f"{_after(last_ts, last_id)} AND {_at_or_before(high_ts, high_id)}", (high_ts, high_id)
+
+
+def save_watermark(execute, rollup_name, watermark):
+    """Records that `rollup_name` now covers every order up to `watermark`."""
+    high_ts, high_id = watermark
+    execute(f"""
+    MERGE INTO {WATERMARK_TABLE} T
+    USING (SELECT {_quote(rollup_name)} AS ROLLUP_NAME) S ON T.ROLLUP_NAME = S.ROLLUP_NAME
+    WHEN MATCHED THEN UPDATE SET LAST_ORDER_TIMESTAMP = {_quote(high_ts)}, LAST_ORDER_ID = {_quote(high_id)},
+        REFRESHED_AT = CURRENT_TIMESTAMP
+    WHEN NOT MATCHED THEN INSERT (ROLLUP_NAME, LAST_ORDER_TIMESTAMP, LAST_ORDER_ID, REFRESHED_AT)
+        VALUES (S.ROLLUP_NAME, {_quote(high_ts)}, {_quote(high_id)}, CURRENT_TIMESTAMP)
+    """)
+
+
+def refresh_daily_rollup(execute, full=False):
+    """
+    Brings AGG_DAILY_RESTAURANT up to date through `execute(sql) -> DataFrame`.
+    Only keys with orders past the stored watermark are recomputed.
+    Returns the new watermark and whether anything changed.
+    """
+    for ddl in ROLLUP_DDL:
+        execute(ddl)
+
+    predicate, watermark = pending_orders(execute, DAILY_ROLLUP_TABLE, full)
+    if predicate is None:
+        return {"watermark": watermark, "refreshed": False}
+    if full:
+        execute(f"DELETE FROM {DAILY_ROLLUP_TABLE}")
+
+    execute(_merge_sql(predicate))
+    save_watermark(execute, DAILY_ROLLUP_TABLE, watermark)
+    return {"watermark": watermark, "refreshed": True}
+
+
+#  MONTH-GRAIN TABLES (keyed by the first day of the order month)
+
+MONTH_SQL = "CAST(DATE_TRUNC('MONTH', O.ORDER_TIMESTAMP) AS DATE)"
+
+
+def _month_start(d):
+    return d.replace(day=1)
+
+
+def _next_month(d):
+    return (d.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def split_months(start, end, data_range=None):
+    """
+    ((first, last) whole months or None, [(from, to)] partial date ranges)
+    covering [start, end]. A month counts as whole when the range covers
+    every day of it that can hold orders (`data_range` = first / last order date).
+    """
+    start, end = pd.Timestamp(start).date(), pd.Timestamp(end).date()
+    data_min, data_max = (pd.Timestamp(d).date() for d in data_range) if data_range else (None, None)
+
+    first = _month_start(start)
+    if start.day != 1 and not (data_min and start <= data_min):
+        first = _next_month(first)
+    last = _month_start(end)
+    if (end + datetime.timedelta(days=1)).day != 1 and not (data_max and end >= data_max):
+        last = _month_start(last - datetime.timedelta(days=1))
+
+    if first > last:
+        return None, [(start, end)]
+    partial = []
+    if start < first:
+        partial.append((start, first - datetime.timedelta(days=1)))
+    last_day = _next_month(last) - datetime.timedelta(days=1)
+    if end > last_day:
+        partial.append((last_day + datetime.timedelta(days=1), end))
+    return (first, last), partial
+
+
+def month_grain_predicates(filters, month_column, data_range=None):
+    """
+    Splits the sidebar `filters` between a month-grain table joined to
+    DIM_RESTAURANT R (whole months, on `month_column`) and FACT_ORDERS O
+    (the days of partially covered months). Returns (table predicates,
+    fact predicates) as [(sql, params)]; a side is None when it reads nothing.
+    """
+    restaurant = replace(filters, start_date=None, end_date=None).predicates()
+    if not (filters.start_date and filters.end_date):
+        return restaurant, None
+    months, partial = split_months(filters.start_date, filters.end_date, data_range)
+    table = restaurant + [(f"{month_column} BETWEEN ? AND ?", months)] if months else None
+    fact = None
+    if partial:
+        days = " OR ".join("O.ORDER_TIMESTAMP BETWEEN ? AND ?" for _ in partial)
+        fact = restaurant + [(f"({days})", tuple(d for r in partial for d in r))]
+    return table, fact
+
+
+def where_sql(predicates):
+    """(` WHERE ...`, params) for [(sql, params)] predicates; ("", ()) when there are none."""
+    if not predicates:
+        return "", ()
+    return " WHERE " + " AND ".join(p for p, _ in predicates), tuple(v for _, values in predicates for v in values)
+
+
+#  QUERY ROUTING
+
+ROLLUP_SOURCE = f"{DAILY_ROLLUP_TABLE} A JOIN DIM_RESTAURANT R ON A.RESTAURANT_ID = R.RESTAURANT_ID"
+
+# Fact-level expression -> equivalent over rollup rows. AVG becomes a
+# ratio of sums and the commission average is weighted by order count so
+# results match the fact-table query exactly. COUNT over no rows is 0
+# where SUM is NULL, so the order counts are coalesced to 0.
+ROLLUP_REWRITES = {
+    f"SUM({NET_PROFIT_SQL})": "SUM(A.NET_PROFIT)",
+    "AVG(O.ORDER_RATING)": "(SUM(A.RATING_SUM) / NULLIF(SUM(A.RATING_COUNT), 0))",
+    "AVG(R.COMMISSION_RATE)": "(SUM(A.ORDER_COUNT * R.COMMISSION_RATE) / NULLIF(SUM(A.ORDER_COUNT), 0))",
+    "MAX(O.ORDER_RATING)": "MAX(A.RATING_MAX)",
+    "MIN(O.ORDER_RATING)": "MIN(A.RATING_MIN)",
+    "COUNT(DISTINCT O.ORDER_ID)": "COALESCE(SUM(A.ORDER_COUNT), 0)",
+    "COUNT(O.ORDER_ID)": "COALESCE(SUM(A.ORDER_COUNT), 0)",
+    "COUNT(*)": "COALESCE(SUM(A.ORDER_COUNT), 0)",
+    "SUM(O.TOTAL_AMOUNT)": "SUM(A.GMV)",
+    "SUM(O.SUB_TOTAL_AMOUNT)": "SUM(A.SUB_TOTAL_AMOUNT)",
+    "SUM(O.DELIVERY_FEE)": "SUM(A.DELIVERY_FEE)",
+    "SUM(O.COMMISSION_REVENUE)": "SUM(A.COMMISSION_REVENUE)",
+    "SUM(O.DISCOUNT_AMOUNT)": "SUM(A.DISCOUNT_AMOUNT)",
+    "SUM(O.PAYMENT_PROCESSING_FEE)": "SUM(A.PAYMENT_PROCESSING_FEE)",
+    "O.ORDER_RATING IS NOT NULL": "A.RATING_COUNT > 0",
+    "O.ORDER_TIMESTAMP": "A.ORDER_DATE",
+    "O.RESTAURANT_ID": "A.RESTAURANT_ID",
+}
+
+_REWRITE_ORDER = sorted(ROLLUP_REWRITES, key=len, reverse=True)
+
+# Anything still pointing at the fact table, or aggregating a column that
+# is not a rollup column, cannot be answered from the rollup.
+_INELIGIBLE = re.compile(r"\bO\.|\b(?:SUM|AVG|COUNT|MIN|MAX|COUNT_IF)\(\s*(?!A\.)", re.IGNORECASE)
+
+
+def _rewrite(expr):
+    """Rewrites one expression to the rollup, or returns None if it is not eligible."""
+    if expr is None:
+        return None, True
+    out = expr
+    for src in _REWRITE_ORDER:
+        out = out.replace(src, ROLLUP_REWRITES[src])
+    return out, not _INELIGIBLE.search(out)
+
+
+def route_to_daily_rollup(spec, where_clause=""):
+    """
+    Returns (spec, where_clause) rewritten to read AGG_DAILY_RESTAURANT when
+    every dimension, measure and filter of the spec can be answered from it;
+    otherwise returns the inputs unchanged.
+    """
+    if spec.source != ORDERS_SOURCE:
+        return spec, where_clause
+
+    rewritten = {}
+    for group in ("dims", "measures"):
+        rewritten[group] = {}
+        for alias, expr in getattr(spec, group).items():
+            new_expr, ok = _rewrite(expr)
+            if not ok:
+                return spec, where_clause
+            rewritten[group][alias] = new_expr
+
+    where = []
+    for pred in spec.where:
+        new_pred, ok = _rewrite(pred)
+        if not ok:
+            return spec, where_clause
+        where.append(new_pred)
+
+    having, ok = _rewrite(spec.having)
+    new_where_clause, where_ok = _rewrite(where_clause or "")
+    if not (ok and where_ok):
+        return spec, where_clause
+
+    routed = replace(spec, source=ROLLUP_SOURCE, dims=rewritten["dims"], measures=rewritten["measures"],
+                     where=where, having=having)
+    return routed, new_where_clause
@@ -10,6 +10,34 @@ from io import BytesIO
 import base64, tempfile
 import plotly.io as pio
 import os
+import threading
+import time
+from local_backend import LocalBackend
+import order_cube as oc
+import rollups
+import customer_sketches
+import customer_features
+from dashboard_queries import (
+    TOP_N_MAX, VIEW_OUTPUT_COLUMNS, commission_correlation_specs, executive_dashboard_specs, projected_view,
+    referenced_columns, restaurant_deep_dive_specs,
+)
+from query_compiler import compile_fused_query, fused_columns, split_fused_result
+from query_filters import (
+    DashboardFilters, FilterMetadata, JOINED_COLUMNS, VIEW_COLUMNS, DATA_VERSION_QUERY, FILTER_METADATA_QUERY,
+    inline_literals,
+)
+from query_cache import QueryCache
+from figure_cache import FigureCache
+from result_schema import compact_frame, frame_bytes
+from result_fetch import fetch_cursor, fetch_snowpark, iter_cursor_batches, iter_snowpark_batches
+import bounded_query as bq
+import number_format as nf
+from llm_cache import CompletionCache, schema_version
+from question_index import EntityCanonicalizer, QuestionIndex
+from nl_templates import template_query
+from query_scheduler import BackgroundPrefetcher, QueryBatch, QueryFailure
+from query_metrics import QueryLog, attributed, begin_run, set_query_origin
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 
 
 #THEME TOGGLE (Light / Dark Mode)
@@ -61,30 +89,37 @@ body, .stApp {{
   color: {ink};
   transition: background-color 0.4s ease, color 0.4s ease;
 }}
-.stTabs [data-baseweb="tab-list"] {{
+/* Page selector: the horizontal st.radio drawn as a scrollable row of tabs */
+.st-key-active_page [role="radiogroup"] {{
   display: flex; flex-wrap: nowrap; overflow-x: auto; white-space: nowrap;
   scroll-behavior: smooth; gap: 6px; background: {card};
   padding: 8px 12px; border-radius: 12px;
   box-shadow: 0 4px 12px rgba(0,0,0,0.08);
 }}
-.stTabs [data-baseweb="tab-list"]::-webkit-scrollbar {{
+.st-key-active_page [role="radiogroup"]::-webkit-scrollbar {{
   height: 6px;
 }}
-.stTabs [data-baseweb="tab-list"]::-webkit-scrollbar-thumb {{
+.st-key-active_page [role="radiogroup"]::-webkit-scrollbar-thumb {{
   background-color: {brand}; border-radius: 10px;
 }}
-.stTabs [data-baseweb="tab"] {{
+.st-key-active_page label[data-baseweb="radio"] {{
   background: {bg}; color: {muted}; border: 1px solid {border};
-  border-radius: 10px; padding: 8px 14px; flex: 0 0 auto;
+  border-radius: 10px; padding: 8px 14px; margin: 0; flex: 0 0 auto;
   transition: all 0.25s ease-in-out;
 }}
-.stTabs [data-baseweb="tab"]:hover {{
+.st-key-active_page label[data-baseweb="radio"] > div:first-child {{
+  display: none;
+}}
+.st-key-active_page label[data-baseweb="radio"]:hover {{
   color: {brand}; border-color: {brand};
 }}
-.stTabs [aria-selected="true"] {{
+.st-key-active_page label[data-baseweb="radio"]:has(input:checked) {{
   background: {brand}; color: white; font-weight: 700;
   box-shadow: 0 4px 10px rgba(59,130,246,0.3);
 }}
+.st-key-active_page label[data-baseweb="radio"] p {{
+  color: inherit; font-weight: inherit;
+}}
 .header {{
   background: {header_grad}; color: white; border-radius: 16px;
   padding: 18px 22px; box-shadow: 0 6px 18px rgba(0,0,0,0.15);
@@ -229,41 +264,28 @@ if not _ensure_defined("end_card"):
 #HELPERS
 
 
+# The formatters take a scalar (KPI tiles) or a whole column (chart labels) and format it in one
+# vectorized pass; "🇮🇳 Lakh / crore units" in the sidebar switches K/M/B to K/L/Cr
+
+def indian_units():
+    return st.session_state.get("indian_units", False)
+
 def fmt_number(x):
     """Standardized formatter for all KPIs and charts."""
-    try:
-        x = float(x)
-        if abs(x) >= 1_000_000_000:
-            return f"{x/1_000_000_000:.2f}B"
-        elif abs(x) >= 1_000_000:
-            return f"{x/1_000_000:.2f}M"
-        elif abs(x) >= 1_000:
-            return f"{x/1_000:.2f}K"
-        else:
-            return f"{x:.2f}"
-    except:
-        return "0.00"
+    return nf.format_number(x, indian=indian_units())
 
 def fmt_money(x):
     """Currency formatter consistent with fmt_number."""
-    try:
-        x = float(x)
-        if abs(x) >= 1_000_000_000:
-            return f"₹{x/1_000_000_000:.2f}B"
-        elif abs(x) >= 1_000_000:
-            return f"₹{x/1_000_000:.2f}M"
-        elif abs(x) >= 1_000:
-            return f"₹{x/1_000:.2f}K"
-        else:
-            return f"₹{x:.2f}"
-    except:
-        return "₹0.00"
+    return nf.format_money(x, indian=indian_units())
 
 def fmt_int(x):
-    try:
-        return fmt_number(x)
-    except:
-        return "0"
+    return fmt_number(x)
+
+def fmt_percent(x):
+    return nf.format_percent(x)
+
+def fmt_rating(x):
+    return nf.format_rating(x)
 
 def calc_share(series):
     total = series.sum()
@@ -322,28 +344,19 @@ def get_selected_filters():
     }
 
 
-def generate_filtered_data(filters):
+def generate_filtered_data(filters, columns=VIEW_OUTPUT_COLUMNS):
     """
     Dynamically generates separate filtered DataFrames based on
     whichever filter (city, cuisine, or restaurant) has multiple selections.
+    Only `columns` (plus the filtered ones) are read; DIM_CUSTOMER is joined
+    only when CUSTOMER_NAME is among them.
     """
-    city_filter = filters["city"]
-    rest_filter = filters["restaurant"]
-    cuisine_filter = filters["cuisine"]
-    start_date, end_date = filters["date_range"]
-
-    base_query = """
-        SELECT * FROM V_PLATFORM_PROFITABILITY
-        WHERE ORDER_TIMESTAMP BETWEEN '{start}' AND '{end}'
-    """.format(start=start_date, end=end_date)
-
-    # Append remaining filters
-    if cuisine_filter:
-        base_query += " AND CUISINE_TYPE IN (" + ", ".join(f"'{x}'" for x in cuisine_filter) + ")"
-    if rest_filter:
-        base_query += " AND RESTAURANT_NAME IN (" + ", ".join(f"'{x}'" for x in rest_filter) + ")"
-    if city_filter:
-        base_query += " AND CITY IN (" + ", ".join(f"'{x}'" for x in city_filter) + ")"
+    typed = DashboardFilters.from_selection(
+        filters["city"], filters["restaurant"], filters["cuisine"], *filters["date_range"]
+    )
+    city_filter, rest_filter, cuisine_filter = typed.cities, typed.restaurants, typed.cuisines
+
+    where_sql, where_params = typed.where(VIEW_COLUMNS)
 
     # Detect main comparison dimension
     if len(city_filter) > 1:
@@ -359,13 +372,17 @@ def generate_filtered_data(filters):
         main_field = None
         loop_values = ["All Data"]
 
+    read_columns = list(dict.fromkeys([*columns, *referenced_columns(where_sql, main_field or "")]))
+    base_query = f"SELECT * FROM {projected_view(read_columns)}" + where_sql
+
     # Generate one dataset per selected value
     data_dict = {}
     for val in loop_values:
-        q = base_query
+        q, params = base_query, where_params
         if main_field:
-            q += f" AND {main_field} = '{val}'"
-        df = run_query(q)
+            q += (" AND " if where_sql else " WHERE ") + f"{main_field} = ?"
+            params += (val,)
+        df = run_query(q, params)
         data_dict[val] = df
 
     return data_dict
@@ -379,6 +396,11 @@ def generate_filtered_data(filters):
 def init_connection():
     # If using Streamlit in Snowflake, use the native connection for security
     # We will still load st.secrets to check for configuration, but not for connection itself.
+
+    # FOOD_DELIVERY_BACKEND=local serves every query from the bundled CSVs (dev, CI, load tests)
+    if os.environ.get("FOOD_DELIVERY_BACKEND", "snowflake").lower() == "local":
+        st.info("Connected to the local CSV-backed query engine.")
+        return LocalBackend()
     
     try:
         # Check if the native Snowpark session is available (typical in Streamlit in Snowflake)
@@ -399,6 +421,8 @@ def init_connection():
             return None 
 
         # If secrets are available, use snowflake.connector
+        # (qmark binding so run_query params use the same `?` placeholders as Snowpark)
+        snowflake.connector.paramstyle = "qmark"
         return snowflake.connector.connect(
             user=creds["user"], 
             password=creds["password"], 
@@ -410,6 +434,9 @@ def init_connection():
 
 conn = init_connection()
 
+# Queries logged from here on belong to this rerun (see the diagnostics panel)
+diagnostics_run_id = begin_run()
+
 # Check if connection failed (due to missing secrets or failed connection attempt)
 if conn is None:
     st.stop()
@@ -418,57 +445,200 @@ if conn is None:
 
 # QUERY RUNNER (UPDATED for Snowpark Session compatibility)
 
-@st.cache_data(ttl=600)
-def run_query(q):
+def execute_on_connection(q, params=()):
+    """Runs one statement on the active connection (uncached). `params` bind to `?` placeholders."""
     global conn # Use the global connection object
 
+    # 0. Local CSV-backed engine (no network round-trip)
+    if isinstance(conn, LocalBackend):
+        return conn.query(q, params)
+
     # 1. Check if the connection object is a Snowpark Session (returned by st.connection)
     if hasattr(conn, 'sql'):
         # --- Handle Snowpark Session (Recommended for Streamlit in Snowflake) ---
-        
-        # Execute the query and collect the results as a list of Snowpark Rows
-        snowpark_df = conn.sql(q)
-        rows = snowpark_rows = snowpark_df.collect()
-        
-        # Get column names from the Snowpark DataFrame structure
-        cols = [col.name for col in snowpark_df.schema.fields]
-        
-        # Convert Snowpark Rows to a list of lists for pandas DataFrame creation
-        data = [[r[col] for col in cols] for r in rows]
-        
-        return pd.DataFrame(data, columns=cols)
+        snowpark_df = conn.sql(q, params=list(params)) if params else conn.sql(q)
+
+        # Arrow batches straight into typed pandas columns (no per-row loop)
+        return fetch_snowpark(snowpark_df)
     
     # 2. Fallback to Traditional Python Connector (Returned by snowflake.connector.connect)
     else:
         # --- Handle Traditional Python Connector ---
         cur = conn.cursor()
-        cur.execute(q)
-        rows, cols = cur.fetchall(), [d[0] for d in cur.description]
-        cur.close()
-        return pd.DataFrame(rows, columns=cols)
+        try:
+            cur.execute(q, params or None)
+            return fetch_cursor(cur)
+        finally:
+            cur.close()
 
 
-# SIDEBAR FILTERS
+def execute_query(q, params=()):
+    """execute_on_connection, logged to the query log (every warehouse execution is a cache miss)."""
+    start = time.perf_counter()
+    try:
+        df = execute_on_connection(q, params)
+    except Exception as e:
+        get_query_log().log(q, params, "miss", time.perf_counter() - start, error=e)
+        raise
+    get_query_log().log(q, params, "miss", time.perf_counter() - start, df)
+    return df
+
+
+def execute_query_batches(q, params=()):
+    """Like execute_query, but yields the result in DataFrame batches (for streaming exports)."""
+    if isinstance(conn, LocalBackend):
+        yield from conn.query_batches(q, params)
+    elif hasattr(conn, 'sql'):
+        yield from iter_snowpark_batches(conn.sql(q, params=list(params)) if params else conn.sql(q))
+    else:
+        cur = conn.cursor()
+        try:
+            cur.execute(q, params or None)
+            yield from iter_cursor_batches(cur)
+        finally:
+            cur.close()
 
-with st.sidebar:
-    st.markdown("### 🔍 Filter Your Insights")
 
-    city_list = run_query("SELECT DISTINCT CITY FROM V_PLATFORM_PROFITABILITY;")["CITY"].tolist()
-    rest_list = run_query("SELECT DISTINCT RESTAURANT_NAME FROM V_PLATFORM_PROFITABILITY;")["RESTAURANT_NAME"].tolist()
-    cuisine_list = run_query("SELECT DISTINCT CUISINE_TYPE FROM V_PLATFORM_PROFITABILITY;")["CUISINE_TYPE"].tolist()
+@st.cache_resource
+def get_query_log():
+    """Process-wide log of recent queries for the diagnostics panel."""
+    return QueryLog(max_records=5000)
+
+
+@st.cache_resource
+def get_query_cache():
+    """Process-wide result cache shared by all tabs and sessions (10 min TTL); large results are stored compacted."""
+    return QueryCache(ttl=600, max_entries=512, normalize=compact_frame)
+
+
+@st.cache_resource
+def get_figure_cache():
+    """Process-wide LRU of built Plotly figures (as JSON), shared by all tabs and sessions."""
+    return FigureCache(max_entries=256)
+
+
+def cached_figure(chart_id, df, build, **spec):
+    """
+    `build(df)` for one chart, served from the figure cache when the same frame was
+    drawn by `chart_id` with the same `spec` and theme before.
+    """
+    # Bar labels follow the number units, so they are part of every chart's key
+    return get_figure_cache().get_or_build(
+        df, {"chart": chart_id, "indian_units": indian_units(), **spec}, plotly_template, lambda: build(df)
+    )
+
+
+def run_query(q, params=()):
+    # Keyed on a normalized fingerprint: whitespace, literal IN-list order and
+    # a smaller trailing LIMIT of an already cached query all hit the same entry
+    start = time.perf_counter()
+    computed = []
+
+    def compute(sql, p):
+        computed.append(True)
+        return execute_query(sql, p)   # logged there as a miss
+
+    df = get_query_cache().get_or_compute(q, tuple(params), compute)
+    if not computed:
+        get_query_log().log(q, params, "hit", time.perf_counter() - start, df)
+    return df
+
+
+def new_query_batch(timeout=120):
+    """QueryBatch whose worker threads carry this session's script context (needed by st.cache_*)."""
+    ctx = get_script_run_ctx()
+    return QueryBatch(
+        max_workers=4,
+        timeout=timeout,
+        initializer=lambda: add_script_run_ctx(threading.current_thread(), ctx),
+    )
+
+
+def with_script_context(fn):
+    """`fn` run with this session's script context; for pools shared across sessions, whose threads are reused."""
+    ctx = get_script_run_ctx()
+
+    def wrapper(*args, **kwargs):
+        add_script_run_ctx(threading.current_thread(), ctx)
+        return fn(*args, **kwargs)
+    return wrapper
+
+
+# DAILY ROLLUP (incremental refresh; eligible aggregates are routed to it)
+
+@st.cache_data(ttl=600)
+def refresh_rollups():
+    """Refreshes AGG_DAILY_RESTAURANT from its watermark. Returns None if the rollup is unavailable."""
+    try:
+        return rollups.refresh_daily_rollup(execute_query)
+    except Exception:
+        # e.g. no CREATE/MERGE privilege: keep serving every query from FACT_ORDERS
+        return None
+
+
+rollup_router = rollups.route_to_daily_rollup if refresh_rollups() is not None else None
+
+
+@st.cache_data(ttl=600)
+def refresh_customer_sketches():
+    """Refreshes AGG_MONTHLY_CUSTOMER_HLL from its watermark. Returns None if the sketches are unavailable."""
+    try:
+        return customer_sketches.refresh_customer_sketches(execute_query)
+    except Exception:
+        # Customer counts then stay exact (from the order cube)
+        return None
+
+
+customer_sketches_ready = refresh_customer_sketches() is not None
+
+
+@st.cache_data(ttl=600)
+def refresh_customer_features():
+    """Refreshes AGG_CUSTOMER_FEATURES from its watermark. Returns None if the table is unavailable."""
+    try:
+        return customer_features.refresh_customer_features(execute_query)
+    except Exception:
+        # The customer cards then aggregate the order cube instead
+        return None
+
 
-    selected_city = st.multiselect("🏙️ City", city_list)
-    selected_rest = st.multiselect("🍽️ Restaurant", rest_list)
-    selected_cuisine = st.multiselect("🍱 Cuisine", cuisine_list)
+customer_features_ready = refresh_customer_features() is not None
 
 
-    mind = run_query("SELECT MIN(ORDER_TIMESTAMP) AS MIN_DATE FROM V_PLATFORM_PROFITABILITY;")["MIN_DATE"][0]
-    maxd = run_query("SELECT MAX(ORDER_TIMESTAMP) AS MAX_DATE FROM V_PLATFORM_PROFITABILITY;")["MAX_DATE"][0]
+# SIDEBAR FILTER OPTIONS (one statement, cached per data version instead of a TTL)
 
+@st.cache_data(ttl=60, show_spinner=False)
+def current_data_version():
+    """Cheap metadata probe; changes whenever the restaurant or order tables change."""
+    if isinstance(conn, LocalBackend):
+        return conn.data_version()
     try:
-        mind_date, maxd_date = pd.to_datetime(mind).date(), pd.to_datetime(maxd).date()
-    except:
-        mind_date, maxd_date = date(2020, 1, 1), date.today()
+        return str(execute_query(DATA_VERSION_QUERY).iloc[0, 0])
+    except Exception:
+        # No INFORMATION_SCHEMA access: fall back to one snapshot per hour
+        return pd.Timestamp.now().strftime("%Y-%m-%d %H")
+
+
+@st.cache_data
+def load_filter_metadata(data_version):
+    """Sidebar options snapshot for one data version."""
+    return FilterMetadata.from_frame(execute_query(FILTER_METADATA_QUERY))
+
+
+# SIDEBAR FILTERS
+
+with st.sidebar:
+    st.markdown("### 🔍 Filter Your Insights")
+
+    set_query_origin("Sidebar", "filter options")
+    filter_meta = load_filter_metadata(current_data_version())
+
+    selected_city = st.multiselect("🏙️ City", filter_meta.cities)
+    selected_rest = st.multiselect("🍽️ Restaurant", filter_meta.restaurants)
+    selected_cuisine = st.multiselect("🍱 Cuisine", filter_meta.cuisines)
+
+    mind_date = filter_meta.min_date or date(2020, 1, 1)
+    maxd_date = filter_meta.max_date or date.today()
 
     start_date, end_date = st.date_input(
         "📅 Order Date Range",
@@ -477,20 +647,25 @@ with st.sidebar:
         max_value=maxd_date
     )
 
+    exact_customers = st.toggle(
+        "🎯 Exact customer counts", key="exact_customer_counts", disabled=not customer_sketches_ready,
+        help="Customer counts are HyperLogLog estimates (±"
+             f"{1.96 * customer_sketches.STANDARD_ERROR:.1%} at 95%) unless this is on.",
+    )
+    approx_customers = customer_sketches_ready and not exact_customers
+
+    st.toggle("🇮🇳 Lakh / crore units", key="indian_units",
+              help="Show amounts and counts in lakh (L) and crore (Cr) instead of millions (M) and billions (B).")
+
+
+#  FILTER WHERE CLAUSES (bind variables; identical for any selection order)
+
+current_filters = DashboardFilters.from_selection(selected_city, selected_rest, selected_cuisine, start_date, end_date)
 
-#  FILTER WHERE CLAUSES
 
 def base_where_simple():
-    f = []
-    if selected_city:
-        f.append("CITY IN (" + ", ".join([f"'{x}'" for x in selected_city]) + ")")
-    if selected_rest:
-        f.append("RESTAURANT_NAME IN (" + ", ".join([f"'{x}'" for x in selected_rest]) + ")")
-    if selected_cuisine:
-        f.append("CUISINE_TYPE IN (" + ", ".join([f"'{x}'" for x in selected_cuisine]) + ")")
-    if start_date and end_date:
-        f.append(f"ORDER_TIMESTAMP BETWEEN '{start_date}' AND '{end_date}'")
-    return " WHERE " + " AND ".join(f) if f else ""
+    """(WHERE clause with ? placeholders, params) over V_PLATFORM_PROFITABILITY columns."""
+    return current_filters.where(VIEW_COLUMNS)
 
 
 #  HELPER: GET COMPARISON DIMENSION (Needed to resolve NameError)
@@ -512,34 +687,210 @@ def get_comparison_dimension():
 
     
 def base_where_joined():
-    f = []
-    if selected_city:
-        f.append("R.CITY IN (" + ", ".join([f"'{x}'" for x in selected_city]) + ")")
-    if selected_rest:
-        f.append("R.RESTAURANT_NAME IN (" + ", ".join([f"'{x}'" for x in selected_rest]) + ")")
-    if selected_cuisine:
-        f.append("R.CUISINE_TYPE IN (" + ", ".join([f"'{x}'" for x in selected_cuisine]) + ")")
-    if start_date and end_date:
-        f.append(f"O.ORDER_TIMESTAMP BETWEEN '{start_date}' AND '{end_date}'")
-    return " WHERE " + " AND ".join(f) if f else ""
+    """(WHERE clause with ? placeholders, params) over FACT_ORDERS O / DIM_RESTAURANT R."""
+    return current_filters.where(JOINED_COLUMNS)
+
+
+# ORDER CUBE (one filtered scan shared by Tabs 5 and 6)
+
+@st.cache_data(ttl=600)
+def load_order_cube(where_clause, params, columns=tuple(oc.CUBE_COLUMNS)):
+    """Fetches the filtered order-level cube once per filter state (categorical labels; see result_schema)."""
+    cube = oc.prepare_order_cube(execute_query(oc.order_cube_query(where_clause, list(columns)), params))
+    compact = compact_frame(cube)
+    compact.attrs["bytes"] = frame_bytes(compact)
+    compact.attrs["bytes_saved"] = frame_bytes(cube) - compact.attrs["bytes"]
+    return compact
+
+
+# CORTEX COMPLETIONS (durable cache keyed by model, prompt hash and schema version)
+
+CORTEX_MODEL = "llama3-8b"
+
+CORTEX_SCHEMA_CONTEXT = """
+Table: V_PLATFORM_PROFITABILITY
+Columns: ORDER_ID, ORDER_TIMESTAMP, CUSTOMER_ID, CUSTOMER_NAME, RESTAURANT_ID, RESTAURANT_NAME,
+CITY, CUISINE_TYPE, GMV, DELIVERY_FEE, COMMISSION_REVENUE, DISCOUNT_AMOUNT,
+PAYMENT_PROCESSING_FEE, NET_PROFIT, ORDER_RATING
+
+Table: DIM_RESTAURANT
+Columns: RESTAURANT_ID, RESTAURANT_NAME, CITY, CUISINE_TYPE, AVERAGE_RATING, COMMISSION_RATE
+
+Table: DIM_CUSTOMER
+Columns: CUSTOMER_ID, CUSTOMER_NAME, CITY, JOIN_DATE, EMAIL, PHONE
+
+Table: FACT_ORDERS
+Columns: ORDER_ID, CUSTOMER_ID, RESTAURANT_ID, COUPON_ID, ORDER_TIMESTAMP, DELIVERY_FEE, SUB_TOTAL_AMOUNT,
+DISCOUNT_AMOUNT, COMMISSION_REVENUE, PAYMENT_PROCESSING_FEE, TOTAL_AMOUNT, ORDER_RATING
+"""
+
+CORTEX_SCHEMA_VERSION = schema_version(CORTEX_SCHEMA_CONTEXT)
+
+
+@st.cache_resource
+def get_completion_cache():
+    """SQLite completion store shared by all sessions (and processes using the same file)."""
+    return CompletionCache(max_entries=2000)
+
+
+def cortex_complete(prompt, model=CORTEX_MODEL):
+    """SNOWFLAKE.CORTEX.COMPLETE through the completion cache; the prompt is a bind variable."""
+    def complete(model, prompt):
+        result_df = execute_query("SELECT SNOWFLAKE.CORTEX.COMPLETE(?, ?) AS COMPLETION", (model, prompt))
+        return result_df.iloc[0, 0] if not result_df.empty else None
+    return get_completion_cache().get_or_complete(model, prompt, CORTEX_SCHEMA_VERSION, complete)
+
+
+@st.cache_resource
+def get_entity_canonicalizer(data_version):
+    """Maps city / cuisine / restaurant names in Tab 4 questions to the current sidebar options."""
+    meta = load_filter_metadata(data_version)
+    return EntityCanonicalizer(meta.cities, meta.cuisines, meta.restaurants)
+
+
+@st.cache_resource
+def get_question_index(data_version):
+    """Validated Tab 4 questions, with entity matching against the current sidebar options."""
+    return QuestionIndex(canonicalize=get_entity_canonicalizer(data_version))
 
 
-#TABS 
+# CORTEX PORTAL SUMMARY (Tab 1)
 
-tab1, tab2, tab3, tab4, tab5, tab6 = st.tabs([
+PORTAL_SUMMARY_PROMPT = """
+You are an AI Analyst summarizing a Snowflake-based analytics portal for food delivery.
+The portal is designed to analyze **Platform Profitability, Restaurant Performance, and Customer Loyalty**.
+
+The underlying data structure includes the following main tables:
+1. DIM_CUSTOMER: Customer demographics, join dates.
+2. DIM_RESTAURANT: Restaurant details, cuisine type, ratings, and commission rates.
+3. FACT_ORDERS: Order transactions, total GMV, Delivery Fees, Commission Revenue, Discount Amount, Net Profit.
+4. FACT_ORDER_ITEMS: Links orders to specific menu items and quantities.
+
+Provide a concise, engaging summary (max 200 words) of the portal's purpose and the key insights the user will gain from analyzing this data.
+"""
+
+@st.cache_data(ttl=3600) 
+def get_cortex_summary(prompt):
+    """Fetches the dynamic summary text using Snowflake Cortex AI."""
+    # Errors propagate to the render batch, which reports them in Tab 1 (and nothing is cached)
+    summary = cortex_complete(prompt)
+    if summary:
+        return summary
+    return "AI summary failed to load or returned empty content."
+
+
+#PAGES (only the selected page is computed on a rerun; the other pages' warehouse queries are prefetched afterwards)
+
+PAGES = [
     "📰 Portal Summary", # <-- NEW TAB 1
     "🚀 Executive Dashboard", # <-- Old Tab 1 is now Tab 2
     "🍽️ Restaurant Deep Dive", # <-- Old Tab 2 is now Tab 3
     "🧠 AI Analyst", # <-- Old Tab 3 is now Tab 4
     "👥 Customer Insights", # <-- Old Tab 4 is now Tab 5
     "🧩 Conclusion & Recommendations" # <-- Old Tab 5 is now Tab 6
-])
+]
+
+# Queries each page reads from render_results
+PAGE_QUERIES = {
+    PAGES[0]: ["summary"],
+    PAGES[1]: ["executive"],
+    PAGES[2]: ["deep_dive"],
+    PAGES[3]: [],
+    PAGES[4]: ["cube", "monthly_customers", "customer_kpis", "loyal_customers"],
+    PAGES[5]: ["cube", "customers", "top_customer", "commission"],
+}
+
+# Widgets on hidden pages are not rendered, so their values (and defaults) live in session state
+PAGE_WIDGET_DEFAULTS = {"tab2_agg_top_n_final": 10, "tab3_list_n_agg": 10, "tab5_list_n_agg": 10, "ai_page": 1}
+for widget_key, default in PAGE_WIDGET_DEFAULTS.items():
+    st.session_state[widget_key] = st.session_state.get(widget_key, default)
+
+active_page = st.radio("Page", PAGES, horizontal=True, key="active_page", label_visibility="collapsed")
+set_query_origin(active_page)
+
+
+# RENDER QUERIES (the active page's queries, dispatched together before it is drawn)
+
+# Ranked cards are fetched at the largest Top N and sliced per slider value, so the SQL (and its
+# cached result) depends only on the filters and dragging a slider never reaches the warehouse
+exec_specs = executive_dashboard_specs(TOP_N_MAX, get_comparison_dimension())
+deep_dive_specs = restaurant_deep_dive_specs(TOP_N_MAX)
+comm_specs = commission_correlation_specs()
+customer_range = (filter_meta.min_date, filter_meta.max_date) if filter_meta.min_date else None
+monthly_customer_dims = ["MONTH"] + ([get_comparison_dimension()] if get_comparison_dimension() else [])
+cube_cards = [c for c in oc.CARD_COLUMNS if not (customer_features_ready and c in customer_features.FEATURE_CARDS)]
+
+# Render jobs that call Cortex COMPLETE rather than run a warehouse query
+LLM_JOBS = {"summary"}
+
+render_jobs = {
+    "summary": (get_cortex_summary, PORTAL_SUMMARY_PROMPT),
+    # Tabs 5 and 6 share one scan, so it carries the columns of both pages' cube-backed cards
+    "cube": (load_order_cube, *base_where_joined(), tuple(oc.cube_columns(cube_cards, get_comparison_dimension()))),
+    "executive": (run_query, *compile_fused_query(exec_specs, *base_where_joined(), router=rollup_router)),
+    "deep_dive": (run_query, *compile_fused_query(deep_dive_specs, *base_where_joined(), router=rollup_router)),
+    "commission": (run_query, *compile_fused_query(comm_specs, router=rollup_router)),
+}
+if approx_customers:
+    # Distinct customers from the HLL sketches; in exact mode they come from the order cube
+    render_jobs["customers"] = (
+        run_query, *customer_sketches.customer_count_query(current_filters, data_range=customer_range)
+    )
+    render_jobs["monthly_customers"] = (
+        run_query, *customer_sketches.customer_count_query(
+            current_filters, monthly_customer_dims, data_range=customer_range, name="ACTIVE_CUSTOMERS"
+        ),
+    )
+if customer_features_ready:
+    # Per-customer sums over AGG_CUSTOMER_FEATURES instead of regrouping the order cube
+    render_jobs["customer_kpis"] = (
+        run_query, *customer_features.customer_kpis_query(current_filters, data_range=customer_range)
+    )
+    render_jobs["loyal_customers"] = (
+        run_query, *customer_features.loyal_customers_query(current_filters, TOP_N_MAX, data_range=customer_range)
+    )
+    render_jobs["top_customer"] = (
+        run_query, *customer_features.loyal_customers_query(current_filters, 1, data_range=customer_range)
+    )
+
+render_batch = new_query_batch()
+for name in PAGE_QUERIES[active_page]:
+    if name not in render_jobs:
+        continue
+    fn, *args = render_jobs[name]
+    render_batch.add(name, attributed(active_page, name, fn), *args)
+render_results = render_batch.run()
+
+cube = render_results.get("cube")
+if isinstance(cube, QueryFailure):
+    st.error(f"Order data failed to load. Error: {cube.cause}")
+    cube = oc.empty_order_cube()
+
+
+def sketched_customers(name):
+    """The `name` sketch result, or None when counts come from the cube (exact mode or a failed query)."""
+    result = render_results.get(name)
+    return None if result is None or isinstance(result, QueryFailure) else result
+
+
+def feature_result(name, fallback):
+    """The `name` customer-feature result; `fallback()` (from the cube) when the table is unavailable."""
+    result = render_results.get(name)
+    if result is None:
+        return fallback()
+    if isinstance(result, QueryFailure):
+        st.error(f"Customer metrics failed to load. Error: {result.cause}")
+        return pd.DataFrame()
+    return result
+
+
+APPROX_NOTE = f"HyperLogLog estimate, ±{1.96 * customer_sketches.STANDARD_ERROR:.1%} at 95%"
 
 
 
 # TAB 1: PORTAL SUMMARY (Cortex AI Driven)
 
-with tab1:
+if active_page == PAGES[0]:
     banner(
         "📰 Food Delivery Analytics Portal Summary",
         "A brief overview of the dashboard's objective and underlying data structure."
@@ -548,40 +899,12 @@ with tab1:
     st.markdown("### 🤖 Portal Overview (Generated by Cortex AI)")
     
    
-    cortex_prompt = """
-    You are an AI Analyst summarizing a Snowflake-based analytics portal for food delivery.
-    The portal is designed to analyze **Platform Profitability, Restaurant Performance, and Customer Loyalty**.
-
-    The underlying data structure includes the following main tables:
-    1. DIM_CUSTOMER: Customer demographics, join dates.
-    2. DIM_RESTAURANT: Restaurant details, cuisine type, ratings, and commission rates.
-    3. FACT_ORDERS: Order transactions, total GMV, Delivery Fees, Commission Revenue, Discount Amount, Net Profit.
-    4. FACT_ORDER_ITEMS: Links orders to specific menu items and quantities.
-
-    Provide a concise, engaging summary (max 200 words) of the portal's purpose and the key insights the user will gain from analyzing this data.
-    """
-    
-    @st.cache_data(ttl=3600) 
-    def get_cortex_summary(prompt):
-        """Fetches the dynamic summary text using Snowflake Cortex AI."""
-        
-        
-        safe_prompt = prompt.replace("'", "''")
-
-        cortex_query = f"""
-            SELECT SNOWFLAKE.CORTEX.COMPLETE('llama3-8b', '{safe_prompt}') AS SUMMARY;
-        """
-        try:
-            result_df = run_query(cortex_query)
-            if not result_df.empty and result_df.iloc[0]['SUMMARY']:
-                return result_df.iloc[0]['SUMMARY']
-            return "AI summary failed to load or returned empty content."
-        except Exception as e:
-          
-            st.error(f"Failed to fetch summary from Cortex AI. Error: {e}")
-            return None
-
-    summary_text = get_cortex_summary(cortex_prompt)
+    summary_result = render_results["summary"]
+    if isinstance(summary_result, QueryFailure):
+        st.error(f"Failed to fetch summary from Cortex AI. Error: {summary_result.cause}")
+        summary_text = None
+    else:
+        summary_text = summary_result
     
     if summary_text:
         
@@ -610,7 +933,7 @@ with tab1:
 
 #TAB 2: EXECUTIVE DASHBOARD (Aggregated View with Dynamic Multi-Line Chart)
 
-with tab2:
+if active_page == PAGES[1]:
     banner(
         "🚀 Executive Dashboard",
         "Operational insights and profitability overview powered by Snowflake"
@@ -624,32 +947,31 @@ with tab2:
     """, unsafe_allow_html=True)
     
   
-    top_n = st.slider("Select Top N records for charts:", 3, 20, 10, key="tab2_agg_top_n_final")
+    top_n = st.slider("Select Top N records for charts:", 3, TOP_N_MAX, key="tab2_agg_top_n_final")
 
 
    
-    where_clause = base_where_simple()
-    data_query = f"SELECT * FROM V_PLATFORM_PROFITABILITY {where_clause}"
-    df = run_query(data_query)
+    # KPIs, the monthly series and the top-N totals are aggregated server-side (rollup-backed
+    # where eligible) in one fused statement, so only chart-sized results are transferred
+    exec_result = render_results["executive"]
+    if isinstance(exec_result, QueryFailure):
+        st.error(f"Executive metrics failed to load. Error: {exec_result.cause}")
+        exec_result = pd.DataFrame(columns=["QUERY_NAME", "QUERY_RANK"] + fused_columns(exec_specs))
+    executive = split_fused_result(exec_result, exec_specs, top_n)
+    kpis = executive["EXEC_KPIS"]
     
-    if df.empty:
+    if kpis.empty or pd.isna(kpis.iloc[0]["TOTAL_ORDERS"]) or not kpis.iloc[0]["TOTAL_ORDERS"]:
         st.warning("No data found for selected filters.")
     else:
         
-        df.columns = [c.upper() for c in df.columns]
-        df["GMV"] = pd.to_numeric(df["GMV"], errors="coerce")
-        df["NET_PROFIT"] = pd.to_numeric(df["NET_PROFIT"], errors="coerce")
-        df["ORDER_TIMESTAMP"] = safe_to_datetime(df["ORDER_TIMESTAMP"])
-        df["MONTH"] = df["ORDER_TIMESTAMP"].dt.to_period("M").astype(str)
-        
         
         comparison_dim = get_comparison_dimension()
         bar_group_col = comparison_dim if comparison_dim else "CITY"
 
         
-        total_gmv = df["GMV"].sum()
-        total_orders = df["ORDER_ID"].nunique()
-        total_net_profit = df["NET_PROFIT"].sum()
+        total_gmv = float(kpis.iloc[0]["TOTAL_GMV"] or 0)
+        total_orders = int(kpis.iloc[0]["TOTAL_ORDERS"])
+        total_net_profit = float(kpis.iloc[0]["TOTAL_NET_PROFIT"] or 0)
         avg_order_value = total_gmv / total_orders if total_orders else 0
         profit_margin = (total_net_profit / total_gmv * 100) if total_gmv else 0
 
@@ -670,24 +992,26 @@ with tab2:
         
         start_card(f"📅 Monthly GMV Trend (Grouped by {comparison_dim.replace('_', ' ').title() if comparison_dim else 'Overall'})", "Tracks month-over-month revenue trajectory")
         
-        grouping_cols = ["MONTH"]
+        monthly_trend = executive["MONTHLY_GMV"].round(2)
         color_col = None
         
-        if comparison_dim and df[comparison_dim].nunique() > 1:
-            grouping_cols.append(comparison_dim)
+        if comparison_dim and monthly_trend[comparison_dim].nunique() > 1:
             color_col = comparison_dim
+        elif comparison_dim:
+            monthly_trend = monthly_trend.groupby("MONTH", as_index=False)["GMV"].sum()
         
-        monthly_trend = df.groupby(grouping_cols, as_index=False)["GMV"].sum().round(2)
-        
-        fig1 = px.line(monthly_trend, 
-                       x="MONTH", 
-                       y="GMV", 
-                       color=color_col, 
-                       markers=True, 
-                       template=plotly_template)
-
-        fig1.update_traces(line=dict(width=3))
-        fig1.update_layout(height=400, margin=dict(l=8, r=8, t=30, b=8), yaxis_tickformat='s')
+        def exec_trend_line_figure(monthly_trend):
+            fig1 = px.line(monthly_trend, 
+                           x="MONTH", 
+                           y="GMV", 
+                           color=color_col, 
+                           markers=True, 
+                           template=plotly_template)
+
+            fig1.update_traces(line=dict(width=3))
+            fig1.update_layout(height=400, margin=dict(l=8, r=8, t=30, b=8), yaxis_tickformat='s')
+            return fig1
+        fig1 = cached_figure("exec_trend_line", monthly_trend, exec_trend_line_figure, color=color_col)
         
       
         st.plotly_chart(fig1, use_container_width=True, key="exec_trend_line") 
@@ -700,17 +1024,14 @@ with tab2:
        
         start_card(f"🏙️ Top {top_n} Order Share by {bar_group_col.replace('_', ' ').title()}", "Distribution of order volume across segments")
         
-        order_share = (
-            df.groupby(bar_group_col, as_index=False)["ORDER_ID"]
-            .nunique()
-            .rename(columns={"ORDER_ID": "ORDERS"})
-            .sort_values("ORDERS", ascending=False)
-            .head(top_n) 
-        )
+        order_share = executive["ORDER_SHARE"]
         
         if not order_share.empty:
-            fig2 = px.pie(order_share, names=bar_group_col, values="ORDERS", hole=0.45, template=plotly_template)
-            fig2.update_layout(height=400, margin=dict(l=8, r=8, t=30, b=8))
+            def exec_order_pie_figure(order_share):
+                fig2 = px.pie(order_share, names=bar_group_col, values="ORDERS", hole=0.45, template=plotly_template)
+                fig2.update_layout(height=400, margin=dict(l=8, r=8, t=30, b=8))
+                return fig2
+            fig2 = cached_figure("exec_order_pie", order_share, exec_order_pie_figure)
            
             st.plotly_chart(fig2, use_container_width=True, key="exec_order_pie") 
           
@@ -723,21 +1044,19 @@ with tab2:
         
         start_card(f"💰 Top {top_n} {bar_group_col.replace('_', ' ').title()} by GMV", "Where sales value is concentrated")
         
-        group_gmv = (
-            df.groupby(bar_group_col, as_index=False)["GMV"]
-            .sum()
-            .sort_values("GMV", ascending=False)
-            .head(top_n) 
-        )
+        group_gmv = executive["GROUP_GMV"]
         
         if not group_gmv.empty:
-            fig_gmv = px.bar(group_gmv, 
-                             x=bar_group_col, 
-                             y="GMV", 
-                             text=group_gmv["GMV"].apply(fmt_money),
-                             template=plotly_template)
-            fig_gmv.update_traces(textposition='outside')
-            fig_gmv.update_layout(height=400, margin=dict(l=8, r=8, t=8, b=8), yaxis_tickformat='s')
+            def exec_gmv_bar_figure(group_gmv):
+                fig_gmv = px.bar(group_gmv, 
+                                 x=bar_group_col, 
+                                 y="GMV", 
+                                 text=fmt_money(group_gmv["GMV"]),
+                                 template=plotly_template)
+                fig_gmv.update_traces(textposition='outside')
+                fig_gmv.update_layout(height=400, margin=dict(l=8, r=8, t=8, b=8), yaxis_tickformat='s')
+                return fig_gmv
+            fig_gmv = cached_figure("exec_gmv_bar", group_gmv, exec_gmv_bar_figure)
            
             st.plotly_chart(fig_gmv, use_container_width=True, key="exec_gmv_bar")
            
@@ -750,21 +1069,19 @@ with tab2:
         
         start_card(f"💹 Top {top_n} {bar_group_col.replace('_', ' ').title()} by Net Profit", "Ranking segments based on total net profit")
         
-        group_profit = (
-            df.groupby(bar_group_col, as_index=False)["NET_PROFIT"]
-            .sum()
-            .sort_values("NET_PROFIT", ascending=False)
-            .head(top_n) 
-        )
+        group_profit = executive["GROUP_PROFIT"]
         
         if not group_profit.empty:
-            fig_profit = px.bar(group_profit, 
-                             x=bar_group_col, 
-                             y="NET_PROFIT", 
-                             text=group_profit["NET_PROFIT"].apply(fmt_money),
-                             template=plotly_template)
-            fig_profit.update_traces(textposition='outside')
-            fig_profit.update_layout(height=400, margin=dict(l=8, r=8, t=8, b=8), yaxis_tickformat='s')
+            def exec_profit_bar_figure(group_profit):
+                fig_profit = px.bar(group_profit, 
+                                 x=bar_group_col, 
+                                 y="NET_PROFIT", 
+                                 text=fmt_money(group_profit["NET_PROFIT"]),
+                                 template=plotly_template)
+                fig_profit.update_traces(textposition='outside')
+                fig_profit.update_layout(height=400, margin=dict(l=8, r=8, t=8, b=8), yaxis_tickformat='s')
+                return fig_profit
+            fig_profit = cached_figure("exec_profit_bar", group_profit, exec_profit_bar_figure)
             
             st.plotly_chart(fig_profit, use_container_width=True, key="exec_profit_bar")
           
@@ -774,7 +1091,7 @@ with tab2:
 
 #TAB 3
         
-with tab3:
+if active_page == PAGES[2]:
     banner("🍽️ Restaurant Deep Dive", "Profitability, ratings, cuisine performance, and commission dynamics")
 
     
@@ -786,52 +1103,39 @@ with tab3:
     
 
    
-    top_n = st.slider("Select Top N records for Top Lists:", 3, 20, 10, key="tab3_list_n_agg")
+    top_n = st.slider("Select Top N records for Top Lists:", 3, TOP_N_MAX, key="tab3_list_n_agg")
 
    
-    where_clause = base_where_joined()
+    # All Tab 3 cards are fused into one statement (one warehouse round-trip) and split per card;
+    # the lists were fetched at TOP_N_MAX and are cut to this slider's value here
+    deep_dive_result = render_results["deep_dive"]
+    if isinstance(deep_dive_result, QueryFailure):
+        st.error(f"Restaurant metrics failed to load. Error: {deep_dive_result.cause}")
+        deep_dive_result = pd.DataFrame(columns=["QUERY_NAME", "QUERY_RANK"] + fused_columns(deep_dive_specs))
+    deep_dive = split_fused_result(deep_dive_result, deep_dive_specs, top_n)
     
    
     #RATING OVERVIEW (Aggregated KPIs)
   
     st.markdown('<h2 class="section-title">Ratings Overview</h2>', unsafe_allow_html=True)
 
-    rating_kpi_query = f"""
-        SELECT 
-            ROUND(AVG(O.ORDER_RATING), 2) AS AVG_RATING,
-            MAX(O.ORDER_RATING) AS MAX_RATING,
-            MIN(O.ORDER_RATING) AS MIN_RATING
-        FROM FACT_ORDERS O
-        JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID
-        {where_clause} AND O.ORDER_RATING IS NOT NULL;
-    """
-    rating_kpi_df = run_query(rating_kpi_query)
+    rating_kpi_df = deep_dive["RATING_KPIS"]
     
    
-    avg_rating = float(rating_kpi_df.iloc[0]["AVG_RATING"]) if not rating_kpi_df.empty and rating_kpi_df.iloc[0]["AVG_RATING"] is not None else 0
+    avg_rating = float(rating_kpi_df.iloc[0]["AVG_RATING"]) if not rating_kpi_df.empty and pd.notna(rating_kpi_df.iloc[0]["AVG_RATING"]) else 0
     
     
-    highest_rest_df = run_query(f"""
-        SELECT R.RESTAURANT_NAME, ROUND(AVG(O.ORDER_RATING),2) AS AVG_RATING
-        FROM FACT_ORDERS O JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID
-        {where_clause} AND O.ORDER_RATING IS NOT NULL
-        GROUP BY R.RESTAURANT_NAME ORDER BY AVG_RATING DESC LIMIT 1;
-    """)
-    lowest_rest_df = run_query(f"""
-        SELECT R.RESTAURANT_NAME, ROUND(AVG(O.ORDER_RATING),2) AS AVG_RATING
-        FROM FACT_ORDERS O JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID
-        {where_clause} AND O.ORDER_RATING IS NOT NULL
-        GROUP BY R.RESTAURANT_NAME ORDER BY AVG_RATING ASC LIMIT 1;
-    """)
+    highest_rest_df = deep_dive["HIGHEST_RATED"]
+    lowest_rest_df = deep_dive["LOWEST_RATED"]
     highest_name = highest_rest_df.iloc[0]["RESTAURANT_NAME"] if not highest_rest_df.empty else "N/A"
     highest_rating_val = highest_rest_df.iloc[0]["AVG_RATING"] if not highest_rest_df.empty else 0
     lowest_name = lowest_rest_df.iloc[0]["RESTAURANT_NAME"] if not lowest_rest_df.empty else "N/A"
     lowest_rating_val = lowest_rest_df.iloc[0]["AVG_RATING"] if not lowest_rest_df.empty else 0
 
     c1, c2, c3 = st.columns(3)
-    with c1: kpi_tile("⭐ Avg Platform Rating", f"{avg_rating:.2f}", "Mean order rating")
-    with c2: kpi_tile("🔥 Highest Rated", f"{highest_name} ({highest_rating_val:.2f})", "Top average rating")
-    with c3: kpi_tile("❄️ Lowest Rated", f"{lowest_name} ({lowest_rating_val:.2f})", "Lowest average rating")
+    with c1: kpi_tile("⭐ Avg Platform Rating", fmt_rating(avg_rating), "Mean order rating")
+    with c2: kpi_tile("🔥 Highest Rated", f"{highest_name} ({fmt_rating(highest_rating_val)})", "Top average rating")
+    with c3: kpi_tile("❄️ Lowest Rated", f"{lowest_name} ({fmt_rating(lowest_rating_val)})", "Lowest average rating")
     
     st.markdown("---")
 
@@ -839,23 +1143,16 @@ with tab3:
     # 2. TOP RESTAURANTS BY PROFIT (Uses Top N)
 
     start_card(f"💰 Top {top_n} Restaurants by Profit", "Which restaurants contribute the most profit")
-    top_profit_df = run_query(f"""
-        SELECT R.RESTAURANT_NAME,
-                SUM((O.DELIVERY_FEE + O.COMMISSION_REVENUE) -
-                    (O.DISCOUNT_AMOUNT + O.PAYMENT_PROCESSING_FEE)) AS TOTAL_PROFIT
-        FROM FACT_ORDERS O
-        JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID
-        {where_clause}
-        GROUP BY R.RESTAURANT_NAME
-        ORDER BY TOTAL_PROFIT DESC
-        LIMIT {top_n};
-    """)
+    top_profit_df = deep_dive["TOP_PROFIT"]
     if not top_profit_df.empty:
-        fig_profit = px.bar(top_profit_df, x="RESTAURANT_NAME", y="TOTAL_PROFIT", 
-                           text=top_profit_df["TOTAL_PROFIT"].apply(fmt_money), 
-                           template=plotly_template)
-        fig_profit.update_traces(textposition='outside')
-        fig_profit.update_layout(height=400, margin=dict(l=8, r=8, t=8, b=8), yaxis_tickformat='s')
+        def deep_profit_bar_figure(top_profit_df):
+            fig_profit = px.bar(top_profit_df, x="RESTAURANT_NAME", y="TOTAL_PROFIT", 
+                               text=fmt_money(top_profit_df["TOTAL_PROFIT"]), 
+                               template=plotly_template)
+            fig_profit.update_traces(textposition='outside')
+            fig_profit.update_layout(height=400, margin=dict(l=8, r=8, t=8, b=8), yaxis_tickformat='s')
+            return fig_profit
+        fig_profit = cached_figure("deep_profit_bar", top_profit_df, deep_profit_bar_figure)
         st.plotly_chart(fig_profit, use_container_width=True)
     else:
         st.info("No profit data found for restaurants.")
@@ -865,22 +1162,16 @@ with tab3:
     # 3. TOP RESTAURANTS BY GMV (Uses Top N)
   
     start_card(f"💸 Top {top_n} Restaurants by GMV", "Restaurants driving the highest gross sales value")
-    top_gmv_df = run_query(f"""
-        SELECT R.RESTAURANT_NAME,
-                SUM(O.TOTAL_AMOUNT) AS TOTAL_GMV
-        FROM FACT_ORDERS O
-        JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID
-        {where_clause}
-        GROUP BY R.RESTAURANT_NAME
-        ORDER BY TOTAL_GMV DESC
-        LIMIT {top_n};
-    """)
+    top_gmv_df = deep_dive["TOP_GMV"]
     if not top_gmv_df.empty:
-        fig_gmv = px.bar(top_gmv_df, x="RESTAURANT_NAME", y="TOTAL_GMV", 
-                         text=top_gmv_df["TOTAL_GMV"].apply(fmt_money), 
-                         template=plotly_template)
-        fig_gmv.update_traces(textposition='outside')
-        fig_gmv.update_layout(height=400, margin=dict(l=8, r=8, t=8, b=8), yaxis_tickformat='s')
+        def deep_gmv_bar_figure(top_gmv_df):
+            fig_gmv = px.bar(top_gmv_df, x="RESTAURANT_NAME", y="TOTAL_GMV", 
+                             text=fmt_money(top_gmv_df["TOTAL_GMV"]), 
+                             template=plotly_template)
+            fig_gmv.update_traces(textposition='outside')
+            fig_gmv.update_layout(height=400, margin=dict(l=8, r=8, t=8, b=8), yaxis_tickformat='s')
+            return fig_gmv
+        fig_gmv = cached_figure("deep_gmv_bar", top_gmv_df, deep_gmv_bar_figure)
         st.plotly_chart(fig_gmv, use_container_width=True)
     else:
         st.info("No GMV data found for restaurants.")
@@ -891,23 +1182,16 @@ with tab3:
     
     
     start_card(f"🍛 Top {top_n} Cuisine Performance by Net Profit", "Which cuisines drive profitability")
-    cuisine_profit_df = run_query(f"""
-        SELECT R.CUISINE_TYPE,
-                SUM((O.DELIVERY_FEE + O.COMMISSION_REVENUE) -
-                    (O.DISCOUNT_AMOUNT + O.PAYMENT_PROCESSING_FEE)) AS TOTAL_NET_PROFIT
-        FROM FACT_ORDERS O
-        JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID
-        {where_clause}
-        GROUP BY R.CUISINE_TYPE
-        ORDER BY TOTAL_NET_PROFIT DESC
-        LIMIT {top_n};
-    """)
+    cuisine_profit_df = deep_dive["CUISINE_PROFIT"]
     if not cuisine_profit_df.empty:
-        fig = px.bar(cuisine_profit_df, x="CUISINE_TYPE", y="TOTAL_NET_PROFIT", 
-                     text=cuisine_profit_df["TOTAL_NET_PROFIT"].apply(fmt_money), 
-                     template=plotly_template)
-        fig.update_traces(textposition='outside')
-        fig.update_layout(height=360, margin=dict(l=8, r=8, t=8, b=8), yaxis_tickformat='s')
+        def deep_cuisine_profit_bar_figure(cuisine_profit_df):
+            fig = px.bar(cuisine_profit_df, x="CUISINE_TYPE", y="TOTAL_NET_PROFIT", 
+                         text=fmt_money(cuisine_profit_df["TOTAL_NET_PROFIT"]), 
+                         template=plotly_template)
+            fig.update_traces(textposition='outside')
+            fig.update_layout(height=360, margin=dict(l=8, r=8, t=8, b=8), yaxis_tickformat='s')
+            return fig
+        fig = cached_figure("deep_cuisine_profit_bar", cuisine_profit_df, deep_cuisine_profit_bar_figure)
         st.plotly_chart(fig, use_container_width=True)
     else:
         st.info("No cuisine profit data found.")
@@ -918,21 +1202,16 @@ with tab3:
    
     
     start_card(f"🍱 Top {top_n} Cuisine Comparison by GMV", "Top cuisines by total GMV")
-    cuisine_gmv_df = run_query(f"""
-        SELECT R.CUISINE_TYPE, SUM(O.TOTAL_AMOUNT) AS TOTAL_GMV
-        FROM FACT_ORDERS O
-        JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID
-        {where_clause}
-        GROUP BY R.CUISINE_TYPE
-        ORDER BY TOTAL_GMV DESC
-        LIMIT {top_n};
-    """)
+    cuisine_gmv_df = deep_dive["CUISINE_GMV"]
     if not cuisine_gmv_df.empty:
-        fig = px.bar(cuisine_gmv_df, x="CUISINE_TYPE", y="TOTAL_GMV", 
-                     text=cuisine_gmv_df["TOTAL_GMV"].apply(fmt_money), 
-                     template=plotly_template)
-        fig.update_traces(textposition='outside')
-        fig.update_layout(height=360, margin=dict(l=8, r=8, t=8, b=8), yaxis_tickformat='s')
+        def deep_cuisine_gmv_bar_figure(cuisine_gmv_df):
+            fig = px.bar(cuisine_gmv_df, x="CUISINE_TYPE", y="TOTAL_GMV", 
+                         text=fmt_money(cuisine_gmv_df["TOTAL_GMV"]), 
+                         template=plotly_template)
+            fig.update_traces(textposition='outside')
+            fig.update_layout(height=360, margin=dict(l=8, r=8, t=8, b=8), yaxis_tickformat='s')
+            return fig
+        fig = cached_figure("deep_cuisine_gmv_bar", cuisine_gmv_df, deep_cuisine_gmv_bar_figure)
         st.plotly_chart(fig, use_container_width=True)
     else:
         st.info("No cuisine GMV data found.")
@@ -942,22 +1221,16 @@ with tab3:
     # 6. TOP N HIGH VALUE CUSTOMERS BY GMV (Uses Top N)
    
     start_card(f"👑 Top {top_n} High Value Customers by GMV", "Who are your biggest spenders")
-    customer_df = run_query(f"""
-        SELECT C.CUSTOMER_NAME, SUM(O.TOTAL_AMOUNT) AS TOTAL_GMV
-        FROM FACT_ORDERS O
-        JOIN DIM_CUSTOMER C ON O.CUSTOMER_ID = C.CUSTOMER_ID
-        JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID
-        {where_clause}
-        GROUP BY C.CUSTOMER_NAME
-        ORDER BY TOTAL_GMV DESC
-        LIMIT {top_n};
-    """)
+    customer_df = deep_dive["TOP_CUSTOMERS"]
     if not customer_df.empty:
-        fig_cust = px.bar(customer_df, x="CUSTOMER_NAME", y="TOTAL_GMV", 
-                          text=customer_df["TOTAL_GMV"].apply(fmt_money), 
-                          template=plotly_template)
-        fig_cust.update_traces(textposition='outside')
-        fig_cust.update_layout(height=400, margin=dict(l=8, r=8, t=8, b=8), yaxis_tickformat='s')
+        def deep_customer_bar_figure(customer_df):
+            fig_cust = px.bar(customer_df, x="CUSTOMER_NAME", y="TOTAL_GMV", 
+                              text=fmt_money(customer_df["TOTAL_GMV"]), 
+                              template=plotly_template)
+            fig_cust.update_traces(textposition='outside')
+            fig_cust.update_layout(height=400, margin=dict(l=8, r=8, t=8, b=8), yaxis_tickformat='s')
+            return fig_cust
+        fig_cust = cached_figure("deep_customer_bar", customer_df, deep_customer_bar_figure)
         st.plotly_chart(fig_cust, use_container_width=True)
     else:
         st.info("No customer GMV data found.")
@@ -967,31 +1240,24 @@ with tab3:
     # 7. COMMISSION RATE VS PROFITABILITY (Scatter Plot)
   
     start_card("⚖️ Commission Rate vs Profitability (r)", "Do higher commission rates drive more profit?")
-    comm_df = run_query(f"""
-        SELECT R.COMMISSION_RATE,
-                SUM((O.DELIVERY_FEE + O.COMMISSION_REVENUE) - 
-                    (O.DISCOUNT_AMOUNT + O.PAYMENT_PROCESSING_FEE)) AS TOTAL_NET_PROFIT
-        FROM FACT_ORDERS O 
-        JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID
-        {where_clause} AND R.COMMISSION_RATE IS NOT NULL
-        GROUP BY R.COMMISSION_RATE
-        HAVING COUNT(O.ORDER_ID) > 10;
-    """)
+    comm_df = deep_dive["COMMISSION_PROFIT"]
     comm_correlation = None
     if not comm_df.empty:
-        comm_df["COMMISSION_RATE"] = pd.to_numeric(comm_df["COMMISSION_RATE"], errors="coerce").fillna(0)
-        comm_df["TOTAL_NET_PROFIT"] = pd.to_numeric(comm_df["TOTAL_NET_PROFIT"], errors="coerce").fillna(0)
+        comm_df[["COMMISSION_RATE", "TOTAL_NET_PROFIT"]] = comm_df[["COMMISSION_RATE", "TOTAL_NET_PROFIT"]].fillna(0)
         corr = comm_df["COMMISSION_RATE"].corr(comm_df["TOTAL_NET_PROFIT"])
         comm_correlation = round(corr, 2)
         
       
-        fig_comm = px.scatter(comm_df, x="COMMISSION_RATE", y="TOTAL_NET_PROFIT", color="TOTAL_NET_PROFIT",
-                                 color_continuous_scale='Viridis',
-                                 size_max=15, height=380, template=plotly_template)
-        fig_comm.update_layout(xaxis_title="Commission Rate", yaxis_title="Total Net Profit (₹)",
-                               margin=dict(l=8, r=8, t=8, b=8))
-        fig_comm.update_xaxes(tickformat=".2%")
-        fig_comm.update_yaxes(tickformat='s')
+        def deep_commission_scatter_figure(comm_df):
+            fig_comm = px.scatter(comm_df, x="COMMISSION_RATE", y="TOTAL_NET_PROFIT", color="TOTAL_NET_PROFIT",
+                                     color_continuous_scale='Viridis',
+                                     size_max=15, height=380, template=plotly_template)
+            fig_comm.update_layout(xaxis_title="Commission Rate", yaxis_title="Total Net Profit (₹)",
+                                   margin=dict(l=8, r=8, t=8, b=8))
+            fig_comm.update_xaxes(tickformat=".2%")
+            fig_comm.update_yaxes(tickformat='s')
+            return fig_comm
+        fig_comm = cached_figure("deep_commission_scatter", comm_df, deep_commission_scatter_figure)
         st.plotly_chart(fig_comm, use_container_width=True)
         
         direction = "positive" if corr > 0.15 else "negative" if corr < -0.15 else "weak/no clear"
@@ -1004,22 +1270,17 @@ with tab3:
     # 8. COMMISSION COMPARISON PER CUISINE TYPE (Uses Top N)
    
     start_card(f"📊 Top {top_n} Avg Commission by Cuisine Type", "Average commission rate across cuisines")
-    comm_cuisine_df = run_query(f"""
-        SELECT R.CUISINE_TYPE, ROUND(AVG(R.COMMISSION_RATE), 3) AS AVG_COMMISSION
-        FROM DIM_RESTAURANT R
-        JOIN FACT_ORDERS O ON O.RESTAURANT_ID = R.RESTAURANT_ID
-        {where_clause}
-        GROUP BY R.CUISINE_TYPE
-        ORDER BY AVG_COMMISSION DESC
-        LIMIT {top_n};
-    """)
+    comm_cuisine_df = deep_dive["COMMISSION_BY_CUISINE"]
     if not comm_cuisine_df.empty:
-        fig_cc = px.bar(comm_cuisine_df, x="CUISINE_TYPE", y="AVG_COMMISSION", 
-                         text=comm_cuisine_df["AVG_COMMISSION"].apply(lambda x: f"{float(x):.2%}"),
-                         template=plotly_template)
-        fig_cc.update_traces(textposition='outside')
-        fig_cc.update_layout(height=360, margin=dict(l=8, r=8, t=8, b=8))
-        fig_cc.update_yaxes(tickformat=".2%")
+        def deep_commission_cuisine_bar_figure(comm_cuisine_df):
+            fig_cc = px.bar(comm_cuisine_df, x="CUISINE_TYPE", y="AVG_COMMISSION", 
+                             text=fmt_percent(comm_cuisine_df["AVG_COMMISSION"]),
+                             template=plotly_template)
+            fig_cc.update_traces(textposition='outside')
+            fig_cc.update_layout(height=360, margin=dict(l=8, r=8, t=8, b=8))
+            fig_cc.update_yaxes(tickformat=".2%")
+            return fig_cc
+        fig_cc = cached_figure("deep_commission_cuisine_bar", comm_cuisine_df, deep_commission_cuisine_bar_figure)
         st.plotly_chart(fig_cc, use_container_width=True)
     else:
         st.info("No commission per cuisine data found.")
@@ -1030,24 +1291,16 @@ with tab3:
     # 9. TOP N MENU CATEGORIES BY REVENUE (Uses Top N)
    
     start_card(f"📦 Top {top_n} Menu Categories by Revenue", "Most revenue-generating food categories")
-    cat_df = run_query(f"""
-        SELECT M.CATEGORY,
-                SUM(I.ITEM_PRICE_AT_ORDER * I.QUANTITY) AS TOTAL_REVENUE
-        FROM FACT_ORDER_ITEMS I
-        JOIN DIM_MENU_ITEM M ON I.MENU_ITEM_ID = M.MENU_ITEM_ID
-        JOIN FACT_ORDERS O ON I.ORDER_ID = O.ORDER_ID
-        JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID
-        {where_clause}
-        GROUP BY M.CATEGORY
-        ORDER BY TOTAL_REVENUE DESC
-        LIMIT {top_n};
-    """)
+    cat_df = deep_dive["MENU_CATEGORIES"]
     if not cat_df.empty:
-        fig_cat = px.bar(cat_df, x="CATEGORY", y="TOTAL_REVENUE", 
-                         text=cat_df["TOTAL_REVENUE"].apply(fmt_money),
-                         template=plotly_template)
-        fig_cat.update_traces(textposition='outside')
-        fig_cat.update_layout(height=360, margin=dict(l=8, r=8, t=8, b=8), yaxis_tickformat='s')
+        def deep_category_bar_figure(cat_df):
+            fig_cat = px.bar(cat_df, x="CATEGORY", y="TOTAL_REVENUE", 
+                             text=fmt_money(cat_df["TOTAL_REVENUE"]),
+                             template=plotly_template)
+            fig_cat.update_traces(textposition='outside')
+            fig_cat.update_layout(height=360, margin=dict(l=8, r=8, t=8, b=8), yaxis_tickformat='s')
+            return fig_cat
+        fig_cat = cached_figure("deep_category_bar", cat_df, deep_category_bar_figure)
         st.plotly_chart(fig_cat, use_container_width=True)
     else:
         st.info("No category revenue data found.")
@@ -1057,24 +1310,20 @@ with tab3:
     # 10. RATING VS ORDER VOLUME (Scatter Plot)
     
     start_card("⭐ Restaurant Rating vs Order Volume (r)", "Do higher ratings correlate with more orders?")
-    rating_volume_df = run_query(f"""
-        SELECT R.RESTAURANT_NAME, R.AVERAGE_RATING, COUNT(O.ORDER_ID) AS ORDER_VOLUME
-        FROM FACT_ORDERS O
-        JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID
-        {where_clause}
-        GROUP BY R.RESTAURANT_NAME, R.AVERAGE_RATING
-        HAVING COUNT(O.ORDER_ID) > 3;
-    """)
+    rating_volume_df = deep_dive["RATING_VOLUME"]
     rating_corr = None
     if not rating_volume_df.empty:
         
-        fig_rv = px.scatter(rating_volume_df, x="AVERAGE_RATING", y="ORDER_VOLUME", color="AVERAGE_RATING",
-                                 size="ORDER_VOLUME", color_continuous_scale="Viridis", 
-                                 height=380, template=plotly_template)
-        fig_rv.update_layout(xaxis_title="Average Rating (0.00)", yaxis_title="Order Volume",
-                             margin=dict(l=8, r=8, t=8, b=8))
-        fig_rv.update_xaxes(tickformat=".2f")
-        fig_rv.update_yaxes(tickformat='s')
+        def deep_rating_volume_scatter_figure(rating_volume_df):
+            fig_rv = px.scatter(rating_volume_df, x="AVERAGE_RATING", y="ORDER_VOLUME", color="AVERAGE_RATING",
+                                     size="ORDER_VOLUME", color_continuous_scale="Viridis", 
+                                     height=380, template=plotly_template)
+            fig_rv.update_layout(xaxis_title="Average Rating (0.00)", yaxis_title="Order Volume",
+                                 margin=dict(l=8, r=8, t=8, b=8))
+            fig_rv.update_xaxes(tickformat=".2f")
+            fig_rv.update_yaxes(tickformat='s')
+            return fig_rv
+        fig_rv = cached_figure("deep_rating_volume_scatter", rating_volume_df, deep_rating_volume_scatter_figure)
         st.plotly_chart(fig_rv, use_container_width=True)
         
         corr = rating_volume_df["AVERAGE_RATING"].corr(rating_volume_df["ORDER_VOLUME"])
@@ -1090,7 +1339,7 @@ with tab3:
 
 #TAB 4: CORTEX AI EXECUTIVE Q&A
 
-with tab4:
+if active_page == PAGES[3]:
     banner("🤖 Cortex AI Executive Q&A", 
            "Ask your business question — Cortex AI generates SQL, executes it live, visualizes results, and summarizes insights.")
 
@@ -1134,31 +1383,15 @@ with tab4:
             with st.spinner("Analyzing your question using Snowflake Cortex AI..."):
                 try:
         
-                    # STEP 1 — Schema Context
-                   
-                    schema_context = """
-Table: V_PLATFORM_PROFITABILITY
-Columns: ORDER_ID, ORDER_TIMESTAMP, CUSTOMER_ID, CUSTOMER_NAME, RESTAURANT_ID, RESTAURANT_NAME,
-CITY, CUISINE_TYPE, GMV, DELIVERY_FEE, COMMISSION_REVENUE, DISCOUNT_AMOUNT,
-PAYMENT_PROCESSING_FEE, NET_PROFIT, ORDER_RATING
-
-Table: DIM_RESTAURANT
-Columns: RESTAURANT_ID, RESTAURANT_NAME, CITY, CUISINE_TYPE, AVERAGE_RATING, COMMISSION_RATE
-
-Table: DIM_CUSTOMER
-Columns: CUSTOMER_ID, CUSTOMER_NAME, CITY, JOIN_DATE, EMAIL, PHONE
-
-Table: FACT_ORDERS
-Columns: ORDER_ID, CUSTOMER_ID, RESTAURANT_ID, COUPON_ID, ORDER_TIMESTAMP, DELIVERY_FEE, SUB_TOTAL_AMOUNT,
-DISCOUNT_AMOUNT, COMMISSION_REVENUE, PAYMENT_PROCESSING_FEE, TOTAL_AMOUNT, ORDER_RATING
-"""
+                    # STEP 1 — Schema Context (CORTEX_SCHEMA_CONTEXT)
 
-                    where_clause = base_where_simple() 
+                    # Values inlined for the prompt only; nothing here is executed
+                    where_clause = current_filters.literal_where(VIEW_COLUMNS)
                     sql_prompt = f"""
 You are a Snowflake SQL expert analyzing a food delivery analytics dataset.
 
 Schema context:
-{schema_context}
+{CORTEX_SCHEMA_CONTEXT}
 
 Current dashboard filters: {where_clause or 'No filters applied'}
 
@@ -1174,113 +1407,176 @@ Guidelines:
                     """
 
                     
-                    #Generate SQL with Cortex & Clean
+                    # Common metric-by-dimension questions compile from vetted templates (no LLM call)
+                    ai_params = ()
+                    templated = template_query(
+                        question, get_entity_canonicalizer(current_data_version()), current_filters.predicates(VIEW_COLUMNS)
+                    )
+
+                    # Otherwise reuse SQL already validated for a near-identical question (same entities and filters)
+                    question_context = f"{CORTEX_SCHEMA_VERSION}|{where_clause}"
+                    question_index = get_question_index(current_data_version())
+                    reused = None if templated else question_index.lookup(question, question_context)
+
+                    if templated:
+                        st.info("⚡ Answered from a vetted query template (no Cortex call needed).")
+                        ai_generated_sql, ai_params = templated
+                    elif reused:
+                        st.info(f"♻️ Reusing validated SQL from a similar question: \"{reused.question}\" (similarity {reused.score:.2f})")
+                        ai_generated_sql = reused.sql
+                    else:
+                        #Generate SQL with Cortex & Clean
                    
-                    st.info("🧠 Generating SQL query using Cortex...")
-                    cortex_sql = f"""
-                    SELECT SNOWFLAKE.CORTEX.COMPLETE('llama3-8b', $${sql_prompt}$$) AS GENERATED_SQL;
-                    """
-                    sql_result = run_query(cortex_sql)
-                    raw_sql = sql_result["GENERATED_SQL"].iloc[0].strip()
+                        st.info("🧠 Generating SQL query using Cortex...")
+                        raw_sql = (cortex_complete(sql_prompt) or "").strip()
                     
                    
-                    if raw_sql.upper().startswith("OUT-OF-SCOPE"):
-                        st.warning("⚠️ **This question is outside the scope of the current dataset.** The AI confirmed this is not traceable with the available data (e.g., driver details, GPS, or complex unmodeled metrics).")
-                        st.stop()
+                        if raw_sql.upper().startswith("OUT-OF-SCOPE"):
+                            st.warning("⚠️ **This question is outside the scope of the current dataset.** The AI confirmed this is not traceable with the available data (e.g., driver details, GPS, or complex unmodeled metrics).")
+                            st.stop()
                     
                     
-                    import re
-                    clean_sql = re.sub(r"```sql|```", "", raw_sql, flags=re.IGNORECASE)
-                    clean_sql = clean_sql.replace("V_PLATFORM_FILTERED", "V_PLATFORM_PROFITABILITY")
+                        import re
+                        clean_sql = re.sub(r"```sql|```", "", raw_sql, flags=re.IGNORECASE)
+                        clean_sql = clean_sql.replace("V_PLATFORM_FILTERED", "V_PLATFORM_PROFITABILITY")
                     
-                    match = re.search(r"(?is)^(?:.*?)(SELECT|WITH|SHOW|CALL)\b.*", clean_sql, re.IGNORECASE | re.DOTALL)
+                        match = re.search(r"(?is)^(?:.*?)(SELECT|WITH|SHOW|CALL)\b.*", clean_sql, re.IGNORECASE | re.DOTALL)
                     
-                    if match:
-                        ai_generated_sql = match.group(0).strip()
-                        last_semicolon = ai_generated_sql.rfind(';')
-                        if last_semicolon != -1:
-                            ai_generated_sql = ai_generated_sql[:last_semicolon + 1]
-                        ai_generated_sql = re.sub(r"\s+", " ", ai_generated_sql).strip()
-                    else:
-                        st.error("❌ **SQL Generation Failed:** Cortex did not return a recognizable SQL query (SELECT/WITH/SHOW/CALL).")
-                        st.code(raw_sql, language="text")
-                        st.stop()
+                        if match:
+                            ai_generated_sql = match.group(0).strip()
+                            last_semicolon = ai_generated_sql.rfind(';')
+                            if last_semicolon != -1:
+                                ai_generated_sql = ai_generated_sql[:last_semicolon + 1]
+                            ai_generated_sql = re.sub(r"\s+", " ", ai_generated_sql).strip()
+                        else:
+                            st.error("❌ **SQL Generation Failed:** Cortex did not return a recognizable SQL query (SELECT/WITH/SHOW/CALL).")
+                            st.code(raw_sql, language="text")
+                            st.stop()
                         
-                    st.markdown("### 🧩 Generated SQL (post-validation)")
-                    st.code(ai_generated_sql, language="sql")
+                    # Result is rendered below from session state, so paging and export survive reruns
+                    st.session_state["ai_result"] = {
+                        "sql": ai_generated_sql,
+                        "params": tuple(ai_params),
+                        "question": question,
+                        # Cortex SQL is remembered in the question index once it returns rows
+                        "remember": None if (templated or reused) else question_context,
+                    }
+                    st.session_state["ai_page"] = 1
 
-                  
-                    # STEP 4 — Execute SQL
-                   
-                    st.info("🧾 Executing generated SQL on Snowflake...")
-                    
-                    try:
-                        result_df = run_query(ai_generated_sql)
-                        st.success("✅ Query executed successfully.")
-                    except Exception as e:
-                      
-                        st.error(f"❌ **SQL Execution Error:** The generated query caused an error in Snowflake. Please review the SQL above.\n\nError Details:\n{e}")
-                        st.stop()
-
-                    if result_df.empty:
-                        st.warning("⚠️ Query executed successfully, but **No data returned** for this query. Try widening your date range or adjusting the filters.")
-                        
-                        st.stop()
+                except Exception as top_level_err:
+                    st.error(f"An unexpected error occurred during Cortex analysis: {top_level_err}")
 
-                    st.dataframe(result_df, use_container_width=True)
 
-                   
-                    #Auto Visualization
-                  
-                    st.markdown("### 📊 Visual Insight")
+    # STEP 4 — Execute SQL (one page at a time with a total count; full results only spill to Parquet)
 
-                    chart_displayed = False
-                    
-                    cols = [c.upper() for c in result_df.columns]
-                    result_df.columns = [c.upper() for c in result_df.columns] 
+    ai_result = st.session_state.get("ai_result")
+    if ai_result:
+        ai_generated_sql, ai_params = ai_result["sql"], ai_result["params"]
 
-                    try:
-                       
-                        group_col = None
-                        metric_col = None
+        st.markdown("### 🧩 Generated SQL (post-validation)")
+        st.code(inline_literals(ai_generated_sql, ai_params), language="sql")
 
-                        if "CITY" in cols: group_col = "CITY"
-                        elif "CUISINE_TYPE" in cols: group_col = "CUISINE_TYPE"
-                        elif "RESTAURANT_NAME" in cols: group_col = "RESTAURANT_NAME"
+        st.info("🧾 Executing generated SQL on Snowflake...")
 
-                        if "GMV" in cols or "TOTAL_GMV" in cols: metric_col = next((c for c in cols if 'GMV' in c), None)
-                        elif "NET_PROFIT" in cols or "TOTAL_PROFIT" in cols: metric_col = next((c for c in cols if 'PROFIT' in c), None)
-                        elif "ORDERS" in cols or "TOTAL_ORDERS" in cols: metric_col = next((c for c in cols if 'ORDER' in c), None)
-                        
-                        # General Bar Chart Logic
-                        if group_col and metric_col:
-                            fig = px.bar(result_df, x=group_col, y=metric_col, 
-                                         text=result_df[metric_col].apply(fmt_money if 'GMV' in metric_col or 'PROFIT' in metric_col else fmt_int),
-                                         title=f"{metric_col.replace('_', ' ').title()} by {group_col.replace('_', ' ').title()}", 
-                                         template=plotly_template)
-                            fig.update_traces(textposition='outside')
+        result_df = None
+        try:
+            if bq.is_wrappable(ai_generated_sql):
+                total_rows = int(run_query(bq.count_query(ai_generated_sql), ai_params).iloc[0, 0])
+                page = min(int(st.session_state.get("ai_page", 1)), bq.page_count(total_rows))
+                columns = run_query(bq.columns_query(ai_generated_sql), ai_params).columns
+                result_df = run_query(bq.page_query(ai_generated_sql, page, columns), ai_params)
+            else:
+                # SHOW / CALL cannot be wrapped; their results are small and paged locally
+                full_df = run_query(ai_generated_sql, ai_params)
+                total_rows = len(full_df)
+                page = min(int(st.session_state.get("ai_page", 1)), bq.page_count(total_rows))
+                result_df = full_df.iloc[(page - 1) * bq.PAGE_SIZE: page * bq.PAGE_SIZE].reset_index(drop=True)
+        except Exception as e:
+          
+            st.error(f"❌ **SQL Execution Error:** The generated query caused an error in Snowflake. Please review the SQL above.\n\nError Details:\n{e}")
+
+        if result_df is not None and result_df.empty:
+            st.warning("⚠️ Query executed successfully, but **No data returned** for this query. Try widening your date range or adjusting the filters.")
+
+        elif result_df is not None:
+            if ai_result["remember"] is not None:
+                get_question_index(current_data_version()).add(ai_result["question"], ai_generated_sql, ai_result["remember"])
+                ai_result["remember"] = None
+
+            st.success(f"✅ Query executed successfully — {total_rows:,} rows.")
+
+            n_pages = bq.page_count(total_rows)
+            if n_pages > 1:
+                st.number_input(
+                    f"Page (of {n_pages:,}, {bq.PAGE_SIZE:,} rows each)", min_value=1, max_value=n_pages, step=1, key="ai_page"
+                )
+
+            st.dataframe(result_df, use_container_width=True)
+
+            if n_pages > 1 and bq.is_wrappable(ai_generated_sql):
+                if st.button("📦 Export full result (Parquet)"):
+                    export_file = bq.export_path(ai_generated_sql, ai_params)
+                    with st.spinner("Streaming full result to Parquet..."):
+                        written = bq.spill_to_parquet(execute_query_batches(ai_generated_sql, ai_params), export_file)
+                    with open(export_file, "rb") as fh:
+                        st.download_button(f"⬇️ Download {written:,} rows", fh, file_name=os.path.basename(export_file))
+
+           
+            #Auto Visualization
+          
+            st.markdown("### 📊 Visual Insight")
+
+            chart_displayed = False
+            
+            cols = [c.upper() for c in result_df.columns]
+            result_df.columns = [c.upper() for c in result_df.columns] 
+
+            try:
+               
+                group_col = None
+                metric_col = None
+
+                if "CITY" in cols: group_col = "CITY"
+                elif "CUISINE_TYPE" in cols: group_col = "CUISINE_TYPE"
+                elif "RESTAURANT_NAME" in cols: group_col = "RESTAURANT_NAME"
+
+                if "GMV" in cols or "TOTAL_GMV" in cols: metric_col = next((c for c in cols if 'GMV' in c), None)
+                elif "NET_PROFIT" in cols or "TOTAL_PROFIT" in cols: metric_col = next((c for c in cols if 'PROFIT' in c), None)
+                elif "ORDERS" in cols or "TOTAL_ORDERS" in cols: metric_col = next((c for c in cols if 'ORDER' in c), None)
+                
+                # General Bar Chart Logic
+                if group_col and metric_col:
+                    def ai_bar_chart_figure(result_df):
+                        fig = px.bar(result_df, x=group_col, y=metric_col, 
+                                     text=(fmt_money if 'GMV' in metric_col or 'PROFIT' in metric_col else fmt_int)(result_df[metric_col]),
+                                     title=f"{metric_col.replace('_', ' ').title()} by {group_col.replace('_', ' ').title()}", 
+                                     template=plotly_template)
+                        fig.update_traces(textposition='outside')
+                        fig.update_layout(height=400, yaxis_tickformat='s')
+                        return fig
+                    fig = cached_figure("ai_bar_chart", result_df, ai_bar_chart_figure, x=group_col, y=metric_col)
+                    st.plotly_chart(fig, use_container_width=True, key="ai_bar_chart")
+                    chart_displayed = True
+                
+                # 2. Time Trend (Line Chart Logic)
+                elif any(c in cols for c in ["ORDER_TIMESTAMP", "MONTH"]) and metric_col:
+                     x_col = next((c for c in cols if 'TIMESTAMP' in c or 'MONTH' in c), None)
+                     if x_col:
+                        def ai_line_chart_figure(result_df):
+                            fig = px.line(result_df, x=x_col, y=metric_col, markers=True, 
+                                          title=f"{metric_col} Trend", template=plotly_template)
                             fig.update_layout(height=400, yaxis_tickformat='s')
-                            st.plotly_chart(fig, use_container_width=True, key="ai_bar_chart")
-                            chart_displayed = True
-                        
-                        # 2. Time Trend (Line Chart Logic)
-                        elif any(c in cols for c in ["ORDER_TIMESTAMP", "MONTH"]) and metric_col:
-                             x_col = next((c for c in cols if 'TIMESTAMP' in c or 'MONTH' in c), None)
-                             if x_col:
-                                fig = px.line(result_df, x=x_col, y=metric_col, markers=True, 
-                                              title=f"{metric_col} Trend", template=plotly_template)
-                                fig.update_layout(height=400, yaxis_tickformat='s')
-                                st.plotly_chart(fig, use_container_width=True, key="ai_line_chart")
-                                chart_displayed = True
-
-                        if not chart_displayed:
-                            st.info("No suitable visualization detected for this query. Showing raw results above.")
-
-                    except Exception as viz_err:
-                        st.warning(f"Visualization skipped due to error: {viz_err}")
+                            return fig
+                        fig = cached_figure("ai_line_chart", result_df, ai_line_chart_figure, x=x_col, y=metric_col)
+                        st.plotly_chart(fig, use_container_width=True, key="ai_line_chart")
+                        chart_displayed = True
+
+                if not chart_displayed:
+                    st.info("No suitable visualization detected for this query. Showing raw results above.")
+
+            except Exception as viz_err:
+                st.warning(f"Visualization skipped due to error: {viz_err}")
 
-                except Exception as top_level_err:
-                    st.error(f"An unexpected error occurred during Cortex analysis: {top_level_err}")
 
 
 
@@ -1289,7 +1585,7 @@ Guidelines:
 
 # 👥 TAB 5: CUSTOMER INSIGHTS (Aggregated View)
 
-with tab5:
+if active_page == PAGES[4]:
     banner("👥 Customer Insights", "Loyalty, ratings, and monthly active users")
 
    
@@ -1301,37 +1597,19 @@ with tab5:
    
 
     
-    top_n = st.slider("Select Top N records for Loyal Customer List:", 3, 20, 10, key="tab5_list_n_agg")
+    top_n = st.slider("Select Top N records for Loyal Customer List:", 3, TOP_N_MAX, key="tab5_list_n_agg")
     st.markdown("---")
 
    
    
-    where_clause = base_where_joined()
-
     # ============================================================
     # 🧾 1. CUSTOMER KPIs (Aggregated)
     # ============================================================
     st.markdown('<h2 class="section-title">Customer KPIs</h2>', unsafe_allow_html=True)
     
    
-    customer_kpi_query = f"""
-    SELECT 
-        COUNT(DISTINCT SUB.CUSTOMER_ID) AS TOTAL_CUSTOMERS,
-        COUNT(DISTINCT CASE WHEN SUB.CUSTOMER_ORDER_COUNT > 1 THEN SUB.CUSTOMER_ID END) AS REPEAT_CUSTOMERS,
-        ROUND((COUNT(DISTINCT CASE WHEN SUB.CUSTOMER_ORDER_COUNT > 1 THEN SUB.CUSTOMER_ID END) / NULLIF(COUNT(DISTINCT SUB.CUSTOMER_ID)::FLOAT, 0)) * 100, 2) AS REPEAT_RATE,
-        ROUND(AVG(SUB.CUSTOMER_ORDER_COUNT), 2) AS AVG_ORDERS_PER_CUSTOMER,
-        ROUND(AVG(SUB.CUSTOMER_GMV), 2) AS AVG_GMV_PER_CUSTOMER
-    FROM (
-        SELECT O.CUSTOMER_ID, COUNT(O.ORDER_ID) AS CUSTOMER_ORDER_COUNT, SUM(O.TOTAL_AMOUNT) AS CUSTOMER_GMV
-        FROM FACT_ORDERS O
-        JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID
-        {where_clause}
-        GROUP BY O.CUSTOMER_ID
-    ) SUB;
-    """
-    
     try:
-        customer_kpi_df = run_query(customer_kpi_query)
+        customer_kpi_df = feature_result("customer_kpis", lambda: oc.customer_kpis(cube))
         
         total_customers = repeat_customers = repeat_rate = avg_orders = avg_gmv = 0
         if not customer_kpi_df.empty and customer_kpi_df.iloc[0]["TOTAL_CUSTOMERS"] is not None:
@@ -1343,6 +1621,7 @@ with tab5:
             avg_gmv = float(k["AVG_GMV_PER_CUSTOMER"])
 
             c1, c2, c3, c4, c5 = st.columns(5)
+            # The exact count the repeat rate is computed from (the sketch estimate would disagree with it)
             with c1: kpi_tile("👤 Total Customers", fmt_int(total_customers), "Unique customers in scope")
             with c2: kpi_tile("🔁 Repeat Customers", fmt_int(repeat_customers), "Placed >1 orders")
             with c3: kpi_tile("📈 Repeat Rate", f"**{repeat_rate:.2f}** %", "Repeat / total customers")
@@ -1380,54 +1659,30 @@ with tab5:
         color_col = comparison_dim
     # --- End Dynamic Grouping Logic ---
     
-    # Note: We must join DIM_RESTAURANT (R) to get the grouping column (R.CITY, R.CUISINE_TYPE)
-    # when we are not grouping by the standard columns already present in FACT_ORDERS.
-    # The where_clause ensures the join is available for R.
-    
-    # Dynamically build the SELECT and GROUP BY parts
-    select_cols = [f"TO_CHAR(O.ORDER_TIMESTAMP, 'YYYY-MM') AS MONTH"]
-    group_by_cols = ["MONTH"]
-    
-    if color_col:
-        # If splitting, we need the column in the SELECT and GROUP BY clauses, using the joined table R
-        if color_col == "CITY":
-            select_cols.append("R.CITY")
-            group_by_cols.append("R.CITY")
-        elif color_col == "CUISINE_TYPE":
-            select_cols.append("R.CUISINE_TYPE")
-            group_by_cols.append("R.CUISINE_TYPE")
-        elif color_col == "RESTAURANT_NAME":
-            select_cols.append("R.RESTAURANT_NAME")
-            group_by_cols.append("R.RESTAURANT_NAME")
-            
-    
-    mac_query = f"""
-    SELECT 
-        {', '.join(select_cols)},
-        COUNT(DISTINCT O.CUSTOMER_ID) AS ACTIVE_CUSTOMERS
-    FROM FACT_ORDERS O
-    JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID
-    {where_clause}
-    GROUP BY {', '.join(group_by_cols)}
-    ORDER BY MONTH;
-    """
-    
-    mac_df = run_query(mac_query)
+    mac_df = sketched_customers("monthly_customers")
+    mac_approx = mac_df is not None
+    if not mac_approx:
+        mac_df = oc.monthly_series(cube, "CUSTOMER_ID", "ACTIVE_CUSTOMERS", how="nunique", color_col=color_col)
     
     latest_delta = 0
     if not mac_df.empty:
         # Create Line Chart
-        fig_mac = px.line(mac_df, 
-                          x="MONTH", 
-                          y="ACTIVE_CUSTOMERS", 
-                          color=color_col,  # Dynamically set the color field
-                          markers=True, 
-                          template=plotly_template)
-        
-        fig_mac.update_traces(line=dict(width=3))
-        fig_mac.update_layout(height=360, margin=dict(l=8, r=8, t=8, b=8), yaxis_tickformat='s')
+        def cust_mac_trend_figure(mac_df):
+            fig_mac = px.line(mac_df, 
+                              x="MONTH", 
+                              y="ACTIVE_CUSTOMERS", 
+                              color=color_col,  # Dynamically set the color field
+                              markers=True, 
+                              template=plotly_template)
+
+            fig_mac.update_traces(line=dict(width=3))
+            fig_mac.update_layout(height=360, margin=dict(l=8, r=8, t=8, b=8), yaxis_tickformat='s')
+            return fig_mac
+        fig_mac = cached_figure("cust_mac_trend", mac_df, cust_mac_trend_figure, color=color_col)
         
         st.plotly_chart(fig_mac, use_container_width=True, key="cust_mac_trend") 
+        if mac_approx:
+            st.caption(APPROX_NOTE)
 
         if len(mac_df) >= 2 and not color_col: # Only calculate delta if not split by color
             # NOTE: Delta calculation relies on aggregated data, so we avoid it when split by color
@@ -1447,26 +1702,17 @@ with tab5:
     # TOP N LOYAL CUSTOMERS (Dynamic Top N)
    
     start_card(f"🏆 Top {top_n} Loyal Customers (Most Orders)", "Most orders placed")
-    loyal_df = run_query(f"""
-    SELECT 
-        C.CUSTOMER_NAME,
-        COUNT(O.ORDER_ID) AS TOTAL_ORDERS,
-        ROUND(SUM(O.TOTAL_AMOUNT),2) AS TOTAL_SPENT
-    FROM FACT_ORDERS O
-    JOIN DIM_CUSTOMER C ON O.CUSTOMER_ID = C.CUSTOMER_ID
-    JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID
-    {where_clause}
-    GROUP BY C.CUSTOMER_NAME
-    ORDER BY TOTAL_ORDERS DESC
-    LIMIT {top_n};
-    """)
+    loyal_df = feature_result("loyal_customers", lambda: oc.loyal_customers(cube, top_n)).head(top_n)
     if not loyal_df.empty:
-        fig_loyal = px.bar(loyal_df, x="CUSTOMER_NAME", y="TOTAL_ORDERS", 
-                           text=loyal_df["TOTAL_ORDERS"].apply(fmt_int),
-                           hover_data={"TOTAL_SPENT": True, "TOTAL_ORDERS": False},
-                           template=plotly_template)
-        fig_loyal.update_layout(height=360, margin=dict(l=8, r=8, t=8, b=8), yaxis_tickformat='s')
-        fig_loyal.update_traces(textposition='outside')
+        def cust_loyal_bar_figure(loyal_df):
+            fig_loyal = px.bar(loyal_df, x="CUSTOMER_NAME", y="TOTAL_ORDERS", 
+                               text=fmt_int(loyal_df["TOTAL_ORDERS"]),
+                               hover_data={"TOTAL_SPENT": True, "TOTAL_ORDERS": False},
+                               template=plotly_template)
+            fig_loyal.update_layout(height=360, margin=dict(l=8, r=8, t=8, b=8), yaxis_tickformat='s')
+            fig_loyal.update_traces(textposition='outside')
+            return fig_loyal
+        fig_loyal = cached_figure("cust_loyal_bar", loyal_df, cust_loyal_bar_figure)
         
         st.plotly_chart(fig_loyal, use_container_width=True, key="cust_loyal_bar")
         
@@ -1484,29 +1730,16 @@ with tab5:
     # CUSTOMER RATING DISTRIBUTION
    
     start_card("⭐ Customer Rating Distribution", "How customers rate their orders")
-    rating_dist_df = run_query(f"""
-    SELECT 
-        CASE 
-            WHEN O.ORDER_RATING BETWEEN 4.5 AND 5 THEN 'Excellent (4.5–5)'
-            WHEN O.ORDER_RATING BETWEEN 3.5 AND 4.49 THEN 'Good (3.5–4.49)'
-            WHEN O.ORDER_RATING BETWEEN 2.5 AND 3.49 THEN 'Average (2.5–3.49)'
-            WHEN O.ORDER_RATING IS NOT NULL THEN 'Poor (<2.5)'
-            ELSE 'No Rating'
-        END AS RATING_CATEGORY,
-        COUNT(O.ORDER_ID) AS RATING_COUNT
-    FROM FACT_ORDERS O
-    JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID
-    {where_clause}
-    GROUP BY RATING_CATEGORY
-    HAVING RATING_CATEGORY != 'No Rating'
-    ORDER BY RATING_COUNT DESC;
-    """)
+    rating_dist_df = oc.rating_distribution(cube)
     if not rating_dist_df.empty:
-        fig_rating = px.bar(rating_dist_df, x="RATING_CATEGORY", y="RATING_COUNT", 
-                            text=rating_dist_df["RATING_COUNT"].apply(fmt_int),
-                            template=plotly_template)
-        fig_rating.update_layout(height=360, margin=dict(l=8, r=8, t=8, b=8), yaxis_tickformat='s')
-        fig_rating.update_traces(textposition='outside')
+        def cust_rating_dist_figure(rating_dist_df):
+            fig_rating = px.bar(rating_dist_df, x="RATING_CATEGORY", y="RATING_COUNT", 
+                                text=fmt_int(rating_dist_df["RATING_COUNT"]),
+                                template=plotly_template)
+            fig_rating.update_layout(height=360, margin=dict(l=8, r=8, t=8, b=8), yaxis_tickformat='s')
+            fig_rating.update_traces(textposition='outside')
+            return fig_rating
+        fig_rating = cached_figure("cust_rating_dist", rating_dist_df, cust_rating_dist_figure)
         # FIX: Added unique key
         st.plotly_chart(fig_rating, use_container_width=True, key="cust_rating_dist")
 
@@ -1520,7 +1753,7 @@ with tab5:
     end_card()
 
 
-with tab6:
+if active_page == PAGES[5]:
     banner("🧩 Strategic Conclusion & Recommendations",
            "An executive overview combining insights from all dashboards with data-backed next actions.")
 
@@ -1541,87 +1774,53 @@ with tab6:
     </div>
     """, unsafe_allow_html=True)
 
-    where_clause = base_where_joined()
-
    
     #  Aggregate Key Metrics Across the Platform
 
-    kpi_df = run_query(f"""
-        SELECT 
-            SUM(O.TOTAL_AMOUNT) AS TOTAL_GMV,
-            COUNT(DISTINCT O.ORDER_ID) AS TOTAL_ORDERS,
-            ROUND(AVG(O.ORDER_RATING),2) AS AVG_RATING,
-            COUNT(DISTINCT O.CUSTOMER_ID) AS UNIQUE_CUSTOMERS
-        FROM FACT_ORDERS O
-        JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID
-        {where_clause};
-    """)
+    kpi_df = oc.platform_kpis(cube)
 
     total_gmv = fmt_money(kpi_df.iloc[0]["TOTAL_GMV"]) if not kpi_df.empty else "₹0"
     total_orders = fmt_int(kpi_df.iloc[0]["TOTAL_ORDERS"]) if not kpi_df.empty else "0"
-    avg_rating = kpi_df.iloc[0]["AVG_RATING"] if not kpi_df.empty else 0
+    avg_rating = kpi_df.iloc[0]["AVG_RATING"] if not kpi_df.empty and pd.notna(kpi_df.iloc[0]["AVG_RATING"]) else 0
     total_customers = fmt_int(kpi_df.iloc[0]["UNIQUE_CUSTOMERS"]) if not kpi_df.empty else "0"
+    reach_df = sketched_customers("customers")
+    if reach_df is not None and not reach_df.empty:
+        total_customers = "≈ " + fmt_int(reach_df.iloc[0]["CUSTOMERS"])
 
     c1, c2, c3, c4 = st.columns(4)
     with c1: kpi_tile("💰 Total GMV", total_gmv, "Overall platform revenue")
     with c2: kpi_tile("🛒 Total Orders", total_orders, "Orders completed")
-    with c3: kpi_tile("⭐ Avg Rating", f"{avg_rating:.2f}", "Customer satisfaction index")
-    with c4: kpi_tile("👥 Unique Customers", total_customers, "Active customer base")
+    with c3: kpi_tile("⭐ Avg Rating", fmt_rating(avg_rating), "Customer satisfaction index")
+    with c4: kpi_tile("👥 Unique Customers", total_customers, APPROX_NOTE if reach_df is not None else "Active customer base")
 
     st.markdown("<br>", unsafe_allow_html=True)
 
   
     # 🔹 2. Identify Key Performing Dimensions
   
-    top_city_df = run_query(f"""
-        SELECT R.CITY, SUM((O.DELIVERY_FEE + O.COMMISSION_REVENUE) -
-                           (O.DISCOUNT_AMOUNT + O.PAYMENT_PROCESSING_FEE)) AS PROFIT
-        FROM FACT_ORDERS O JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID
-        {where_clause}
-        GROUP BY R.CITY ORDER BY PROFIT DESC LIMIT 1;
-    """)
+    top_city_df = oc.top_groups(cube, "CITY", "NET_PROFIT", "PROFIT", 1)
     top_city = top_city_df.iloc[0]["CITY"] if not top_city_df.empty else None
 
-    top_cuisine_df = run_query(f"""
-        SELECT R.CUISINE_TYPE, SUM(O.TOTAL_AMOUNT) AS GMV
-        FROM FACT_ORDERS O JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID
-        {where_clause}
-        GROUP BY R.CUISINE_TYPE ORDER BY GMV DESC LIMIT 1;
-    """)
+    top_cuisine_df = oc.top_groups(cube, "CUISINE_TYPE", "GMV", "GMV", 1)
     top_cuisine = top_cuisine_df.iloc[0]["CUISINE_TYPE"] if not top_cuisine_df.empty else None
 
-    top_rest_df = run_query(f"""
-        SELECT R.RESTAURANT_NAME, SUM(O.TOTAL_AMOUNT) AS GMV
-        FROM FACT_ORDERS O JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID
-        {where_clause}
-        GROUP BY R.RESTAURANT_NAME ORDER BY GMV DESC LIMIT 1;
-    """)
+    top_rest_df = oc.top_groups(cube, "RESTAURANT_NAME", "GMV", "GMV", 1)
     top_restaurant = top_rest_df.iloc[0]["RESTAURANT_NAME"] if not top_rest_df.empty else None
 
-    loyal_df = run_query(f"""
-        SELECT C.CUSTOMER_NAME, COUNT(O.ORDER_ID) AS ORDERS
-        FROM FACT_ORDERS O JOIN DIM_CUSTOMER C ON O.CUSTOMER_ID = C.CUSTOMER_ID
-        JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID
-        {where_clause}
-        GROUP BY C.CUSTOMER_NAME ORDER BY ORDERS DESC LIMIT 1;
-    """)
+    loyal_df = feature_result(
+        "top_customer", lambda: oc.top_groups(cube, "CUSTOMER_NAME", "ORDER_ID", "ORDERS", 1, how="count")
+    )
     top_customer = loyal_df.iloc[0]["CUSTOMER_NAME"] if not loyal_df.empty else None
 
    
     # 3. Correlation Check (Commission vs Profit)
     
-    comm_corr_df = run_query(f"""
-        SELECT R.COMMISSION_RATE,
-               SUM((O.DELIVERY_FEE + O.COMMISSION_REVENUE) -
-                   (O.DISCOUNT_AMOUNT + O.PAYMENT_PROCESSING_FEE)) AS PROFIT
-        FROM FACT_ORDERS O JOIN DIM_RESTAURANT R ON O.RESTAURANT_ID = R.RESTAURANT_ID
-        WHERE R.COMMISSION_RATE IS NOT NULL
-        GROUP BY R.COMMISSION_RATE;
-    """)
     comm_corr = None
+    if not isinstance(render_results["commission"], QueryFailure):
+        comm_corr_df = split_fused_result(render_results["commission"], comm_specs)["COMMISSION_PROFIT"]
+    else:
+        comm_corr_df = pd.DataFrame()
     if not comm_corr_df.empty:
-        comm_corr_df["COMMISSION_RATE"] = pd.to_numeric(comm_corr_df["COMMISSION_RATE"], errors="coerce")
-        comm_corr_df["PROFIT"] = pd.to_numeric(comm_corr_df["PROFIT"], errors="coerce")
         comm_corr = comm_corr_df["COMMISSION_RATE"].corr(comm_corr_df["PROFIT"])
 
    
@@ -1670,3 +1869,66 @@ with tab6:
     and improved partner relationships.
     </div>
     """, unsafe_allow_html=True)
+
+
+# BACKGROUND PREFETCH (other pages' queries, once the visible page has been drawn)
+
+@st.cache_resource
+def get_prefetcher():
+    return BackgroundPrefetcher(max_workers=2)
+
+
+for name, (fn, *args) in render_jobs.items():
+    # Only warehouse queries are prefetched; LLM calls are billed per call and run when their page is opened
+    if name not in render_results and name not in LLM_JOBS:
+        get_prefetcher().submit((name, repr(args)), with_script_context(attributed("Prefetch", name, fn)), *args)
+
+
+# QUERY DIAGNOSTICS (opt-in sidebar panel)
+
+with st.sidebar:
+    st.markdown("---")
+    if st.toggle("🛠️ Query diagnostics", key="show_diagnostics"):
+        query_log = get_query_log()
+        scope = st.radio("Scope", ["This rerun", "All recent"], horizontal=True, key="diagnostics_scope")
+        diag = query_log.summary(run_id=diagnostics_run_id if scope == "This rerun" else None)
+
+        totals = diag["totals"]
+        d1, d2 = st.columns(2)
+        d1.metric("Queries", f"{totals['queries']:,}")
+        d2.metric("Query time", f"{totals['seconds']:.2f}s")
+        d1.metric("Cache hit ratio", f"{diag['cache_ratio']:.0%}")
+        d2.metric("Errors", f"{totals['errors']:,}")
+        st.caption(f"{totals['rows']:,} rows · {totals['bytes'] / 1e6:.1f} MB returned")
+
+        st.markdown("**Slowest queries**")
+        st.dataframe(diag["slowest"], use_container_width=True, hide_index=True)
+        st.markdown("**Per page**")
+        st.dataframe(diag["per_tab"], use_container_width=True, hide_index=True)
+
+        cache_stats = get_query_cache().stats()
+        llm_stats = get_completion_cache().stats()
+        figure_stats = get_figure_cache().stats()
+        st.caption(
+            f"Result cache: {cache_stats['hits']:,} hits / {cache_stats['misses']:,} misses, "
+            f"{cache_stats['entries']:,} entries · Cortex cache: {llm_stats['hits']:,} hits / "
+            f"{llm_stats['misses']:,} misses, {llm_stats['saved_seconds']:.0f}s saved · Figure cache: "
+            f"{figure_stats['hits']:,} hits / {figure_stats['misses']:,} misses, {figure_stats['bytes'] / 1e6:.1f} MB"
+            f" · Failed prefetches: {get_prefetcher().failures:,}"
+        )
+
+        st.markdown("**Cached results (memory)**")
+        st.caption(
+            f"Result cache: {cache_stats['bytes'] / 1e6:.1f} MB held, "
+            f"{cache_stats['bytes_saved'] / 1e6:.1f} MB saved by compact dtypes"
+            + (f" · Order cube: {cube.attrs['bytes'] / 1e6:.1f} MB, {cube.attrs['bytes_saved'] / 1e6:.1f} MB saved"
+               if "bytes" in cube.attrs else "")
+        )
+        cache_entries = pd.DataFrame(get_query_cache().entries())
+        if not cache_entries.empty:
+            st.dataframe(
+                cache_entries.sort_values("bytes", ascending=False).head(20), use_container_width=True, hide_index=True
+            )
+        st.download_button(
+            "⬇️ Export query log (JSONL)", query_log.to_jsonl(), file_name="query_log.jsonl", mime="application/x-ndjson"
+        )
@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from question_index import EntityCanonicalizer  # noqa: E402
+
+
+@pytest.fixture
+def canonicalize():
+    return EntityCanonicalizer(
+        cities=["Ahmedabad", "Mumbai", "Pune"],
+        cuisines=["Chinese", "North Indian"],
+        restaurants=["Roy-Madan Eatery"],
+    )
+
+
+@pytest.fixture(scope="session")
+def backend():
+    """LocalBackend over the bundled CSVs (in-memory DuckDB)."""
+    pytest.importorskip("duckdb")
+    from local_backend import LocalBackend
+    return LocalBackend()
@@ -0,0 +1,72 @@
+import os
+
+import pandas as pd
+import pytest
+
+import bounded_query as bq
+
+
+RANKED = """
+WITH TOTALS AS (
+    SELECT RESTAURANT_ID, SUM(TOTAL_AMOUNT) AS GMV, COUNT(*) AS ORDERS
+    FROM FACT_ORDERS
+    GROUP BY RESTAURANT_ID
+)
+SELECT RESTAURANT_ID, ROUND(GMV, -3) AS GMV_BUCKET, ORDERS,
+       ROW_NUMBER() OVER (ORDER BY GMV DESC) AS RANK_IN_WINDOW
+FROM TOTALS
+ORDER BY GMV_BUCKET DESC
+LIMIT 500;
+"""
+
+
+@pytest.mark.parametrize("sql, keys", [
+    ("SELECT A FROM T ORDER BY A DESC, 2", ["A DESC", "2"]),
+    ("SELECT A FROM T ORDER BY T.A NULLS LAST LIMIT 10 OFFSET 5", ["T.A NULLS LAST"]),
+    ("SELECT A FROM (SELECT A FROM T ORDER BY A) S", []),
+    ("SELECT ROW_NUMBER() OVER (ORDER BY A) AS R FROM T", []),
+    ("SELECT A FROM T WHERE B = 'x, ORDER BY y' ORDER BY \"A, B\"", ['"A, B"']),
+])
+def test_order_by_keys_are_top_level_only(sql, keys):
+    assert bq.order_by_keys(sql) == keys
+
+
+def test_inner_order_is_carried_out_with_a_total_tiebreak():
+    sql = "SELECT CITY, SUM(GMV) AS TOTAL FROM T GROUP BY CITY ORDER BY total DESC"
+    page = bq.page_query(sql, 2, ["CITY", "TOTAL"], page_size=10)
+    assert page.endswith("ORDER BY total DESC, 1, 2 LIMIT 10 OFFSET 10")
+
+
+def test_keys_that_are_not_output_columns_are_not_carried():
+    sql = "SELECT CITY FROM T ORDER BY GMV DESC, CITY"
+    assert "ORDER BY 1 LIMIT" in bq.page_query(sql, 1, ["CITY"])
+    sql = "SELECT CITY FROM T ORDER BY UPPER(CITY), CITY"
+    assert "ORDER BY 1 LIMIT" in bq.page_query(sql, 1, ["CITY"])
+
+
+def test_pages_cover_the_ordered_result_exactly_once(backend):
+    columns = backend.query(bq.columns_query(RANKED)).columns
+    total = int(backend.query(bq.count_query(RANKED)).iloc[0, 0])
+    pages = [backend.query(bq.page_query(RANKED, page, columns, page_size=37))
+             for page in range(1, bq.page_count(total, 37) + 1)]
+    paged = pd.concat(pages, ignore_index=True)
+
+    assert len(paged) == total
+    assert not paged.duplicated().any()
+    assert paged["GMV_BUCKET"].is_monotonic_decreasing
+
+
+def test_failed_spill_leaves_no_partial_file(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = str(tmp_path / "exports" / "result.parquet")
+
+    def batches():
+        yield pd.DataFrame({"A": [1, 2]})
+        raise RuntimeError("connection dropped")
+
+    with pytest.raises(RuntimeError):
+        bq.spill_to_parquet(batches(), path)
+    assert os.listdir(os.path.dirname(path)) == []
+
+    assert bq.spill_to_parquet(iter([pd.DataFrame({"A": [1, 2]}), pd.DataFrame({"A": [3]})]), path) == 3
+    assert os.listdir(os.path.dirname(path)) == ["result.parquet"]
@@ -0,0 +1,82 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+import customer_features as cf
+import order_cube as oc
+from local_backend import LocalBackend
+from query_filters import JOINED_COLUMNS, DashboardFilters
+
+
+FILTERS = [
+    DashboardFilters(),
+    # whole months from the feature table, the cut-off days of January and June from FACT_ORDERS
+    DashboardFilters.from_selection(cities=["Mumbai", "Pune"], start_date=datetime.date(2025, 1, 10),
+                                    end_date=datetime.date(2025, 6, 20)),
+    DashboardFilters.from_selection(start_date=datetime.date(2025, 1, 1), end_date=datetime.date(2025, 12, 31)),
+]
+
+NEW_ORDERS = """
+    INSERT INTO FACT_ORDERS (ORDER_ID, CUSTOMER_ID, RESTAURANT_ID, ORDER_TIMESTAMP, DELIVERY_FEE, SUB_TOTAL_AMOUNT,
+                             DISCOUNT_AMOUNT, COMMISSION_REVENUE, PAYMENT_PROCESSING_FEE, TOTAL_AMOUNT, ORDER_RATING)
+    VALUES
+    ('O9000001', 'C00121', 'R0326', '2025-10-31', 40.00, 460.00, 0, 92.00, 12.50, 500.00, 4.0),
+    ('O9000002', 'C00339', 'R0326', '2025-11-02', 60.00, 740.00, 0, 148.00, 20.00, 800.00, NULL),
+    ('O9000003', 'C00121', 'R0990', '2025-11-03', 20.50, 100.00, 0, 20.00, 3.00, 120.50, 2.5)
+"""
+
+
+@pytest.fixture(scope="module")
+def feature_backend(backend):
+    cf.refresh_customer_features(backend.query)
+    return backend
+
+
+def data_range(backend):
+    row = backend.query("SELECT MIN(ORDER_TIMESTAMP), MAX(ORDER_TIMESTAMP) FROM FACT_ORDERS").iloc[0]
+    return pd.to_datetime(row.iloc[0]).date(), pd.to_datetime(row.iloc[1]).date()
+
+
+def order_cube(backend, filters):
+    where, params = filters.where(JOINED_COLUMNS)
+    columns = oc.cube_columns(["customer_kpis", "loyal_customers"])
+    return oc.prepare_order_cube(backend.query(oc.order_cube_query(where, columns), params))
+
+
+def assert_matches_order_cube(backend, filters):
+    cube = order_cube(backend, filters)
+    span = data_range(backend)
+
+    kpis = backend.query(*cf.customer_kpis_query(filters, data_range=span))
+    pd.testing.assert_frame_equal(kpis, oc.customer_kpis(cube), check_dtype=False)
+
+    loyal = backend.query(*cf.loyal_customers_query(filters, data_range=span))
+    pd.testing.assert_frame_equal(loyal, oc.loyal_customers(cube), check_dtype=False)
+    top = backend.query(*cf.loyal_customers_query(filters, 10, data_range=span))
+    pd.testing.assert_frame_equal(top, oc.loyal_customers(cube, 10), check_dtype=False)
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_feature_table_matches_the_order_cube(feature_backend, filters):
+    assert_matches_order_cube(feature_backend, filters)
+
+
+def test_incremental_refresh_folds_in_new_orders():
+    backend = LocalBackend()   # its own copy of the data: the inserts must not leak into other tests
+    assert cf.refresh_customer_features(backend.query)["refreshed"]
+    assert not cf.refresh_customer_features(backend.query)["refreshed"]
+
+    backend.query(NEW_ORDERS)   # one into an existing (customer, restaurant, month) key, two into a new month
+    result = cf.refresh_customer_features(backend.query)
+    assert result["refreshed"]
+    assert result["watermark"] == ("2025-11-03", "O9000003")
+    assert not cf.refresh_customer_features(backend.query)["refreshed"]
+
+    for filters in FILTERS:
+        assert_matches_order_cube(backend, filters)
+
+    table = f"SELECT * FROM {cf.FEATURE_TABLE} ORDER BY CUSTOMER_ID, RESTAURANT_ID, MONTH"
+    incremental = backend.query(table)
+    cf.refresh_customer_features(backend.query, full=True)
+    pd.testing.assert_frame_equal(incremental, backend.query(table))
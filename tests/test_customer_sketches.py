@@ -0,0 +1,39 @@
+import datetime
+
+import pytest
+
+import customer_sketches as cs
+from query_filters import DashboardFilters
+
+
+# A few standard errors: well outside what the bundled data ever produces, tight enough to catch a broken sketch
+TOLERANCE = 4 * cs.STANDARD_ERROR
+DATA_RANGE = (datetime.date(2024, 11, 1), datetime.date(2025, 10, 30))
+
+
+@pytest.fixture(scope="module")
+def sketch_backend(backend):
+    cs.refresh_customer_sketches(backend.query)
+    return backend
+
+
+def counts(backend, filters, by, exact):
+    sql, params = cs.customer_count_query(filters, by, exact=exact, data_range=DATA_RANGE)
+    df = backend.query(sql, params)
+    return df.set_index(list(by))["CUSTOMERS"] if by else df["CUSTOMERS"]
+
+
+@pytest.mark.parametrize("filters", [
+    DashboardFilters(),
+    DashboardFilters.from_selection(cities=["Mumbai"]),
+    # partial months at both ends are counted from the fact rows and merged with the whole-month sketches
+    DashboardFilters.from_selection(start_date=datetime.date(2025, 1, 10), end_date=datetime.date(2025, 6, 20)),
+])
+@pytest.mark.parametrize("by", [(), ("MONTH",), ("CITY",)])
+def test_estimates_are_within_a_few_standard_errors(sketch_backend, filters, by):
+    exact = counts(sketch_backend, filters, by, exact=True)
+    estimate = counts(sketch_backend, filters, by, exact=False)
+
+    assert list(estimate.index) == list(exact.index)
+    error = (estimate - exact).abs() / exact
+    assert error.max() <= TOLERANCE, error.describe()
@@ -0,0 +1,101 @@
+import json
+
+import pandas as pd
+import plotly.express as px
+import pytest
+
+from figure_cache import FigureCache, frame_fingerprint
+
+
+SPEC = {"kind": "bar", "x": "CITY", "y": "GMV", "title": "GMV by city"}
+
+
+def frame():
+    return pd.DataFrame({"CITY": ["Pune", "Mumbai", "Agra"], "GMV": [120, 340, 75]})
+
+
+class Builder:
+    def __init__(self, df):
+        self.df = df
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return px.bar(self.df, x="CITY", y="GMV", title="GMV by city")
+
+
+def test_same_frame_spec_and_template_hit():
+    cache = FigureCache()
+    build = Builder(frame())
+    first = cache.get_or_build(build.df, SPEC, "plotly_white", build)
+    second = cache.get_or_build(frame(), dict(SPEC), "plotly_white", build)   # equal, not identical, inputs
+
+    assert build.calls == 1
+    assert json.loads(second.to_json()) == json.loads(first.to_json())
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def changed_cell():
+    df = frame()
+    df.loc[1, "GMV"] = 341
+    return df, SPEC, "plotly_white"
+
+
+def changed_dtype():
+    df = frame()
+    df["GMV"] = df["GMV"].astype("float64")
+    return df, SPEC, "plotly_white"
+
+
+@pytest.mark.parametrize("variant", [
+    changed_cell,
+    changed_dtype,
+    lambda: (frame(), {**SPEC, "title": "Revenue by city"}, "plotly_white"),
+    lambda: (frame(), SPEC, "plotly_dark"),
+])
+def test_any_input_change_misses(variant):
+    cache = FigureCache()
+    cache.get_or_build(frame(), SPEC, "plotly_white", Builder(frame()))
+    df, spec, template = variant()
+    build = Builder(df)
+    cache.get_or_build(df, spec, template, build)
+    assert build.calls == 1
+    assert cache.stats()["entries"] == 2
+
+
+def test_dtype_is_part_of_the_fingerprint():
+    df = frame()
+    assert frame_fingerprint(df) != frame_fingerprint(df.astype({"GMV": "float64"}))
+
+
+def test_returned_figures_do_not_share_state_with_the_cache():
+    cache = FigureCache()
+    build = Builder(frame())
+    built = cache.get_or_build(build.df, SPEC, "plotly_white", build)
+    built.update_layout(title="changed after build")
+
+    hit = cache.get_or_build(frame(), SPEC, "plotly_white", build)
+    assert hit is not built
+    assert hit.layout.title.text == "GMV by city"
+    hit.update_layout(title="changed after hit")
+    hit.data[0].marker.color = "red"
+
+    again = cache.get_or_build(frame(), SPEC, "plotly_white", build)
+    assert again is not hit
+    assert again.layout.title.text == "GMV by city"
+    assert again.data[0].marker.color != "red"
+    assert build.calls == 1
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = FigureCache(max_entries=2)
+    for title in ("a", "b"):
+        cache.get_or_build(frame(), {**SPEC, "title": title}, "plotly_white", Builder(frame()))
+    cache.get_or_build(frame(), {**SPEC, "title": "a"}, "plotly_white", Builder(frame()))   # "a" is now most recent
+    cache.get_or_build(frame(), {**SPEC, "title": "c"}, "plotly_white", Builder(frame()))
+
+    build = Builder(frame())
+    cache.get_or_build(frame(), {**SPEC, "title": "a"}, "plotly_white", build)
+    assert build.calls == 0
+    cache.get_or_build(frame(), {**SPEC, "title": "b"}, "plotly_white", build)
+    assert build.calls == 1
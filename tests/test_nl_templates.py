@@ -0,0 +1,66 @@
+import pytest
+
+from nl_templates import parse_intent, template_query
+
+
+@pytest.mark.parametrize("question", [
+    "GMV by year",
+    "Total GMV per year",
+    "year wise orders",
+    "yearly profit",
+])
+def test_year_grouping_is_kept(question, canonicalize):
+    intent = parse_intent(question, canonicalize)
+    assert intent is not None
+    assert intent.dimensions and intent.dimensions[0] in ("year", "yearly")
+    sql, _ = template_query(question, canonicalize)
+    assert "GROUP BY YEAR(ORDER_TIMESTAMP)" in sql
+    assert sql.endswith("ORDER BY YEAR")
+
+
+@pytest.mark.parametrize("question, dimension", [
+    ("profit margin by city", "city"),
+    ("margin by cuisine", "cuisine"),
+])
+def test_margin_is_a_ratio_not_profit(question, dimension, canonicalize):
+    intent = parse_intent(question, canonicalize)
+    assert intent.metric == "margin"
+    assert intent.dimensions == [dimension]
+    sql, _ = template_query(question, canonicalize)
+    assert "SUM(NET_PROFIT) * 100 / NULLIF(SUM(GMV), 0)" in sql
+    assert "AS TOTAL_PROFIT" not in sql
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("What is the total GMV for Ahmedabad city in 2024?",
+     dict(metric="gmv", aggregation="total", dimensions=[], filters={"CITY": ["Ahmedabad"]}, years=[2024])),
+    ("Which cuisine has the highest net profit?",
+     dict(metric="profit", dimensions=["cuisine"], descending=True, limit=1)),
+    ("Top 5 cities by GMV in 2024", dict(metric="gmv", dimensions=["city"], years=[2024], limit=5)),
+    ("Show me average rating by restaurant.", dict(metric="rating", aggregation="average", dimensions=["restaurant"])),
+    ("bottom cuisines by orders", dict(metric="order", descending=False, limit=10)),
+])
+def test_parse_intent(question, expected, canonicalize):
+    intent = parse_intent(question, canonicalize)
+    assert intent is not None
+    for attr, value in expected.items():
+        assert getattr(intent, attr) == value
+
+
+@pytest.mark.parametrize("question", [
+    "GMV by quarter",                         # unknown dimension
+    "GMV and profit by city",                 # two metrics
+    "top GMV",                                # ranking without a dimension
+    "average orders by city",                 # no such aggregation
+    "Which restaurants have declining GMV?",  # unknown word
+])
+def test_unparsed_questions_fall_through(question, canonicalize):
+    assert parse_intent(question, canonicalize) is None
+    assert template_query(question, canonicalize) is None
+
+
+@pytest.mark.parametrize("question", ["GMV by year", "profit margin by city", "monthly GMV trend for Pune"])
+def test_templates_run_on_local_backend(question, canonicalize, backend):
+    sql, params = template_query(question, canonicalize)
+    df = backend.query(sql, params)
+    assert not df.empty
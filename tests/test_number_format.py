@@ -0,0 +1,77 @@
+import math
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import number_format as nf
+
+
+def scalar_scaled(x, scale=nf.SHORT_SCALE, prefix=""):
+    """The per-value helper the vectorized formatters replaced (fmt_number / fmt_money)."""
+    try:
+        x = float(x)
+        if math.isnan(x):
+            raise ValueError
+    except (TypeError, ValueError):
+        return f"{prefix}0.00"
+    for threshold, suffix in scale:
+        if abs(x) >= threshold:
+            return f"{prefix}{x / threshold:.2f}{suffix}"
+    return f"{prefix}{x:.2f}"
+
+
+EDGE_VALUES = [
+    0.0, -0.0, 0.001, -0.001, 0.004, 0.005, 0.015, 0.125, 1.005, 2.675, 10.5, 999.99, 999.994, 999.995, 999.999,
+    1000, 999_994.9, 999_995, 999_999.999, 1_000_000, 1_234_567.891, 99_999.5, 100_000, 9_999_999, 10_000_000,
+    123_456_789.0, 999_995_000, 1e9, 2.5e12, 1e15, -1234.5, -999.995, -5_040, -7.25e8,
+]
+
+
+def random_values(n=20_000, seed=7):
+    rng = np.random.default_rng(seed)
+    values = rng.lognormal(mean=8, sigma=4, size=n)
+    values[rng.random(n) < 0.1] *= -1
+    return np.concatenate([values, np.round(values[:2000], 2), np.round(values[2000:4000], 3)])
+
+
+@pytest.mark.parametrize("scale, indian", [(nf.SHORT_SCALE, False), (nf.INDIAN_SCALE, True)])
+@pytest.mark.parametrize("prefix", ["", nf.CURRENCY])
+def test_scaled_matches_the_scalar_formatter(scale, indian, prefix):
+    values = np.concatenate([EDGE_VALUES, random_values()])
+    vectorized = (nf.format_money if prefix else nf.format_number)(pd.Series(values), indian=indian)
+    expected = [scalar_scaled(v, scale, prefix) for v in values]
+    mismatches = [(v, got, want) for v, got, want in zip(values, vectorized, expected) if got != want]
+    assert not mismatches, mismatches[:10]
+
+
+def test_percent_and_rating_match_python_formatting():
+    rng = np.random.default_rng(3)
+    rates = np.concatenate([[0, 0.00005, 0.000125, 0.5, 1, -0.0123, 0.123456], rng.uniform(0, 1, 20_000)])
+    assert list(nf.format_percent(rates)) == [f"{r:.2%}" for r in rates]
+    ratings = np.concatenate([[1, 2.675, 3.005, 4.999, 5], rng.uniform(1, 5, 5_000)])
+    assert list(nf.format_rating(ratings)) == [f"{r:.2f}" for r in ratings]
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, "₹0.00"),
+    (float("nan"), "₹0.00"),
+    ("not a number", "₹0.00"),
+    (float("inf"), "₹0.00"),
+    ("1234.5", "₹1.23K"),
+    (-5040, "₹-5.04K"),
+])
+def test_money_scalar_inputs(value, expected):
+    assert nf.format_money(value) == expected
+
+
+def test_indian_units():
+    assert list(nf.format_money([999, 12_345, 4_10_000, 1_25_00_000, 3.2e10], indian=True)) == [
+        "₹999.00", "₹12.35K", "₹4.10L", "₹1.25Cr", "₹3200.00Cr",
+    ]
+
+
+def test_array_input_keeps_shape_and_missing_values():
+    out = nf.format_number(pd.Series([1500, None, np.nan, 2e6]))
+    assert isinstance(out, np.ndarray)
+    assert list(out) == ["1.50K", "0.00", "0.00", "2.00M"]
@@ -0,0 +1,112 @@
+import pandas as pd
+import pytest
+
+import query_cache
+from query_cache import QueryCache, normalize_sql, split_limit
+
+
+class Warehouse:
+    """compute() stand-in: returns `rows` rows (or the statement's LIMIT) and counts executions."""
+
+    def __init__(self, rows=50):
+        self.rows = rows
+        self.calls = []
+
+    def __call__(self, sql, params):
+        self.calls.append(sql)
+        _, limit = split_limit(normalize_sql(sql))
+        n = self.rows if limit is None else min(limit, self.rows)
+        return pd.DataFrame({"CITY": [f"C{i:02d}" for i in range(n)], "GMV": [float(self.rows - i) for i in range(n)]})
+
+
+@pytest.mark.parametrize("a, b", [
+    ("SELECT city, SUM(gmv) FROM t GROUP BY city", "select  CITY,sum( GMV )\n from T group by CITY;"),
+    ("SELECT a FROM t -- first tab\nWHERE b = 1", "SELECT a FROM t /* other tab */ WHERE b=1"),
+    ("SELECT a FROM t WHERE c IN (3, 1, 2, 3)", "SELECT a FROM t WHERE c IN (1, 2, 3)"),
+    ("SELECT a FROM t WHERE c IN ('Pune', 'Agra')", "SELECT a FROM t WHERE c IN ('Agra','Pune','Agra')"),
+])
+def test_equivalent_queries_normalize_alike(a, b):
+    assert normalize_sql(a) == normalize_sql(b)
+
+
+@pytest.mark.parametrize("a, b", [
+    ("SELECT a FROM t WHERE c = 'Pune'", "SELECT a FROM t WHERE c = 'pune'"),
+    ("SELECT a FROM t WHERE c = 'a  b'", "SELECT a FROM t WHERE c = 'a b'"),
+    ("SELECT a FROM t WHERE note = 'x IN(3, 1)'", "SELECT a FROM t WHERE note = 'x IN(1, 3)'"),
+    ("SELECT a FROM t WHERE note = '-- not a comment'", "SELECT a FROM t WHERE note = ''"),
+    ('SELECT "gmv" FROM t', "SELECT gmv FROM t"),
+])
+def test_quoted_text_is_kept_verbatim(a, b):
+    assert normalize_sql(a) != normalize_sql(b)
+
+
+def test_only_a_top_level_trailing_limit_is_split():
+    assert split_limit(normalize_sql("SELECT a FROM t ORDER BY a LIMIT 5")) == ("SELECT A FROM T ORDER BY A", 5)
+    nested = normalize_sql("SELECT * FROM (SELECT a FROM t ORDER BY a LIMIT 5)")
+    assert split_limit(nested) == (nested, None)
+    literal = normalize_sql("SELECT a FROM t WHERE b = ' LIMIT 5'")
+    assert split_limit(literal) == (literal, None)
+
+
+@pytest.mark.parametrize("cached_sql", ["SELECT city, gmv FROM t ORDER BY gmv DESC LIMIT 20",
+                                        "SELECT city, gmv FROM t ORDER BY gmv DESC"])
+def test_smaller_limit_is_served_from_a_wider_result(cached_sql):
+    cache, warehouse = QueryCache(), Warehouse()
+    wide = cache.get_or_compute(cached_sql, (), warehouse)
+    top5 = cache.get_or_compute("SELECT city, gmv FROM t ORDER BY gmv DESC LIMIT 5", (), warehouse)
+
+    assert len(warehouse.calls) == 1
+    pd.testing.assert_frame_equal(top5, wide.head(5))
+    assert cache.stats()["hits"] == 1
+
+
+def test_larger_limit_is_not_served_from_a_narrower_result():
+    cache, warehouse = QueryCache(), Warehouse()
+    cache.get_or_compute("SELECT city, gmv FROM t LIMIT 5", (), warehouse)
+    top20 = cache.get_or_compute("SELECT city, gmv FROM t LIMIT 20", (), warehouse)
+    assert len(top20) == 20
+    assert len(warehouse.calls) == 2
+
+
+def test_params_are_part_of_the_key():
+    cache, warehouse = QueryCache(), Warehouse()
+    cache.get_or_compute("SELECT a FROM t WHERE c = ?", ("Pune",), warehouse)
+    cache.get_or_compute("SELECT a FROM t WHERE c = ?", ("Agra",), warehouse)
+    assert len(warehouse.calls) == 2
+
+
+def test_wider_entry_is_never_replaced_by_a_narrower_one():
+    cache, warehouse = QueryCache(), Warehouse()
+    cache.get_or_compute("SELECT city, gmv FROM t", (), warehouse)
+    key = query_cache.fingerprint(normalize_sql("SELECT city, gmv FROM t"))
+    cache._store(key, 3, warehouse("SELECT city, gmv FROM t LIMIT 3", ()))
+
+    assert [e["limit"] for e in cache.entries()] == [None]
+    assert len(cache.get_or_compute("SELECT city, gmv FROM t LIMIT 30", (), warehouse)) == 30
+    assert len(warehouse.calls) == 2   # the direct call above; the LIMIT 30 request was a hit
+
+
+def test_expired_entries_are_recomputed(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(query_cache.time, "time", lambda: now[0])
+    cache, warehouse = QueryCache(ttl=60), Warehouse()
+
+    cache.get_or_compute("SELECT a FROM t", (), warehouse)
+    now[0] += 59
+    cache.get_or_compute("SELECT a FROM t", (), warehouse)
+    assert len(warehouse.calls) == 1
+    now[0] += 2
+    cache.get_or_compute("SELECT a FROM t", (), warehouse)
+    assert len(warehouse.calls) == 2
+
+
+def test_callers_cannot_modify_the_cached_frame():
+    cache, warehouse = QueryCache(), Warehouse(rows=3)
+    first = cache.get_or_compute("SELECT city, gmv FROM t", (), warehouse)
+    first.rename(columns={"GMV": "Revenue"}, inplace=True)
+    first["SHARE"] = first["Revenue"] / first["Revenue"].sum()
+    first.columns = [c.lower() for c in first.columns]
+
+    again = cache.get_or_compute("SELECT city, gmv FROM t", (), warehouse)
+    assert list(again.columns) == ["CITY", "GMV"]
+    assert len(warehouse.calls) == 1
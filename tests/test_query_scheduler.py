@@ -0,0 +1,34 @@
+import logging
+import threading
+
+from query_scheduler import BackgroundPrefetcher, QueryBatch, QueryFailure
+
+
+def test_batch_isolates_failures():
+    def fail():
+        raise ValueError("bad column")
+
+    results = QueryBatch().add("ok", lambda: 1).add("broken", fail).run()
+    assert results["ok"] == 1
+    assert isinstance(results["broken"], QueryFailure)
+
+
+def test_prefetch_failures_are_logged_and_counted(caplog):
+    prefetcher = BackgroundPrefetcher(max_workers=1)
+    done = threading.Event()
+
+    def fail():
+        try:
+            raise RuntimeError("warehouse unavailable")
+        finally:
+            done.set()
+
+    with caplog.at_level(logging.WARNING, logger="query_scheduler"):
+        assert prefetcher.submit(("cube", "()"), fail)
+        done.wait(5)
+        prefetcher._pool.shutdown(wait=True)
+
+    assert prefetcher.failures == 1
+    assert "Prefetch of ('cube', '()') failed" in caplog.text
+    assert "warehouse unavailable" in caplog.text
+    assert not prefetcher._in_flight   # the key can be submitted again
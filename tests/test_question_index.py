@@ -0,0 +1,88 @@
+import pytest
+
+from question_index import QuestionIndex, normalize_question
+
+
+@pytest.fixture
+def index(tmp_path, canonicalize):
+    return QuestionIndex(path=str(tmp_path / "questions.sqlite"), canonicalize=canonicalize)
+
+
+def test_normalize_question(canonicalize):
+    words, entities = normalize_question("What is the total revenue for Ahmedabad city in 2024?", canonicalize)
+    assert words == ("total", "gmv")
+    assert entities == ("city=ahmedabad", "num=2024")
+
+
+def test_reworded_question_is_reused(index):
+    index.add("What is the total GMV for Ahmedabad in 2024?", "SELECT 1")
+    match = index.lookup("Ahmedabad 2024 GMV total")
+    assert match is not None and match.sql == "SELECT 1"
+
+
+# Other validated questions, so word weights are those of a populated index
+HISTORY = [
+    "What is the total GMV for Ahmedabad in 2024?",
+    "Which cuisine has the highest net profit?",
+    "Show me average rating by restaurant.",
+    "Compare profit across cities.",
+    "Monthly orders in Mumbai",
+]
+
+
+def test_antonym_is_not_reused(index):
+    for question in HISTORY:
+        index.add(question, "SELECT 0")
+    index.add("List restaurants with declining GMV month over month in Pune", "SELECT 'declining'")
+    assert index.lookup("List restaurants with growing GMV month over month in Pune") is None
+    assert index.lookup("List restaurants with declining GMV month over month in Pune").sql == "SELECT 'declining'"
+
+
+@pytest.mark.parametrize("question", [
+    "What is the total GMV for Pune in 2024?",       # other entity
+    "What is the total GMV for Ahmedabad in 2023?",  # other number
+    "What is the total profit for Ahmedabad in 2024?",
+    "What is the total GMV for Ahmedabad in 2024 by cuisine?",
+])
+def test_near_misses_are_not_reused(question, index):
+    index.add("What is the total GMV for Ahmedabad in 2024?", "SELECT 1")
+    assert index.lookup(question) is None
+
+
+@pytest.fixture
+def populated(index):
+    for question in HISTORY:
+        index.add(question, "SELECT 0")
+    index.add("List restaurants with declining GMV month over month in Pune", "SELECT 'declining'")
+    return index
+
+
+@pytest.mark.parametrize("question", [
+    "Restaurants with declining GMV month on month in Pune",          # drops "over"
+    "List restaurants with declining GMV month over month in Pune now",  # adds a low-weight word
+])
+def test_rewording_with_minor_words_is_reused(question, populated):
+    match = populated.lookup(question)
+    assert match is not None and match.sql == "SELECT 'declining'"
+    assert populated.threshold <= match.score < 1
+
+
+@pytest.mark.parametrize("question", [
+    "List restaurants with falling GMV month over month in Pune",
+    "List restaurants with declining profit month over month in Pune",
+    "List restaurants with declining average GMV month over month in Pune",
+    "List restaurants without declining GMV month over month in Pune",
+    "List restaurants with declining GMV month over month in Pune by cuisine",
+])
+def test_key_word_differences_are_not_reused(question, populated):
+    assert populated.lookup(question) is None
+
+
+def test_unrelated_extra_words_fall_below_the_threshold(populated):
+    assert populated.lookup("List restaurants with declining GMV in Pune despite heavy monsoon flooding") is None
+
+
+def test_context_must_match(index):
+    index.add("Total GMV by city", "SELECT 1", context="v1")
+    assert index.lookup("Total GMV by city", context="v2") is None
+    assert index.lookup("Total GMV by city", context="v1") is not None
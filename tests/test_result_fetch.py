@@ -0,0 +1,43 @@
+import datetime
+import decimal
+from types import SimpleNamespace
+
+import pandas as pd
+
+from result_fetch import fetch_snowpark
+
+
+class FakeJob:
+    def __init__(self, query_id, result):
+        self.query_id = query_id
+        self._result = result
+
+    def result(self):
+        return self._result
+
+
+class FakeSnowparkFrame:
+    """Stands in for a Snowpark DataFrame; `pandas=False` behaves as if the pandas extra were missing."""
+
+    def __init__(self, query_id, pandas=True):
+        self.query_id = query_id
+        self.pandas = pandas
+        self.schema = SimpleNamespace(fields=[SimpleNamespace(name="GMV"), SimpleNamespace(name="DAY")])
+
+    def to_pandas(self, block=True):
+        assert not block
+        if not self.pandas:
+            raise ImportError("pandas extra not installed")
+        frame = pd.DataFrame({"GMV": [decimal.Decimal("1.50")], "DAY": [datetime.date(2024, 1, 2)]})
+        return FakeJob(self.query_id, frame)
+
+    def collect_nowait(self):
+        return FakeJob(self.query_id, [(decimal.Decimal("1.50"), datetime.date(2024, 1, 2))])
+
+
+def test_query_id_comes_from_the_executed_statement():
+    for pandas in (True, False):
+        df = fetch_snowpark(FakeSnowparkFrame("01b2-query", pandas=pandas))
+        assert df.attrs["query_id"] == "01b2-query"
+        assert df["GMV"].dtype == "float64"
+        assert pd.api.types.is_datetime64_any_dtype(df["DAY"])
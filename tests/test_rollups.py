@@ -0,0 +1,27 @@
+import pandas as pd
+import pytest
+
+import rollups
+from dashboard_queries import executive_dashboard_specs
+from query_compiler import compile_fused_query, split_fused_result
+
+
+@pytest.fixture(scope="module")
+def rollup_backend(backend):
+    rollups.refresh_daily_rollup(backend.query)
+    return backend
+
+
+@pytest.mark.parametrize("window", [("2025-01-01", "2025-04-01"), ("1990-01-01", "1990-02-01")])
+def test_routed_kpis_match_the_fact_table(rollup_backend, window):
+    specs = executive_dashboard_specs()[:1]   # EXEC_KPIS: GMV, order count, net profit
+    where = " WHERE O.ORDER_TIMESTAMP >= ? AND O.ORDER_TIMESTAMP < ?"
+    routed_spec, _ = rollups.route_to_daily_rollup(specs[0], where)
+    assert routed_spec.source == rollups.ROLLUP_SOURCE
+
+    results = {}
+    for label, router in (("fact", None), ("rollup", rollups.route_to_daily_rollup)):
+        sql, params = compile_fused_query(specs, where, window, router=router)
+        results[label] = split_fused_result(rollup_backend.query(sql, params), specs)[specs[0].name]
+    pd.testing.assert_frame_equal(results["fact"], results["rollup"], check_dtype=False)
+    assert (results["rollup"]["TOTAL_ORDERS"].iloc[0] > 0) == (window[0] > "2000")